@@ -0,0 +1,254 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from document_processor.metrics import metrics
+
+rejected_requests = metrics.counter(
+    "rejected_requests_total",
+    "Requests rejected by admission control by reason (overloaded, rate_limited).",
+)
+in_flight_requests = metrics.gauge("in_flight_requests", "Requests that are being classified.")
+concurrency_limit = metrics.gauge("concurrency_limit", "Current adaptive limit of concurrent classifications.")
+
+
+class AdmissionError(Exception):
+    """
+    Raised when a request is not admitted.
+    """
+    def __init__(self, message, retry_after):
+        """
+        Initializes an AdmissionError.
+        :param message: Description of the rejection.
+        :param retry_after: Seconds after which the client should retry.
+        """
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class OverloadedError(AdmissionError):
+    """
+    Raised when the service has no capacity for another request.
+    """
+    pass
+
+
+class RateLimitedError(AdmissionError):
+    """
+    Raised when a client exceeded its quota.
+    """
+    pass
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of concurrently processed requests to a limit that adapts to the observed latency.
+    The limit shrinks when latency rises above the latency measured without load and grows while it does not,
+    so excess requests are rejected immediately instead of queueing and slowing down every request.
+    Priority requests may use the headroom between the adaptive limit and max_concurrency.
+    """
+    def __init__(self, max_concurrency, min_concurrency=1, tolerance=2.0, smoothing=0.2, baseline_window=300.0,
+                 clock=time.monotonic):
+        """
+        Initializes an AdaptiveConcurrencyLimiter.
+        :param max_concurrency: Upper bound of the limit.
+        :param min_concurrency: Lower bound of the limit.
+        :param tolerance: Ratio of the smoothed latency to the no-load latency that is still accepted.
+        :param smoothing: Weight of a new latency sample in the smoothed latency.
+        :param baseline_window: Seconds after which the minimum latency is measured anew.
+        :param clock: Function that returns the current time in seconds.
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.baseline_window = baseline_window
+        self.clock = clock
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.smoothed_latency = None
+        self.min_latency = None
+        # Minimum latencies of the current and the previous window
+        self.window_min_latency = None
+        self.previous_window_min_latency = None
+        self.window_start = clock()
+        self._lock = threading.Lock()
+        concurrency_limit.set(self.limit)
+
+    def estimated_wait(self):
+        """
+        :return: Seconds until a slot is expected to free up.
+        """
+        latency = self.smoothed_latency or 1.0
+        return latency * max(1, self.in_flight - int(self.limit) + 1) / max(1, int(self.limit))
+
+    def acquire(self, priority=False):
+        """
+        Takes a slot or raises OverloadedError if none is free.
+        :param priority: Whether the request may exceed the adaptive limit up to max_concurrency.
+        """
+        with self._lock:
+            limit = self.max_concurrency if priority else int(self.limit)
+            if self.in_flight >= limit:
+                rejected_requests.inc(reason="overloaded")
+                raise OverloadedError("Service is overloaded", self.estimated_wait())
+            self.in_flight += 1
+        in_flight_requests.inc()
+
+    def release(self, latency):
+        """
+        Frees a slot and adapts the limit to the latency of the request.
+        :param latency: Seconds the request took.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self.update_limit(latency)
+        in_flight_requests.dec()
+        concurrency_limit.set(self.limit)
+
+    def update_min_latency(self, latency):
+        """
+        Updates the no-load latency, the minimum latency of the current and the previous window.
+        It follows a slower model within two windows, but does not rise with every request under overload.
+        :param latency: Seconds the last request took.
+        """
+        now = self.clock()
+        if now - self.window_start >= self.baseline_window:
+            self.previous_window_min_latency = self.window_min_latency
+            self.window_min_latency = None
+            self.window_start = now
+        if self.window_min_latency is None or latency < self.window_min_latency:
+            self.window_min_latency = latency
+        if self.previous_window_min_latency is None:
+            self.min_latency = self.window_min_latency
+        else:
+            self.min_latency = min(self.window_min_latency, self.previous_window_min_latency)
+
+    def update_limit(self, latency):
+        """
+        Scales the limit by the ratio of the no-load latency to the smoothed latency.
+        :param latency: Seconds the last request took.
+        """
+        self.update_min_latency(latency)
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+            return
+        self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+        gradient = min(1.0, max(0.5, self.tolerance * self.min_latency / self.smoothed_latency))
+        # Probe upwards by a small queue on top of the limit only while latency is within the tolerance.
+        headroom = math.sqrt(self.limit) if gradient >= 1.0 else 0.0
+        new_limit = self.limit * gradient + headroom
+        self.limit = min(self.max_concurrency, max(self.min_concurrency, 0.8 * self.limit + 0.2 * new_limit))
+
+    @contextmanager
+    def slot(self, priority=False):
+        """
+        Holds a slot for the duration of a request.
+        :param priority: Whether the request may exceed the adaptive limit up to max_concurrency.
+        """
+        self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+
+class TokenBucket:
+    """
+    Token bucket that allows a sustained rate with bursts up to its capacity.
+    """
+    def __init__(self, rate, burst):
+        """
+        Initializes a full TokenBucket.
+        :param rate: Tokens added per second.
+        :param burst: Capacity of the bucket.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Takes a token.
+        :return: 0 if a token was taken, otherwise seconds until the next token.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per client rate limiter with a token bucket for every API key.
+    Clients without a quota are identified by whatever key or address they send, so only the buckets of the
+    max_clients most recently seen of them are kept.
+    """
+    def __init__(self, quotas: dict, default_rate=0.0, default_burst=None, max_clients=10000):
+        """
+        Initializes a RateLimiter.
+        :param quotas: dict of API key to (requests per second, burst).
+        :param default_rate: Requests per second of clients without a quota, 0 for unlimited.
+        :param default_burst: Burst of clients without a quota, defaults to one second of requests.
+        :param max_clients: Number of clients without a quota whose buckets are kept, least recently seen first out.
+        """
+        self.quotas = quotas
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._default_buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_bucket(self, client):
+        if client in self.quotas:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                rate, burst = self.quotas[client]
+                bucket = self._buckets[client] = TokenBucket(rate, burst or max(1.0, rate))
+            return bucket
+
+        if self.default_rate <= 0:
+            return None
+        bucket = self._default_buckets.get(client)
+        if bucket is None:
+            bucket = self._default_buckets[client] = TokenBucket(
+                self.default_rate, self.default_burst or max(1.0, self.default_rate)
+            )
+            if len(self._default_buckets) > self.max_clients:
+                self._default_buckets.popitem(last=False)
+        else:
+            self._default_buckets.move_to_end(client)
+        return bucket
+
+    def check(self, client):
+        """
+        Counts a request of a client and raises RateLimitedError if it exceeded its quota.
+        :param client: API key or other identifier of the client.
+        """
+        with self._lock:
+            bucket = self.get_bucket(client)
+            retry_after = 0 if bucket is None else bucket.take()
+        if retry_after:
+            rejected_requests.inc(reason="rate_limited")
+            raise RateLimitedError("Rate limit exceeded", retry_after)
+
+
+def parse_quotas(quotas):
+    """
+    Parses quotas of the form "key:rate[:burst],...".
+    :param quotas: str.
+    :return: dict of API key to (requests per second, burst or None).
+    """
+    parsed = {}
+    for entry in filter(None, (entry.strip() for entry in quotas.split(","))):
+        key, rate, *burst = entry.split(":")
+        parsed[key] = (float(rate), float(burst[0]) if burst else None)
+    return parsed
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from document_processor.metrics import metrics
+
+queue_depth = metrics.gauge(
+    "autoscaling_queue_depth",
+    "Documents waiting or being processed, including pending jobs.",
+)
+capacity = metrics.gauge(
+    "autoscaling_capacity_documents_per_second",
+    "Estimated documents per second the instance can process, derived from the measured latencies.",
+)
+time_to_drain = metrics.gauge(
+    "autoscaling_time_to_drain_seconds",
+    "Estimated seconds until the instance has processed its current queue.",
+)
+
+# Seconds of history that is kept, the longest window a report can cover
+MAX_WINDOW = 300.0
+
+
+class LoadTracker:
+    """
+    Tracks the arrivals, the backlog and the processed documents of the instance, so that an orchestrator
+    can scale on the actual backlog and capacity instead of on CPU averages, which lag behind bursts.
+    A document processed in a batch of n counts as 1/n of the batch time.
+    """
+    def __init__(self, clock=time.monotonic):
+        """
+        Initializes a LoadTracker.
+        :param clock: Function that returns the current time in seconds.
+        """
+        self.clock = clock
+        self.started = clock()
+        # Requests that were admitted and are not answered yet
+        self.in_flight = 0
+        # Requests or batches that are being processed
+        self.processing = 0
+        self.processing_requests = 0
+        self._arrivals = deque()
+        self._completions = deque()
+        self._concurrency = deque()
+        self._lock = threading.Lock()
+
+    def prune(self, now):
+        for history in (self._arrivals, self._completions, self._concurrency):
+            while history and history[0][0] < now - MAX_WINDOW:
+                history.popleft()
+
+    def arrive(self, documents=1):
+        """
+        Records documents that arrived, e.g. submitted jobs.
+        :param documents: Number of documents.
+        """
+        with self._lock:
+            now = self.clock()
+            self._arrivals.append((now, documents))
+            self.prune(now)
+
+    @contextmanager
+    def request(self):
+        """
+        Tracks a request from its admission until it is answered.
+        """
+        self.arrive()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @contextmanager
+    def processing_slot(self, documents=1, request=False):
+        """
+        Tracks the processing of a request or a batch and records its latency.
+        :param documents: Number of documents that are processed together.
+        :param request: Whether a request tracked by request is processed, it then no longer counts as waiting.
+        """
+        with self._lock:
+            self.processing += 1
+            self.processing_requests += request
+            self._concurrency.append((self.clock(), self.processing))
+        start = self.clock()
+        try:
+            yield
+        finally:
+            with self._lock:
+                now = self.clock()
+                self.processing -= 1
+                self.processing_requests -= request
+                self._completions.append((now, documents, now - start))
+                self.prune(now)
+
+    def report(self, window=60.0, pending_jobs=0, concurrency_limit=None):
+        """
+        Reports the autoscaling signals of the last window seconds.
+        Capacity is the number of requests or batches processed in parallel, which is the adaptive concurrency limit
+        if load shedding is enabled and the highest concurrency reached otherwise, divided by the seconds a document
+        takes. It is None until a document was processed.
+        :param window: Seconds of history the rates and latencies are computed from, at most MAX_WINDOW.
+        :param pending_jobs: Number of jobs in the job queue that wait to be processed.
+        :param concurrency_limit: Current limit of the AdaptiveConcurrencyLimiter, None if it is disabled.
+        :return: dict that can be serialized to JSON.
+        """
+        window = min(window, MAX_WINDOW)
+        with self._lock:
+            now = self.clock()
+            self.prune(now)
+            since = now - window
+            arrived = sum(documents for t, documents in self._arrivals if t >= since)
+            completions = [(documents, seconds) for t, documents, seconds in self._completions if t >= since]
+            peak_concurrency = max([c for t, c in self._concurrency if t >= since] + [self.processing, 1])
+            waiting = self.in_flight - self.processing_requests + pending_jobs
+            processing = self.processing
+
+        # Rates are computed over the uptime while the instance has not run for a whole window
+        elapsed = max(min(window, now - self.started), 1e-9)
+        processed = sum(documents for documents, _ in completions)
+        seconds_per_document = sum(seconds for _, seconds in completions) / processed if processed else None
+        parallelism = concurrency_limit or peak_concurrency
+        estimated_capacity = parallelism / seconds_per_document if seconds_per_document else None
+        throughput = processed / elapsed
+        depth = waiting + processing
+
+        report = {
+            "window_seconds": round(elapsed, 1),
+            "queue_depth": depth,
+            "waiting": waiting,
+            "processing": processing,
+            "arrival_rate": round(arrived / elapsed, 3),
+            "throughput": round(throughput, 3),
+            "seconds_per_document": None if seconds_per_document is None else round(seconds_per_document, 4),
+            "parallelism": round(parallelism, 1),
+            "capacity": None if estimated_capacity is None else round(estimated_capacity, 3),
+            "utilization": None if estimated_capacity is None else round(throughput / estimated_capacity, 3),
+            "time_to_drain_seconds": None if estimated_capacity is None else round(depth / estimated_capacity, 2),
+        }
+
+        queue_depth.set(depth)
+        if estimated_capacity is not None:
+            capacity.set(report["capacity"])
+            time_to_drain.set(report["time_to_drain_seconds"])
+        return report
+
+
+load_tracker = LoadTracker()
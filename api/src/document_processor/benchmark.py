@@ -0,0 +1,114 @@
+"""
+Command-line benchmark of the classification latency with different inference precisions.
+
+Example:
+    python -m document_processor.benchmark tests/files --model EFFICIENTDET --precisions FLOAT32 MIXED_BFLOAT16
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from document_processor.bulk_classifier import iter_documents
+from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.inference_config import FLOAT32, PRECISIONS, configure_inference
+from document_processor.logger import logger
+from document_processor.pipeline.builder import DEFAULT_MODELS_DIRECTORY, get_pipeline_builder
+
+
+def summarize(latencies):
+    """
+    Summarizes the latencies of a benchmark run.
+    :param latencies: Seconds per document.
+    :return: dict with the mean, p50 and p95 latency in milliseconds and the throughput in documents per second.
+    """
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "documents_per_second": float(1000 / latencies_ms.mean()),
+    }
+
+
+def benchmark(processor, documents, repeat=10, warm_up=1):
+    """
+    Measures the latency of classifying documents one by one.
+    :param processor: PDFDocumentProcessor.
+    :param documents: list of PDF documents.
+    :param repeat: Number of times every document is classified.
+    :param warm_up: Number of runs over the documents that are not measured.
+    :return: Summary of the latencies and the document types of the last run.
+    """
+    for _ in range(warm_up):
+        for document in documents:
+            processor.process_document(document)
+
+    latencies, document_types = [], []
+    for _ in range(repeat):
+        document_types = []
+        for document in documents:
+            start = time.perf_counter()
+            data = processor.process_document(document)
+            latencies.append(time.perf_counter() - start)
+            document_types.append(data.get("document_type"))
+    return summarize(latencies), document_types
+
+
+def format_report(results):
+    """
+    Formats the results of several precisions as a table with the deltas to the first precision.
+    :param results: dict of precision to (summary, document types).
+    :return: str.
+    """
+    (baseline_summary, baseline_types), *_ = results.values()
+    lines = [f"{'precision':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'docs/s':>10}{'delta':>10}{'agree':>8}"]
+    for precision, (summary, document_types) in results.items():
+        delta = summary["mean_ms"] / baseline_summary["mean_ms"] - 1
+        agreement = np.mean([a == b for a, b in zip(document_types, baseline_types)]) if document_types else 1.0
+        lines.append(
+            f"{precision:<16}{summary['mean_ms']:>10.1f}{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}"
+            f"{summary['documents_per_second']:>10.1f}{delta:>+10.1%}{agreement:>8.0%}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark the classification latency of inference precisions.")
+    parser.add_argument("source", help="directory, glob pattern, tar or zip archive with PDFs")
+    parser.add_argument(
+        "--model", default=os.getenv("MODEL", "EFFICIENTNET"), help="EFFICIENTNET, EFFICIENTDET, EFFICIENTDET_EFFICIENTNET or the _ONNX variants"
+    )
+    parser.add_argument("--models-directory", default=DEFAULT_MODELS_DIRECTORY)
+    parser.add_argument("--min-confidence", type=float, default=float(os.getenv("MIN_CONFIDENCE", 0.5)))
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument("--repeat", type=int, default=10, help="times every document is classified")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    documents = [read() for _, read in iter_documents(args.source)]
+    if not documents:
+        raise ValueError(f"No PDFs found in {args.source}")
+
+    results = {}
+    for precision in args.precisions:
+        # The optimizations apply to the functions traced afterwards, so every precision loads the model again
+        used_precision = configure_inference(precision)
+        if used_precision in results:
+            continue
+        pipeline_builder, model_directory = get_pipeline_builder(args.model, args.models_directory)
+        processor = PDFDocumentProcessor(
+            pipeline_builder, model_directory=model_directory, min_confidence=args.min_confidence
+        )
+        results[used_precision] = benchmark(processor, documents, args.repeat)
+        logger.info(f"Benchmarked {used_precision} inference")
+    configure_inference(FLOAT32)
+
+    print(format_report(results))
+
+
+if __name__ == "__main__":
+    main()
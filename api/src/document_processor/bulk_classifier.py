@@ -0,0 +1,291 @@
+"""
+Command-line entry point to classify large amounts of PDFs without the API.
+
+Example:
+    python -m document_processor.bulk_classifier /archive/2022.tar.gz results.csv --model EFFICIENTNET
+"""
+import argparse
+import csv
+import glob
+import importlib.util
+import json
+import os
+import tarfile
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.inference_config import FLOAT32, PRECISIONS, configure_inference
+from document_processor.logger import logger
+from document_processor.pipeline.builder import DEFAULT_MODELS_DIRECTORY, get_pipeline_builder
+
+RESULT_FIELDS = ["key", "document_type", "prediction_confidences", "error"]
+
+
+def iter_documents(source):
+    """
+    Iterates over the PDFs of a directory, glob pattern, tar or zip archive.
+    :param source: path of a directory, tar or zip archive, or a glob pattern.
+    :return: iterator of (key, callable returning the PDF bytes).
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for file in sorted(files):
+                if file.lower().endswith(".pdf"):
+                    path = os.path.join(root, file)
+                    yield path, lambda path=path: read_file(path)
+    elif os.path.isfile(source) and tarfile.is_tarfile(source):
+        # Streaming mode reads the archive sequentially without seeking back.
+        with tarfile.open(source, "r|*") as tar:
+            for member in tar:
+                if member.isfile() and member.name.lower().endswith(".pdf"):
+                    pdf_bytes = tar.extractfile(member).read()
+                    yield f"{source}::{member.name}", lambda pdf_bytes=pdf_bytes: pdf_bytes
+    elif os.path.isfile(source) and zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zip_file:
+            for name in zip_file.namelist():
+                if name.lower().endswith(".pdf"):
+                    # Read while the archive is open, it is closed once the last batch exhausts the generator.
+                    pdf_bytes = zip_file.read(name)
+                    yield f"{source}::{name}", lambda pdf_bytes=pdf_bytes: pdf_bytes
+    else:
+        for path in sorted(glob.iglob(source, recursive=True)):
+            if os.path.isfile(path):
+                yield path, lambda path=path: read_file(path)
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def to_row(key, data: dict):
+    """
+    Converts the processed data of a document into a result row.
+    :param key: key of the document.
+    :param data: dict returned by the pipeline.
+    :return: dict with the RESULT_FIELDS.
+    """
+    error = data.get("error")
+    prediction_confidences = data.get("prediction_confidences")
+    return {
+        "key": key,
+        "document_type": data.get("document_type") or ("error" if error else "unknown"),
+        "prediction_confidences": json.dumps(prediction_confidences) if prediction_confidences else "",
+        "error": "" if error is None else f"{type(error).__name__}: {error}",
+    }
+
+
+class ResultWriter(ABC):
+    """
+    ABC for a writer of result rows that can be resumed.
+    """
+    def __init__(self, output):
+        """
+        Initializes a ResultWriter.
+        :param output: path of the output.
+        """
+        self.output = output
+
+    @abstractmethod
+    def processed_keys(self):
+        """
+        :return: set of the keys that were already written by a previous run.
+        """
+        pass
+
+    @abstractmethod
+    def write(self, rows):
+        """
+        Writes rows and makes sure they are on disk.
+        :param rows: list of result rows.
+        """
+        pass
+
+
+class CsvResultWriter(ResultWriter):
+    """
+    ResultWriter that appends to a CSV file.
+    """
+    def processed_keys(self):
+        if not os.path.exists(self.output):
+            return set()
+        with open(self.output, newline="") as f:
+            return {row["key"] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        write_header = not os.path.exists(self.output) or os.path.getsize(self.output) == 0
+        with open(self.output, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class JsonlResultWriter(ResultWriter):
+    """
+    ResultWriter that appends to a JSON lines file.
+    """
+    def processed_keys(self):
+        if not os.path.exists(self.output):
+            return set()
+        keys = set()
+        with open(self.output) as f:
+            for line in f:
+                try:
+                    keys.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    # The last line is incomplete if the previous run was killed while writing.
+                    pass
+        return keys
+
+    def write(self, rows):
+        with open(self.output, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class ParquetResultWriter(ResultWriter):
+    """
+    ResultWriter that writes every batch as a part file into a Parquet dataset directory.
+    Requires pandas and pyarrow or fastparquet, which are checked when the writer is created,
+    so that a missing engine fails before any document is classified.
+    """
+    def __init__(self, output):
+        if importlib.util.find_spec("pyarrow") is None and importlib.util.find_spec("fastparquet") is None:
+            raise ImportError("pyarrow or fastparquet is required to write Parquet, install one or use another format")
+        super().__init__(output)
+        import pandas as pd
+        self.pd = pd
+        os.makedirs(output, exist_ok=True)
+
+    def part_files(self):
+        return sorted(glob.glob(os.path.join(self.output, "part-*.parquet")))
+
+    def processed_keys(self):
+        keys = set()
+        for part_file in self.part_files():
+            keys.update(self.pd.read_parquet(part_file, columns=["key"])["key"])
+        return keys
+
+    def write(self, rows):
+        part_file = os.path.join(self.output, f"part-{len(self.part_files()):06d}.parquet")
+        # Write to a temporary file first so that an interrupted write does not leave a broken part.
+        self.pd.DataFrame(rows, columns=RESULT_FIELDS).to_parquet(part_file + ".tmp", index=False)
+        os.replace(part_file + ".tmp", part_file)
+
+
+RESULT_WRITERS = {
+    "csv": CsvResultWriter,
+    "jsonl": JsonlResultWriter,
+    "parquet": ParquetResultWriter,
+}
+
+
+def get_result_writer(output, output_format=None):
+    """
+    Gets the ResultWriter for an output path.
+    :param output: path of the output.
+    :param output_format: csv, jsonl or parquet, derived from the extension of output if None.
+    :return: ResultWriter.
+    """
+    if output_format is None:
+        output_format = os.path.splitext(output)[1].lstrip(".").lower() or "csv"
+    if output_format not in RESULT_WRITERS:
+        raise ValueError(f"Unsupported output format {output_format}, use one of {', '.join(RESULT_WRITERS)}")
+    return RESULT_WRITERS[output_format](output)
+
+
+def batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def classify_documents(processor, documents, writer: ResultWriter, batch_size=16, report_interval=30.0):
+    """
+    Classifies documents in batches and writes the results, skipping documents that were already written.
+    :param processor: PDFDocumentProcessor.
+    :param documents: iterator of (key, callable returning the PDF bytes).
+    :param writer: ResultWriter.
+    :param batch_size: number of documents that are processed as a batch.
+    :param report_interval: seconds between two throughput reports.
+    :return: number of documents that were processed.
+    """
+    processed_keys = writer.processed_keys()
+    if processed_keys:
+        logger.info(f"Resuming, skipping {len(processed_keys)} already processed documents")
+
+    pending = ((key, read) for key, read in documents if key not in processed_keys)
+    processed = 0
+    start = last_report = time.perf_counter()
+
+    for batch in batched(pending, batch_size):
+        keys, pdf_bytes = [], []
+        rows = []
+        for key, read in batch:
+            try:
+                pdf_bytes.append(read())
+                keys.append(key)
+            except OSError as e:
+                rows.append(to_row(key, {"error": e}))
+
+        results = processor.process_documents(pdf_bytes)
+        rows.extend(to_row(key, data) for key, data in zip(keys, results))
+        writer.write(rows)
+        processed += len(rows)
+
+        now = time.perf_counter()
+        if now - last_report >= report_interval:
+            logger.info(f"Processed {processed} documents, {processed / (now - start):.1f} documents/s")
+            last_report = now
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Processed {processed} documents in {elapsed:.1f}s, {processed / max(elapsed, 1e-9):.1f} documents/s")
+    return processed
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Classify PDFs of a directory, glob pattern, tar or zip archive.")
+    parser.add_argument("source", help="directory, glob pattern, tar or zip archive with PDFs")
+    parser.add_argument("output", help="CSV or JSONL file or Parquet directory, appended to when resuming")
+    parser.add_argument("--format", choices=list(RESULT_WRITERS), help="output format, derived from output if unset")
+    parser.add_argument(
+        "--model", default=os.getenv("MODEL", "EFFICIENTNET"), help="EFFICIENTNET, EFFICIENTDET, EFFICIENTDET_EFFICIENTNET or the _ONNX variants"
+    )
+    parser.add_argument("--models-directory", default=DEFAULT_MODELS_DIRECTORY)
+    parser.add_argument("--min-confidence", type=float, default=float(os.getenv("MIN_CONFIDENCE", 0.5)))
+    parser.add_argument("--precision", choices=PRECISIONS, default=os.getenv("INFERENCE_PRECISION", FLOAT32))
+    parser.add_argument("--batch-size", type=int, default=16, help="documents per model call")
+    parser.add_argument("--render-workers", type=int, default=os.cpu_count(), help="PDFs rendered in parallel")
+    parser.add_argument("--render-timeout", type=float, help="seconds after which rendering a PDF is aborted")
+    parser.add_argument("--max-pdf-pages", type=int, help="PDFs with more pages are rejected")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="seconds between throughput reports")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    # Created before the models are loaded so that an unusable output fails fast
+    writer = get_result_writer(args.output, args.format)
+    configure_inference(args.precision)
+    pipeline_builder, model_directory = get_pipeline_builder(args.model, args.models_directory)
+    processor = PDFDocumentProcessor(
+        pipeline_builder,
+        model_directory=model_directory,
+        min_confidence=args.min_confidence,
+        render_workers=args.render_workers,
+        render_timeout=args.render_timeout,
+        max_pdf_pages=args.max_pdf_pages,
+    )
+    classify_documents(processor, iter_documents(args.source), writer, args.batch_size, args.report_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from document_processor.metrics import metrics
+
+abandoned_requests = metrics.counter(
+    "abandoned_requests_total",
+    "Requests that stopped processing early by reason (timeout, cancelled).",
+)
+
+
+class DeadlineExceededError(TimeoutError):
+    """
+    Raised when a request ran out of time or was cancelled before it was processed.
+    """
+    pass
+
+
+class Deadline:
+    """
+    Point in time until which a request may be processed, which can also be cancelled early,
+    e.g. when the client disconnects. It is passed through the pipeline under data["deadline"]
+    and checked between the nodes so that abandoned requests stop consuming CPU.
+    """
+    def __init__(self, timeout=None):
+        """
+        Initializes a Deadline.
+        :param timeout: Seconds from now until the deadline, None for no time limit.
+        """
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def remaining(self):
+        """
+        :return: Seconds until the deadline, 0 if it passed or was cancelled, None for no time limit.
+        """
+        if self.cancelled:
+            return 0.0
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self):
+        return self.remaining() == 0.0
+
+    def cancel(self):
+        """
+        Cancels the request, it stops at the next check.
+        """
+        self._cancelled.set()
+
+    def check(self):
+        """
+        Raises DeadlineExceededError if the deadline passed or was cancelled.
+        """
+        if self.cancelled:
+            abandoned_requests.inc(reason="cancelled")
+            raise DeadlineExceededError("Request was cancelled")
+        if self.expired:
+            abandoned_requests.inc(reason="timeout")
+            raise DeadlineExceededError("Request deadline exceeded")
+
+
+def check_deadline(data: dict):
+    """
+    Checks the deadline of a document, if it has one.
+    :param data: Dictionary containing the document and other data.
+    """
+    deadline = data.get("deadline")
+    if deadline is not None:
+        deadline.check()
@@ -0,0 +1,326 @@
+import gc
+import inspect
+import os
+import resource
+import tempfile
+import threading
+import tracemalloc
+
+from document_processor.logger import logger
+from document_processor.pipeline.buffer_pool import buffer_pool
+from document_processor.pipeline.pdf_to_image_converter import PdfToImageConverter
+from document_processor.pipeline.pipeline_nodes import DocumentProcessingNode
+
+
+def all_subclasses(cls):
+    """
+    :param cls: Class.
+    :return: The class and all its direct and indirect subclasses.
+    """
+    classes = [cls]
+    for subclass in cls.__subclasses__():
+        classes.extend(all_subclasses(subclass))
+    return classes
+
+
+def get_method_lines(classes):
+    """
+    Maps the source lines of the methods of classes to the classes, so that an allocation can be attributed
+    to the pipeline node whose code made it.
+    :param classes: Classes whose methods are mapped.
+    :return: dict of file name to list of (first line, last line, class name).
+    """
+    method_lines = {}
+    for cls in classes:
+        for attribute in vars(cls).values():
+            function = getattr(attribute, "__func__", attribute)
+            if not inspect.isfunction(function):
+                continue
+            try:
+                lines, first_line = inspect.getsourcelines(function)
+            except (OSError, TypeError):
+                continue
+            method_lines.setdefault(function.__code__.co_filename, []).append(
+                (first_line, first_line + len(lines) - 1, cls.__name__)
+            )
+    return method_lines
+
+
+def read_proc_status(path="/proc/self/status"):
+    """
+    Reads the memory of the process from /proc.
+    :param path: Path of the status file.
+    :return: dict with the current and peak RSS in MiB, empty if /proc is not available.
+    """
+    fields = {"VmRSS": "rss_mb", "VmHWM": "peak_rss_mb"}
+    status = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    # Values are given in kB
+                    status[fields[key]] = round(int(value.split()[0]) / 2 ** 10, 1)
+    except OSError:
+        pass
+    return status
+
+
+def read_mapped_files(path="/proc/self/smaps"):
+    """
+    Reads the memory of the files the process memory-mapped from /proc.
+    :param path: Path of the smaps file.
+    :return: dict of file path to its resident (rss_mb), proportional (pss_mb) and shared (shared_mb) memory in MiB,
+        empty if /proc is not available.
+    """
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb"}
+    mapped_files = {}
+    mapping = None
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if " " not in key:
+                    if mapping is not None and key in fields:
+                        # Values are given in kB
+                        mapping[fields[key]] += int(value.split()[0])
+                    continue
+                # Header of a mapping: address, permissions, offset, device, inode and the path if it maps a file
+                header = line.split(maxsplit=5)
+                file_path = header[5].strip() if len(header) == 6 else ""
+                if file_path.startswith("/"):
+                    mapping = mapped_files.setdefault(file_path, {"rss_mb": 0, "pss_mb": 0, "shared_mb": 0})
+                else:
+                    mapping = None
+    except OSError:
+        return {}
+    return {
+        file_path: {key: round(value / 2 ** 10, 1) for key, value in mapping.items()}
+        for file_path, mapping in mapped_files.items()
+    }
+
+
+def get_model_footprint(footprints, smaps_path="/proc/self/smaps"):
+    """
+    Adds the resident memory of the weights to the footprints of the models of the worker.
+    Weights in the heap are resident in full and private to the worker. Of memory-mapped weights only the pages
+    that were read are resident and they are shared with the other workers that map the same file,
+    so a worker is charged its proportional share (PSS). Weights expanded from a memory-mapped file into the heap,
+    reported as heap_weights_mb, count in full as well.
+    :param footprints: dict of model name to the footprints of its nodes returned by DocumentProcessor.get_footprint.
+    :param smaps_path: Path of the smaps file.
+    :return: dict with the footprints by model and the resident MiB of the weights of all models.
+    """
+    mapped_files = read_mapped_files(smaps_path)
+    resident = 0.0
+    models = {}
+    for name, nodes in footprints.items():
+        models[name] = []
+        for footprint in nodes:
+            footprint = dict(footprint)
+            if footprint["memory_mapped"]:
+                mapping = mapped_files.get(footprint["path"], {"rss_mb": 0.0, "pss_mb": 0.0, "shared_mb": 0.0})
+                footprint.update(mapping)
+                footprint["resident_mb"] = mapping["pss_mb"]
+            else:
+                footprint["resident_mb"] = footprint["weights_mb"]
+            if footprint.get("heap_weights_mb"):
+                footprint["resident_mb"] = round((footprint["resident_mb"] or 0.0) + footprint["heap_weights_mb"], 1)
+            resident += footprint["resident_mb"] or 0.0
+            models[name].append(footprint)
+    return {"models": models, "resident_mb": round(resident, 1)}
+
+
+def count_open_files(fd_directory="/proc/self/fd"):
+    """
+    Counts the open file descriptors of the process by type.
+    :param fd_directory: Directory with the file descriptors of the process.
+    :return: dict of type (file, temp_file, socket, pipe, other) to count, empty if /proc is not available.
+    """
+    temp_directory = tempfile.gettempdir()
+    counts = {"file": 0, "temp_file": 0, "socket": 0, "pipe": 0, "other": 0}
+    try:
+        descriptors = os.listdir(fd_directory)
+    except OSError:
+        return {}
+    for descriptor in descriptors:
+        try:
+            target = os.readlink(os.path.join(fd_directory, descriptor))
+        except OSError:
+            # Closed while listing, e.g. the descriptor of listdir itself
+            continue
+        if target.startswith("socket:"):
+            counts["socket"] += 1
+        elif target.startswith("pipe:"):
+            counts["pipe"] += 1
+        elif target.startswith(temp_directory + os.sep):
+            counts["temp_file"] += 1
+        elif target.startswith("/"):
+            counts["file"] += 1
+        else:
+            counts["other"] += 1
+    return counts
+
+
+def get_temp_directory_usage(directory=None):
+    """
+    Measures the temporary directory, where poppler renders into and leftovers of killed renders remain.
+    :param directory: Directory to measure, the temporary directory of the process if None.
+    :return: dict with the directory, the number of files and their size in MiB.
+    """
+    directory = directory or tempfile.gettempdir()
+    files, size = 0, 0
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            try:
+                size += os.stat(os.path.join(root, file_name)).st_size
+                files += 1
+            except OSError:
+                continue
+    return {"directory": directory, "files": files, "size_mb": round(size / 2 ** 20, 1)}
+
+
+def get_tf_allocator_stats():
+    """
+    Gets the current and peak memory of the TensorFlow allocator of every device that reports it.
+    :return: dict of device to stats in MiB, devices that do not report their memory, e.g. CPUs, are left out.
+    """
+    import tensorflow as tf
+
+    stats = {}
+    for device in tf.config.list_logical_devices():
+        try:
+            info = tf.config.experimental.get_memory_info(device.name)
+        except (ValueError, RuntimeError):
+            continue
+        stats[device.name] = {key: round(value / 2 ** 20, 1) for key, value in info.items()}
+    return stats
+
+
+class MemoryDiagnostics:
+    """
+    Reports the memory of a long-running worker, and with tracing started the Python allocations
+    that grew since then by the pipeline node that made them.
+    Tracing slows down allocations, so it only runs while it is started.
+    """
+    def __init__(self):
+        """
+        Initializes MemoryDiagnostics.
+        """
+        self.baseline = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start_tracing(self, frames=25):
+        """
+        Starts tracing allocations and takes the snapshot that later reports are compared to.
+        :param frames: Number of frames stored per allocation, enough to reach the pipeline node.
+        """
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            tracemalloc.start(frames)
+            self.baseline = self.take_snapshot()
+        logger.info(f"Started tracing allocations with {frames} frames")
+
+    def stop_tracing(self):
+        """
+        Stops tracing allocations and frees the traces.
+        """
+        with self._lock:
+            tracemalloc.stop()
+            self.baseline = None
+        logger.info("Stopped tracing allocations")
+
+    @staticmethod
+    def take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+    @staticmethod
+    def attribute(traceback, method_lines):
+        """
+        Attributes an allocation to the innermost pipeline node or converter in its traceback.
+        :param traceback: tracemalloc.Traceback of the allocation, from the oldest to the most recent frame.
+        :param method_lines: Source lines of the methods returned by get_method_lines.
+        :return: Name of the class or "other".
+        """
+        for frame in reversed(traceback):
+            for first_line, last_line, class_name in method_lines.get(frame.filename, ()):
+                if first_line <= frame.lineno <= last_line:
+                    return class_name
+        return "other"
+
+    def get_growth_by_node(self, top=10):
+        """
+        Groups the allocations that grew since tracing started by pipeline node.
+        :param top: Number of allocation sites reported per node.
+        :return: list of dicts with the node, the growth in KiB and allocations and its top sites, largest first.
+        """
+        with self._lock:
+            if self.baseline is None:
+                return []
+            statistics = self.take_snapshot().compare_to(self.baseline, "traceback")
+
+        method_lines = get_method_lines(all_subclasses(DocumentProcessingNode) + all_subclasses(PdfToImageConverter))
+        nodes = {}
+        for statistic in statistics:
+            if statistic.size_diff == 0:
+                continue
+            node = nodes.setdefault(
+                self.attribute(statistic.traceback, method_lines), {"size_diff": 0, "count_diff": 0, "sites": []}
+            )
+            node["size_diff"] += statistic.size_diff
+            node["count_diff"] += statistic.count_diff
+            frame = statistic.traceback[-1]
+            node["sites"].append((statistic.size_diff, f"{frame.filename}:{frame.lineno}"))
+
+        growth = []
+        for name, node in sorted(nodes.items(), key=lambda item: item[1]["size_diff"], reverse=True):
+            sites = sorted(node["sites"], key=lambda site: abs(site[0]), reverse=True)[:top]
+            growth.append({
+                "node": name,
+                "size_diff_kb": round(node["size_diff"] / 2 ** 10, 1),
+                "count_diff": node["count_diff"],
+                "top_sites": [{"site": site, "size_diff_kb": round(size / 2 ** 10, 1)} for size, site in sites],
+            })
+        return growth
+
+    def report(self, top=10):
+        """
+        Reports the memory of the process.
+        :param top: Number of allocation sites reported per node.
+        :return: dict that can be serialized to JSON.
+        """
+        report = {
+            "process": {
+                **read_proc_status(),
+                # Fallback for systems without /proc, ru_maxrss is in KiB on Linux
+                "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10, 1),
+                "threads": threading.active_count(),
+                "gc_objects": len(gc.get_objects()),
+                "gc_uncollectable": len(gc.garbage),
+            },
+            "open_files": count_open_files(),
+            "temp_directory": get_temp_directory_usage(),
+            "buffer_pool_mb": round(buffer_pool.idle_bytes / 2 ** 20, 1),
+            "tf_allocators": get_tf_allocator_stats(),
+            "tracemalloc": {"tracing": self.tracing},
+        }
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            report["tracemalloc"].update({
+                "frames": tracemalloc.get_traceback_limit(),
+                "traced_mb": round(current / 2 ** 20, 1),
+                "peak_traced_mb": round(peak / 2 ** 20, 1),
+                "growth_by_node": self.get_growth_by_node(top),
+            })
+        return report
+
+
+diagnostics = MemoryDiagnostics()
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+from document_processor.deadline import Deadline
 from document_processor.pipeline.builder import DocumentProcessorPipelineBuilder
 from document_processor.pipeline.pipeline import DocumentProcessorPipeline
 
@@ -18,15 +19,38 @@ class DocumentProcessor(ABC):
             pipeline_builder.build(**kwargs)
         )
 
+    def warm_up(self):
+        """
+        Warms up the pipeline so that the first request does not pay for lazy initialization.
+        """
+        self.document_processing_pipeline.warm_up()
+
+    def get_footprint(self):
+        """
+        Reports the memory of the model weights of the pipeline.
+        :return: list of the footprints of the nodes that have a model.
+        """
+        return self.document_processing_pipeline.get_footprint()
+
     @abstractmethod
-    def process_document(self, document):
+    def process_document(self, document, deadline: Deadline = None):
         """
         Processes a document with the pipeline.
         :param document: document to be processed.
+        :param deadline: Deadline after which processing is stopped, None for no time limit.
         :return: dict containing data.
         """
         pass
 
+    def process_documents(self, documents, deadline: Deadline = None):
+        """
+        Processes several documents with the pipeline, one by one by default.
+        :param documents: documents to be processed.
+        :param deadline: Deadline after which processing is stopped, None for no time limit.
+        :return: list of dicts containing data, in the same order.
+        """
+        return [self.process_document(document, deadline) for document in documents]
+
 
 class PDFDocumentProcessor(DocumentProcessor):
     """
@@ -40,12 +64,30 @@ class PDFDocumentProcessor(DocumentProcessor):
         """
         super().__init__(pipeline_builder, **kwargs)
 
-    def process_document(self, document):
+    def process_document(self, document, deadline: Deadline = None):
         """
         Processes a PDF document with the pipeline.
         :param document: PDF document to be processed.
+        :param deadline: Deadline after which processing is stopped, None for no time limit.
         :return: dict containing data.
+        :raises DeadlineExceededError: if the deadline passes or is cancelled before the document is processed.
         """
         data = {"pdf_bytes": document}
+        if deadline is not None:
+            data["deadline"] = deadline
         data = self.document_processing_pipeline.process_document(data)
         return data
+
+    def process_documents(self, documents, deadline: Deadline = None):
+        """
+        Processes several PDF documents with the pipeline as a batch.
+        :param documents: PDF documents to be processed.
+        :param deadline: Deadline after which processing is stopped, None for no time limit.
+        :return: list of dicts containing data, in the same order.
+            A document that failed contains the exception under "error".
+        """
+        data_list = [{"pdf_bytes": document} for document in documents]
+        if deadline is not None:
+            for data in data_list:
+                data["deadline"] = deadline
+        return self.document_processing_pipeline.process_documents(data_list)
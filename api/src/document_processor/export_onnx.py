@@ -0,0 +1,81 @@
+"""
+Command-line entry point to convert the TensorFlow models to ONNX for the EFFICIENTNET_ONNX and EFFICIENTDET_ONNX models.
+Requires tf2onnx, which is only needed for the conversion and not installed with the API.
+
+Example:
+    pip install tf2onnx
+    python -m document_processor.export_onnx EFFICIENTDET
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import tensorflow as tf
+
+from document_processor.logger import logger
+from document_processor.pipeline.builder import DEFAULT_MODELS_DIRECTORY, get_pipeline_builder
+
+OPSET = 13
+
+
+def export_effnet(model_directory, output_path, opset=OPSET):
+    """
+    Converts the Keras EffNet model to ONNX with a dynamic batch size.
+    :param model_directory: Directory of the Keras model.
+    :param output_path: Path of the .onnx file.
+    :param opset: ONNX opset.
+    """
+    import tf2onnx
+
+    model = tf.keras.models.load_model(model_directory)
+    input_signature = [tf.TensorSpec([None, 224, 224, 3], tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=input_signature, opset=opset, output_path=output_path)
+
+
+def export_effdet(model_directory, output_path, opset=OPSET):
+    """
+    Converts the serving signature of the EffDet SavedModel to ONNX.
+    The outputs keep the names of the signature, e.g. detection_scores.
+    :param model_directory: Directory of the SavedModel.
+    :param output_path: Path of the .onnx file.
+    :param opset: ONNX opset.
+    """
+    subprocess.run(
+        [
+            sys.executable, "-m", "tf2onnx.convert",
+            "--saved-model", model_directory,
+            "--signature_def", "serving_default",
+            "--opset", str(opset),
+            "--output", output_path,
+        ],
+        check=True,
+    )
+
+
+EXPORTS = {
+    "EFFICIENTNET": ("EFFICIENTNET_ONNX", export_effnet),
+    "EFFICIENTDET": ("EFFICIENTDET_ONNX", export_effdet),
+}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Convert a TensorFlow model to ONNX.")
+    parser.add_argument("model", choices=list(EXPORTS), help="model to convert")
+    parser.add_argument("--models-directory", default=DEFAULT_MODELS_DIRECTORY)
+    parser.add_argument("--opset", type=int, default=OPSET)
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    onnx_model, export = EXPORTS[args.model]
+    _, model_directory = get_pipeline_builder(args.model, args.models_directory)
+    _, output_path = get_pipeline_builder(onnx_model, args.models_directory)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    export(model_directory, output_path, args.opset)
+    logger.info(f"Exported {args.model} from {model_directory} to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Command-line entry point to convert the TensorFlow models to TensorFlow Lite for the EFFICIENTNET_TFLITE
+and EFFICIENTDET_TFLITE models, whose weights are memory-mapped and shared by the workers of a host.
+
+Quantization shrinks the weights:
+    DYNAMIC stores them as int8, 4 times smaller, and they stay memory-mapped.
+    FLOAT16 halves the file, but the weights are converted back to float32 in the heap of every worker,
+    so it only saves disk space.
+Pruning sets the given fraction of the EfficientNet weights with the smallest magnitude to zero and stores
+the pruned weights in a sparse format, which shrinks the file, but they are expanded into dense weights in the heap
+as well. GET /admin/diagnostics reports the expanded weights as heap_weights_mb. Check that a quantized or pruned
+model still classifies like the original, e.g. with TestTFLiteParity, before using it.
+
+Example:
+    python -m document_processor.export_tflite EFFICIENTNET --quantization DYNAMIC
+"""
+import argparse
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from document_processor.logger import logger
+from document_processor.pipeline.builder import DEFAULT_MODELS_DIRECTORY, get_pipeline_builder
+
+QUANTIZATIONS = ("NONE", "DYNAMIC", "FLOAT16")
+
+
+def configure_converter(converter, quantization="NONE", sparse=False):
+    """
+    Configures the optimizations of a converter.
+    :param converter: tf.lite.TFLiteConverter.
+    :param quantization: NONE, DYNAMIC or FLOAT16.
+    :param sparse: Whether to store pruned weights in a sparse format.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Invalid quantization {quantization}, use one of {', '.join(QUANTIZATIONS)}")
+    optimizations = []
+    if quantization != "NONE":
+        optimizations.append(tf.lite.Optimize.DEFAULT)
+    if quantization == "FLOAT16":
+        converter.target_spec.supported_types = [tf.float16]
+    if sparse:
+        optimizations.append(tf.lite.Optimize.EXPERIMENTAL_SPARSITY)
+    converter.optimizations = optimizations
+
+
+def prune_weights(model, sparsity):
+    """
+    Sets the weights of the kernels of a model with the smallest magnitude to zero, biases and
+    normalization parameters are kept.
+    :param model: Keras model.
+    :param sparsity: Fraction of the weights of every kernel that is set to zero.
+    :return: Fraction of the weights of the kernels that is zero.
+    """
+    if not 0 <= sparsity < 1:
+        raise ValueError("sparsity must be at least 0 and less than 1")
+    zeros, total = 0, 0
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if not weights:
+            continue
+        for weight in weights:
+            if weight.ndim < 2:
+                continue
+            threshold = np.quantile(np.abs(weight), sparsity)
+            weight[np.abs(weight) < threshold] = 0
+            zeros += np.count_nonzero(weight == 0)
+            total += weight.size
+        layer.set_weights(weights)
+    return zeros / total if total else 0.0
+
+
+def export_effnet(model_directory, output_path, quantization="NONE", sparsity=0.0):
+    """
+    Converts the Keras EffNet model to TensorFlow Lite with a dynamic batch size.
+    :param model_directory: Directory of the Keras model.
+    :param output_path: Path of the .tflite file.
+    :param quantization: NONE, DYNAMIC or FLOAT16.
+    :param sparsity: Fraction of the weights that is pruned, 0 to keep all of them.
+    """
+    model = tf.keras.models.load_model(model_directory)
+    if sparsity:
+        logger.info(f"Pruned the EffNet model to {prune_weights(model, sparsity):.0%} zero weights")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    configure_converter(converter, quantization, sparse=bool(sparsity))
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_effdet(model_directory, output_path, quantization="NONE", sparsity=0.0):
+    """
+    Converts the serving signature of the EffDet SavedModel to TensorFlow Lite.
+    The post-processing of the detections uses TensorFlow ops, which TensorFlow Lite runs with the TensorFlow
+    installed with the API. The outputs keep the names of the signature, e.g. detection_scores.
+    :param model_directory: Directory of the SavedModel.
+    :param output_path: Path of the .tflite file.
+    :param quantization: NONE, DYNAMIC or FLOAT16.
+    :param sparsity: Must be 0, the weights of the SavedModel cannot be pruned.
+    """
+    if sparsity:
+        raise ValueError("Only the EfficientNet model can be pruned")
+    converter = tf.lite.TFLiteConverter.from_saved_model(model_directory, signature_keys=["serving_default"])
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    configure_converter(converter, quantization)
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+EXPORTS = {
+    "EFFICIENTNET": ("EFFICIENTNET_TFLITE", export_effnet),
+    "EFFICIENTDET": ("EFFICIENTDET_TFLITE", export_effdet),
+}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Convert a TensorFlow model to TensorFlow Lite.")
+    parser.add_argument("model", choices=list(EXPORTS), help="model to convert")
+    parser.add_argument("--models-directory", default=DEFAULT_MODELS_DIRECTORY)
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="NONE")
+    parser.add_argument("--sparsity", type=float, default=0.0,
+                        help="fraction of the EfficientNet weights that is pruned")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    tflite_model, export = EXPORTS[args.model]
+    _, model_directory = get_pipeline_builder(args.model, args.models_directory)
+    _, output_path = get_pipeline_builder(tflite_model, args.models_directory)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    export(model_directory, output_path, args.quantization, args.sparsity)
+    size = os.path.getsize(output_path) / 2 ** 20
+    logger.info(f"Exported {args.model} from {model_directory} to {output_path} ({size:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+
+import tensorflow as tf
+
+from document_processor.logger import logger
+
+FLOAT32 = "FLOAT32"
+MIXED_BFLOAT16 = "MIXED_BFLOAT16"
+PRECISIONS = (FLOAT32, MIXED_BFLOAT16)
+
+# CPU flags of the instructions that compute in bfloat16 natively, without them bfloat16 is emulated and slower
+BFLOAT16_CPU_FLAGS = {"avx512_bf16", "amx_bf16"}
+
+
+def cpu_flags(cpuinfo_path="/proc/cpuinfo"):
+    """
+    Reads the flags of the CPU.
+    :param cpuinfo_path: Path of the cpuinfo file.
+    :return: set of flags, empty if they cannot be read.
+    """
+    try:
+        with open(cpuinfo_path) as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def cpu_supports_bfloat16(cpuinfo_path="/proc/cpuinfo"):
+    """
+    :param cpuinfo_path: Path of the cpuinfo file.
+    :return: Whether the CPU computes in bfloat16 natively.
+    """
+    return bool(cpu_flags(cpuinfo_path) & BFLOAT16_CPU_FLAGS)
+
+
+def onednn_enabled():
+    """
+    oneDNN is enabled by default on Linux x86 since TensorFlow 2.9 and disabled with TF_ENABLE_ONEDNN_OPTS=0,
+    which TensorFlow reads when it is imported, so it has to be set in the environment of the process.
+    :return: Whether the oneDNN optimizations are enabled.
+    """
+    return os.getenv("TF_ENABLE_ONEDNN_OPTS", "1").lower() not in ("0", "false")
+
+
+def get_bfloat16_rewrite_option():
+    """
+    TensorFlow 2.11 renamed the grappler option that rewrites to bfloat16 for oneDNN from auto_mixed_precision_mkl
+    to auto_mixed_precision_onednn_bfloat16. Unknown options are ignored without an error.
+    :return: Name of the option in the installed TensorFlow.
+    """
+    major, minor = (int(part) for part in tf.__version__.split(".")[:2])
+    return "auto_mixed_precision_onednn_bfloat16" if (major, minor) >= (2, 11) else "auto_mixed_precision_mkl"
+
+
+def get_optimizer_options(precision):
+    """
+    Gets the grappler options of an inference precision.
+    :param precision: FLOAT32 or MIXED_BFLOAT16.
+    :return: dict of grappler options.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Invalid precision {precision}, use one of {', '.join(PRECISIONS)}")
+    return {
+        # Precompute the parts of the graphs that do not depend on the input, e.g. the preprocessing constants
+        "constant_folding": True,
+        # Fuse e.g. convolutions with their bias and activation into single oneDNN kernels
+        "remapping": True,
+        # Rewrite the ops that are safe in bfloat16, softmax and the detection postprocessing stay in float32
+        get_bfloat16_rewrite_option(): precision == MIXED_BFLOAT16,
+    }
+
+
+def configure_inference(precision=FLOAT32):
+    """
+    Configures the graph optimizations that TensorFlow applies to the models.
+    They apply to the functions that are traced afterwards, so call this before the models are loaded.
+    Falls back to FLOAT32 if the CPU does not support bfloat16 or TensorFlow does not accept the bfloat16 rewrite.
+    :param precision: FLOAT32 or MIXED_BFLOAT16.
+    :return: Precision that is used.
+    """
+    if precision == MIXED_BFLOAT16 and not cpu_supports_bfloat16():
+        logger.warning("The CPU does not support bfloat16, falling back to FLOAT32 inference")
+        precision = FLOAT32
+    if precision == MIXED_BFLOAT16 and not onednn_enabled():
+        logger.warning("bfloat16 inference needs TF_ENABLE_ONEDNN_OPTS=1, falling back to FLOAT32 inference")
+        precision = FLOAT32
+
+    tf.config.optimizer.set_experimental_options(get_optimizer_options(precision))
+    if precision == MIXED_BFLOAT16 and not tf.config.optimizer.get_experimental_options().get(
+        get_bfloat16_rewrite_option()
+    ):
+        logger.warning(
+            f"TensorFlow {tf.__version__} ignored the {get_bfloat16_rewrite_option()} option, "
+            f"falling back to FLOAT32 inference"
+        )
+        precision = FLOAT32
+        tf.config.optimizer.set_experimental_options(get_optimizer_options(precision))
+    logger.info(f"Using {precision} inference, oneDNN {'enabled' if onednn_enabled() else 'disabled'}")
+    return precision
@@ -0,0 +1,131 @@
+"""
+Command-line entry point of an inference worker for the REMOTE model, which classifies the images
+that API instances rendered so that rendering and inference can be scaled independently.
+Speaks the protocol of document_processor.pipeline.remote_nodes.
+
+Example:
+    python -m document_processor.inference_worker --model EFFICIENTNET --port 8500
+"""
+import argparse
+import os
+import socketserver
+
+from document_processor.inference_config import FLOAT32, PRECISIONS, configure_inference
+from document_processor.logger import logger
+from document_processor.pipeline.builder import DEFAULT_MODELS_DIRECTORY, get_pipeline_builder
+from document_processor.pipeline.pipeline import DocumentProcessorPipeline
+from document_processor.pipeline.pipeline_nodes import EffNetDocumentClassifierNode
+from document_processor.pipeline.remote_nodes import DEFAULT_PORT, batch_to_images, recv_message, send_message
+
+
+def build_inference_pipeline(pipeline_builder, **kwargs):
+    """
+    Builds the pipeline of a model without its PDF to image conversion.
+    :param pipeline_builder: DocumentProcessorPipelineBuilder of the model.
+    :param kwargs: kwargs for the Nodes.
+    :return: DocumentProcessorPipeline that classifies images.
+    """
+    pipeline = DocumentProcessorPipeline()
+    for node in pipeline_builder.build(**kwargs).processing_nodes[1:]:
+        pipeline.add_processing_node(node)
+    return pipeline
+
+
+def get_input_size(pipeline):
+    """
+    Gets the size every image is resized to, so that clients can resize the images before sending them.
+    :param pipeline: DocumentProcessorPipeline that classifies images.
+    :return: [width, height] or None if the images are used in their original size.
+    """
+    if len(pipeline.processing_nodes) == 1 and isinstance(pipeline.processing_nodes[0], EffNetDocumentClassifierNode):
+        return [224, 224]
+    return None
+
+
+class InferenceRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Handles the requests of a connection until the client closes it.
+    """
+    def handle(self):
+        while True:
+            try:
+                header, batch = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = self.server.handle_message(header, batch)
+            except Exception as e:
+                logger.exception("Inference request failed")
+                response = {"error": f"{type(e).__name__}: {e}"}
+            send_message(self.request, response)
+
+
+class InferenceServer(socketserver.ThreadingTCPServer):
+    """
+    TCP server that classifies the images it receives with a pipeline, one thread per connection.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, pipeline, model):
+        """
+        Initializes an InferenceServer and binds it to the address.
+        :param address: (host, port), port 0 binds to a free port.
+        :param pipeline: DocumentProcessorPipeline that classifies images.
+        :param model: Name of the model, reported to the clients.
+        """
+        super().__init__(address, InferenceRequestHandler)
+        self.pipeline = pipeline
+        self.model = model
+        self.input_size = get_input_size(pipeline)
+
+    def handle_message(self, header, batch):
+        """
+        Answers a request.
+        :param header: Header of the request, "op" is info or classify.
+        :param batch: Images of a classify request.
+        :return: Header of the response.
+        """
+        if header.get("op") == "info":
+            return {"model": self.model, "input_size": self.input_size}
+        if header.get("op") != "classify":
+            return {"error": f"Unknown operation {header.get('op')}"}
+
+        data_list = [{"image": image} for image in batch_to_images(batch, header["sizes"])]
+        results = []
+        for data in self.pipeline.process_documents(data_list):
+            if "error" in data:
+                results.append({"error": f"{type(data['error']).__name__}: {data['error']}"})
+            else:
+                results.append([data["document_type"], data["prediction_confidences"]])
+        return {"results": results}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Serve a model to API instances with the REMOTE model.")
+    parser.add_argument(
+        "--model", default=os.getenv("MODEL", "EFFICIENTNET"), help="EFFICIENTNET, EFFICIENTDET, EFFICIENTDET_EFFICIENTNET or the _ONNX variants"
+    )
+    parser.add_argument("--models-directory", default=DEFAULT_MODELS_DIRECTORY)
+    parser.add_argument("--min-confidence", type=float, default=float(os.getenv("MIN_CONFIDENCE", 0.5)))
+    parser.add_argument("--precision", choices=PRECISIONS, default=os.getenv("INFERENCE_PRECISION", FLOAT32))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    configure_inference(args.precision)
+    pipeline_builder, model_directory = get_pipeline_builder(args.model, args.models_directory)
+    pipeline = build_inference_pipeline(
+        pipeline_builder, model_directory=model_directory, min_confidence=args.min_confidence
+    )
+    pipeline.warm_up()
+    with InferenceServer((args.host, args.port), pipeline, args.model) as server:
+        logger.info(f"Serving {args.model} on {args.host}:{server.server_address[1]}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from document_processor.autoscaling import load_tracker
+from document_processor.logger import correlation_id, logger
+from document_processor.model_registry import ModelRegistry
+
+# Lower values are claimed first.
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobNotFoundError(KeyError):
+    """
+    Raised when a job does not exist.
+    """
+    pass
+
+
+class Job:
+    """
+    A claimed job with the document to be processed.
+    """
+    def __init__(self, job_id, model, document):
+        self.id = job_id
+        self.model = model
+        self.document = document
+
+
+class SQLiteJobQueue:
+    """
+    Persistent queue of classification jobs stored in SQLite.
+    Jobs survive restarts and several processes can drain the same queue,
+    claims are atomic because they run in an immediate transaction.
+    """
+    def __init__(self, path):
+        """
+        Initializes a SQLiteJobQueue and creates its table if needed.
+        :param path: Path of the SQLite database.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    model TEXT,
+                    filename TEXT,
+                    document BLOB,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created)"
+            )
+        # Is set whenever a job is submitted so that idle workers wake up immediately.
+        self.submitted = threading.Event()
+
+    def submit(self, document, filename=None, model=None, priority="normal"):
+        """
+        Adds a job to the queue.
+        :param document: PDF document to be classified.
+        :param filename: Name of the uploaded file.
+        :param model: Name of the model to classify with, the active model if None.
+        :param priority: "high", "normal" or "low".
+        :return: Id of the job.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority {priority}, use one of {', '.join(PRIORITIES)}")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO jobs (id, priority, status, model, filename, document, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, PRIORITIES[priority], PENDING, model, filename, document, time.time()),
+            )
+        self.submitted.set()
+        return job_id
+
+    def claim(self, limit=1):
+        """
+        Claims the pending jobs with the highest priority.
+        All claimed jobs use the same model so that they can be processed as one batch.
+        :param limit: Maximum number of jobs to claim.
+        :return: list of Jobs, empty if no job is pending.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                first = self._connection.execute(
+                    "SELECT model FROM jobs WHERE status = ? ORDER BY priority, created LIMIT 1", (PENDING,)
+                ).fetchone()
+                if first is None:
+                    self._connection.execute("COMMIT")
+                    return []
+                rows = self._connection.execute(
+                    "SELECT id, model, document FROM jobs WHERE status = ? AND model IS ? "
+                    "ORDER BY priority, created LIMIT ?",
+                    (PENDING, first["model"], limit),
+                ).fetchall()
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE jobs SET status = ?, started = ? WHERE id = ?",
+                    [(RUNNING, now, row["id"]) for row in rows],
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return [Job(row["id"], row["model"], row["document"]) for row in rows]
+
+    def complete(self, job_id, result: dict):
+        """
+        Stores the result of a job and drops its document.
+        :param job_id: Id of the job.
+        :param result: JSON serializable result.
+        """
+        self._finish(job_id, DONE, result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        """
+        Marks a job as failed and drops its document.
+        :param job_id: Id of the job.
+        :param error: Description of the error.
+        """
+        self._finish(job_id, FAILED, error=str(error))
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, document = NULL WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def get(self, job_id):
+        """
+        Gets the status of a job.
+        :param job_id: Id of the job.
+        :return: dict with the status, timestamps, filename, result and error of the job.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, priority, status, model, filename, result, error, created, started, finished "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            raise JobNotFoundError(job_id)
+        job = dict(row)
+        job["result"] = None if job["result"] is None else json.loads(job["result"])
+        return job
+
+    def count(self, status=PENDING):
+        """
+        :param status: Status of the jobs to count.
+        :return: Number of jobs with the given status.
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def requeue_running(self, older_than):
+        """
+        Puts jobs that were claimed too long ago back into the queue, e.g. because the process that claimed them
+        stopped. Jobs that other processes draining the same queue are still working on are left alone
+        as long as no batch takes longer than older_than.
+        :param older_than: Seconds since a job was claimed after which it is requeued.
+        :return: Number of requeued jobs.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = ?, started = NULL WHERE status = ? AND started < ?",
+                (PENDING, RUNNING, time.time() - older_than),
+            )
+        return cursor.rowcount
+
+    def purge(self, older_than):
+        """
+        Deletes finished jobs.
+        :param older_than: Seconds since a job finished after which it is deleted.
+        :return: Number of deleted jobs.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, FAILED, time.time() - older_than)
+            )
+        return cursor.rowcount
+
+
+class JobWorkerPool:
+    """
+    Threads that drain a SQLiteJobQueue by processing claimed jobs in batches.
+    """
+    def __init__(self, job_queue: SQLiteJobQueue, registry: ModelRegistry, workers=1, batch_size=8,
+                 poll_interval=1.0, retention=24 * 60 * 60, lease_timeout=10 * 60):
+        """
+        Initializes a JobWorkerPool.
+        :param job_queue: SQLiteJobQueue to drain.
+        :param registry: ModelRegistry with the models to process the jobs with.
+        :param workers: Number of worker threads.
+        :param batch_size: Maximum number of jobs processed as one batch.
+        :param poll_interval: Seconds an idle worker waits before checking the queue again,
+            jobs submitted by other processes are picked up after at most this long.
+        :param retention: Seconds finished jobs are kept.
+        :param lease_timeout: Seconds after which a claimed job that is not finished is requeued,
+            must be longer than the processing of a batch takes.
+        """
+        self.job_queue = job_queue
+        self.registry = registry
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lease_timeout = lease_timeout
+        self._stopped = threading.Event()
+        self._threads = [
+            threading.Thread(target=self.run, name=f"job-worker-{i}", daemon=True) for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.job_queue.submitted.set()
+
+    def process_jobs(self, jobs):
+        """
+        Processes a batch of claimed jobs and stores their results.
+        :param jobs: Jobs that use the same model.
+        """
+        try:
+            with self.registry.lease(jobs[0].model) as processor, load_tracker.processing_slot(len(jobs)):
+                results = processor.process_documents([job.document for job in jobs])
+        except Exception as e:
+            logger.error(f"Processing {len(jobs)} jobs failed: {e}")
+            for job in jobs:
+                self.job_queue.fail(job.id, e)
+            return
+
+        for job, data in zip(jobs, results):
+            if "error" in data:
+                self.job_queue.fail(job.id, data["error"])
+            else:
+                self.job_queue.complete(job.id, {
+                    "document_type": data.get("document_type"),
+                    "prediction_confidences": data.get("prediction_confidences"),
+                })
+
+    def run_once(self):
+        """
+        Claims and processes one batch of jobs.
+        :return: Number of processed jobs.
+        """
+        jobs = self.job_queue.claim(self.batch_size)
+        if jobs:
+            token = correlation_id.set(",".join(job.id for job in jobs))
+            try:
+                self.process_jobs(jobs)
+            finally:
+                correlation_id.reset(token)
+        return len(jobs)
+
+    def maintain(self):
+        """
+        Requeues jobs whose lease expired and deletes finished jobs after the retention.
+        """
+        if requeued := self.job_queue.requeue_running(self.lease_timeout):
+            logger.info(f"Requeued {requeued} jobs that were claimed more than {self.lease_timeout}s ago")
+        self.job_queue.purge(self.retention)
+
+    def run(self):
+        last_maintenance = 0.0
+        while not self._stopped.is_set():
+            try:
+                processed = self.run_once()
+                if time.monotonic() - last_maintenance > self.poll_interval * 60:
+                    self.maintain()
+                    last_maintenance = time.monotonic()
+            except Exception as e:
+                logger.error(f"Job worker failed: {e}")
+                processed = 0
+            if not processed:
+                self.job_queue.submitted.wait(self.poll_interval)
+                self.job_queue.submitted.clear()
@@ -1,11 +1,92 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+
+# Retrieve logging configuration from environment variables.
+log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+# TEXT for human readable logs, JSON for one JSON object per line.
+log_format = os.getenv("LOG_FORMAT", "TEXT").upper()
+# Fraction of the DEBUG records that is kept.
+debug_sample_rate = float(os.getenv("DEBUG_LOG_SAMPLE_RATE", 1))
+
+# Id of the request that is being handled, set by the API for every request.
+correlation_id = contextvars.ContextVar("correlation_id", default="-")
+
+
+class CorrelationIdFilter(logging.Filter):
+    """
+    Adds the correlation id of the current request to a record.
+    """
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the DEBUG records.
+    """
+    def __init__(self, sample_rate):
+        """
+        Initializes a DebugSamplingFilter.
+        :param sample_rate: Fraction of the DEBUG records that is kept.
+        """
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a single line JSON object.
+    """
+    def format(self, record):
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+
+class ExceptionQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback of a record apart from its message.
+    QueueHandler.prepare appends the traceback to the message, so JsonFormatter could not put it into its own field.
+    """
+    def prepare(self, record):
+        """
+        Merges the arguments into the message and formats the traceback into exc_text,
+        the traceback itself is dropped because it cannot be pickled and keeps the frames alive.
+        :param record: Record to be queued.
+        :return: Copy of the record.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
 
-# Retrieve log level from environment variable.
-log_level = os.environ['LOG_LEVEL'].upper()
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(log_level)
 
 # Add a FileHandler to the logger.
 # log_file = '/app/logfiles/log.txt'
@@ -17,7 +98,22 @@ logger.setLevel(logging.DEBUG)
 
 c_handler = logging.StreamHandler()
 c_handler.setLevel(log_level)
-c_format = logging.Formatter('%(levelname)s - %(message)s')
+if log_format == "JSON":
+    c_format = JsonFormatter()
+else:
+    c_format = logging.Formatter('%(levelname)s - %(correlation_id)s - %(message)s')
 
 c_handler.setFormatter(c_format)
-logger.addHandler(c_handler)
\ No newline at end of file
+
+# Records are put on a queue and written by a background thread,
+# so that logging never blocks a request on I/O.
+log_queue = queue.SimpleQueue()
+q_handler = ExceptionQueueHandler(log_queue)
+q_handler.addFilter(CorrelationIdFilter())
+if debug_sample_rate < 1:
+    q_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+logger.addHandler(q_handler)
+
+q_listener = logging.handlers.QueueListener(log_queue, c_handler, respect_handler_level=True)
+q_listener.start()
+atexit.register(q_listener.stop)
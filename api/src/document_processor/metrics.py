@@ -0,0 +1,177 @@
+import bisect
+import threading
+
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    Base class for a thread-safe metric with optional labels.
+    """
+    type = None
+
+    def __init__(self, name, description):
+        """
+        Initializes a Metric.
+        :param name: Name of the metric.
+        :param description: Description of the metric.
+        """
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels)) + "}"
+
+    def samples(self):
+        """
+        :return: list of (name, labels, value) samples of the metric.
+        """
+        raise NotImplementedError
+
+    def render(self):
+        """
+        Renders the metric in the Prometheus text format.
+        :return: str.
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{self.format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    Metric that only goes up.
+    """
+    type = "counter"
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.items()), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """
+    Metric that can go up and down.
+    """
+    type = "gauge"
+
+    def __init__(self, name, description):
+        super().__init__(name, description)
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(labels.items())] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.items()), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """
+    Metric that counts observations in buckets.
+    """
+    type = "histogram"
+
+    def __init__(self, name, description, buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts, sum, count]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels):
+        return self._values.get(tuple(labels.items()), (None, 0.0, 0))[2]
+
+    def sum(self, **labels):
+        return self._values.get(tuple(labels.items()), (None, 0.0, 0))[1]
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bucket, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", key + (("le", bucket),), cumulative))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Registry of all metrics of the service.
+    """
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, description, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, description, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, description):
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description):
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name, description, buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text format.
+        :return: str.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,254 @@
+import gc
+import os
+import threading
+from contextlib import contextmanager
+
+from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.logger import logger
+from document_processor.pipeline.builder import DocumentProcessorPipelineBuilder
+
+
+class ModelNotFoundError(KeyError):
+    """
+    Raised when a model is requested that is not loaded in the ModelRegistry.
+    """
+    pass
+
+
+class ModelEntry:
+    """
+    A loaded PDFDocumentProcessor together with the spec needed to rebuild it
+    and the number of requests currently using it.
+    """
+    def __init__(self, name, processor, pipeline_builder, build_kwargs):
+        """
+        Initializes a ModelEntry.
+        :param name: Name of the model in the registry.
+        :param processor: Loaded PDFDocumentProcessor.
+        :param pipeline_builder: PipelineBuilder that built the processor.
+        :param build_kwargs: Args that were passed to the pipeline_builder.
+        """
+        self.name = name
+        self.processor = processor
+        self.pipeline_builder = pipeline_builder
+        self.build_kwargs = build_kwargs
+        self.leases = 0
+        self.retired = False
+
+    @property
+    def model_directory(self):
+        return self.build_kwargs.get("model_directory")
+
+
+class ModelRegistry:
+    """
+    Registry of named PDFDocumentProcessors that are loaded side by side.
+    One of them is the active model that is used when a request does not select one.
+    Reloading a model builds and warms up a new processor before swapping it in,
+    requests that are still running on the old processor finish on it and
+    the old processor is released once the last of them is done.
+    """
+    def __init__(self):
+        """
+        Initializes an empty ModelRegistry.
+        """
+        self._entries: dict[str, ModelEntry] = {}
+        self._active_name = None
+        self._lock = threading.Lock()
+        # Serializes loads so that two reloads of a model do not race each other.
+        self._load_lock = threading.Lock()
+
+    @property
+    def active_name(self):
+        return self._active_name
+
+    def names(self):
+        """
+        :return: Names of all loaded models.
+        """
+        with self._lock:
+            return list(self._entries)
+
+    def load(self, name, pipeline_builder: DocumentProcessorPipelineBuilder, **kwargs):
+        """
+        Builds and warms up a processor and registers it under the given name.
+        If a model with that name is already loaded it is atomically replaced.
+        :param name: Name of the model in the registry.
+        :param pipeline_builder: PipelineBuilder that will build the DocumentProcessorPipeline.
+        :param kwargs: Args to be used by the pipeline_builder.
+        """
+        with self._load_lock:
+            logger.info(f"Loading model {name}")
+            processor = PDFDocumentProcessor(pipeline_builder, **kwargs)
+            processor.warm_up()
+            self.register(name, processor, pipeline_builder, **kwargs)
+            logger.info(f"Model {name} is loaded")
+
+    def register(self, name, processor, pipeline_builder=None, **kwargs):
+        """
+        Registers an already loaded processor under the given name.
+        :param name: Name of the model in the registry.
+        :param processor: Loaded PDFDocumentProcessor.
+        :param pipeline_builder: PipelineBuilder that built the processor, needed for reloads.
+        :param kwargs: Args that were passed to the pipeline_builder.
+        """
+        entry = ModelEntry(name, processor, pipeline_builder, kwargs)
+        with self._lock:
+            old_entry = self._entries.get(name)
+            self._entries[name] = entry
+            if self._active_name is None:
+                self._active_name = name
+        if old_entry is not None:
+            self._retire(old_entry)
+
+    def reload(self, name):
+        """
+        Rebuilds a model from its original spec and swaps it in after warm-up.
+        :param name: Name of the model in the registry.
+        """
+        entry = self._get_entry(name)
+        if entry.pipeline_builder is None:
+            raise ValueError(f"Model {name} was registered without a pipeline builder and cannot be reloaded")
+        self.load(name, entry.pipeline_builder, **entry.build_kwargs)
+
+    def unload(self, name):
+        """
+        Removes a model from the registry. The active model cannot be unloaded.
+        :param name: Name of the model in the registry.
+        """
+        with self._lock:
+            if name == self._active_name:
+                raise ValueError(f"Model {name} is active and cannot be unloaded")
+            entry = self._entries.pop(name, None)
+        if entry is None:
+            raise ModelNotFoundError(name)
+        self._retire(entry)
+
+    def activate(self, name):
+        """
+        Makes the given model the one used by requests that do not select a model.
+        :param name: Name of the model in the registry.
+        """
+        with self._lock:
+            if name not in self._entries:
+                raise ModelNotFoundError(name)
+            self._active_name = name
+        logger.info(f"Model {name} is now active")
+
+    def get(self, name=None):
+        """
+        Gets the processor of a model without leasing it.
+        :param name: Name of the model, the active model if None.
+        :return: PDFDocumentProcessor.
+        """
+        return self._get_entry(name).processor
+
+    @contextmanager
+    def lease(self, name=None):
+        """
+        Leases the processor of a model for the duration of a request.
+        The processor is not released while it is leased, even if it is swapped out.
+        :param name: Name of the model, the active model if None.
+        :return: PDFDocumentProcessor.
+        """
+        with self._lock:
+            entry = self._get_entry_locked(name)
+            entry.leases += 1
+        try:
+            yield entry.processor
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                release = entry.retired and entry.leases == 0
+            if release:
+                self._release(entry)
+
+    def _get_entry(self, name):
+        with self._lock:
+            return self._get_entry_locked(name)
+
+    def _get_entry_locked(self, name):
+        if name is None:
+            name = self._active_name
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ModelNotFoundError(name)
+        return entry
+
+    def _retire(self, entry):
+        with self._lock:
+            entry.retired = True
+            release = entry.leases == 0
+        if release:
+            self._release(entry)
+        else:
+            logger.info(f"Old {entry.name} model is released once {entry.leases} in-flight requests finish")
+
+    def _release(self, entry):
+        entry.processor = None
+        gc.collect()
+        logger.info(f"Released old {entry.name} model")
+
+
+class ModelDirectoryWatcher(threading.Thread):
+    """
+    Thread that polls the model directories of a ModelRegistry and
+    reloads a model when its files change.
+    """
+    def __init__(self, registry: ModelRegistry, interval=5.0):
+        """
+        Initializes a ModelDirectoryWatcher.
+        :param registry: ModelRegistry whose models are watched.
+        :param interval: Seconds between two polls.
+        """
+        super().__init__(name="model-directory-watcher", daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._mtimes = {}
+
+    @staticmethod
+    def directory_mtime(directory):
+        """
+        Gets the latest modification time of any file in a directory.
+        :param directory: Directory to be checked.
+        :return: Latest modification time or None if the directory does not exist.
+        """
+        if directory is None or not os.path.exists(directory):
+            return None
+        latest = os.path.getmtime(directory)
+        for root, _, files in os.walk(directory):
+            for file in files:
+                try:
+                    latest = max(latest, os.path.getmtime(os.path.join(root, file)))
+                except OSError:
+                    # The file was removed while the trainer was exporting.
+                    pass
+        return latest
+
+    def check(self):
+        """
+        Reloads every model whose directory changed since the last check.
+        """
+        for name in self.registry.names():
+            try:
+                directory = self.registry._get_entry(name).model_directory
+            except ModelNotFoundError:
+                continue
+            mtime = self.directory_mtime(directory)
+            previous = self._mtimes.get(name)
+            self._mtimes[name] = mtime
+            if previous is None or mtime is None or mtime == previous:
+                continue
+            logger.info(f"Files of model {name} changed, reloading")
+            try:
+                self.registry.reload(name)
+            except Exception as e:
+                logger.error(f"Reloading model {name} failed, keeping the old model: {e}")
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
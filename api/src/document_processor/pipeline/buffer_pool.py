@@ -0,0 +1,118 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from ..metrics import metrics
+
+buffer_pool_requests = metrics.counter(
+    "buffer_pool_requests_total",
+    "Preprocessing buffers taken from the pool by result (hit reused a buffer, miss allocated one).",
+)
+buffer_pool_bytes = metrics.gauge(
+    "buffer_pool_bytes",
+    "Bytes of the idle buffers kept in the pool.",
+)
+
+# Smallest bucket, smaller arrays are cheap to allocate but still share the buckets
+MIN_BUCKET_SIZE = 64 * 2 ** 10
+# Buffers are aligned for SIMD loads and so that TensorFlow can use them without copying
+ALIGNMENT = 64
+
+
+def bucket_size(nbytes):
+    """
+    Rounds a size up to its bucket. Buckets are multiples of an eighth of the enclosing power of two,
+    so a buffer wastes less than a quarter of its size and arrays of similar sizes share a bucket.
+    :param nbytes: Size of the array in bytes.
+    :return: Size of the buffer in bytes.
+    """
+    if nbytes <= MIN_BUCKET_SIZE:
+        return MIN_BUCKET_SIZE
+    step = 1 << max((nbytes - 1).bit_length() - 3, 0)
+    return -(-nbytes // step) * step
+
+
+class BufferPool:
+    """
+    Pool of reusable, aligned buffers that preprocessing writes the model inputs into,
+    so that sustained load does not allocate and free several megabytes per request.
+    Buffers are bucketed by size and are not zeroed when they are reused.
+    """
+    def __init__(self, max_bytes=128 * 2 ** 20, max_buffers_per_bucket=4):
+        """
+        Initializes a BufferPool.
+        :param max_bytes: Maximum bytes of idle buffers that are kept, larger returns are freed.
+        :param max_buffers_per_bucket: Maximum idle buffers kept per bucket, about the number of concurrent requests.
+        """
+        self.max_bytes = max_bytes
+        self.max_buffers_per_bucket = max_buffers_per_bucket
+        self._buckets = {}
+        self._idle_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def idle_bytes(self):
+        return self._idle_bytes
+
+    def acquire(self, nbytes):
+        """
+        Takes a buffer of at least nbytes from the pool or allocates one.
+        :param nbytes: Size of the buffer in bytes.
+        :return: Aligned uint8 array of the bucket size.
+        """
+        size = bucket_size(nbytes)
+        with self._lock:
+            buffers = self._buckets.get(size)
+            if buffers:
+                self._idle_bytes -= size
+                buffer_pool_bytes.dec(size)
+                buffer_pool_requests.inc(result="hit")
+                return buffers.pop()
+        buffer_pool_requests.inc(result="miss")
+        raw = np.empty(size + ALIGNMENT, dtype=np.uint8)
+        offset = -raw.ctypes.data % ALIGNMENT
+        return raw[offset:offset + size]
+
+    def release(self, buffer):
+        """
+        Returns a buffer to the pool, it is freed if the pool is full.
+        :param buffer: Buffer returned by acquire.
+        """
+        size = buffer.nbytes
+        with self._lock:
+            buffers = self._buckets.setdefault(size, [])
+            if len(buffers) >= self.max_buffers_per_bucket or self._idle_bytes + size > self.max_bytes:
+                return
+            buffers.append(buffer)
+            self._idle_bytes += size
+            buffer_pool_bytes.inc(size)
+
+    @contextmanager
+    def array(self, shape, dtype):
+        """
+        Lends an uninitialized array backed by a pooled buffer, it must not be used after the block.
+        :param shape: Shape of the array.
+        :param dtype: dtype of the array.
+        :return: Context manager of the array.
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        buffer = self.acquire(nbytes)
+        try:
+            yield buffer[:nbytes].view(dtype).reshape(shape)
+        finally:
+            self.release(buffer)
+
+    def clear(self):
+        """
+        Frees all idle buffers.
+        """
+        with self._lock:
+            buffer_pool_bytes.dec(self._idle_bytes)
+            self._buckets.clear()
+            self._idle_bytes = 0
+
+
+# Shared by the classifier nodes of all models, they preprocess images of the same sizes
+buffer_pool = BufferPool()
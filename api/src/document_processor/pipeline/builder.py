@@ -3,15 +3,23 @@ from abc import ABC, abstractmethod
 import tensorflow as tf
 
 from .pdf_to_image_converter import PdfToJpgConverter
+from .render_pool import PooledPdfToImageConverter
+from .remote_nodes import RemoteDocumentClassifierNode
+from .onnx_nodes import OnnxEffDetDocumentClassifierNode, OnnxEffNetDocumentClassifierNode
+from .tflite_nodes import TFLiteEffDetDocumentClassifierNode, TFLiteEffNetDocumentClassifierNode
 from .pipeline import DocumentProcessorPipeline
 from .pipeline_nodes import (
     PdfToImageConverterNode,
     EffNetDocumentClassifierNode,
     EffDetDocumentClassifierNode,
+    EffDetDocumentLocalizerNode,
+    PerceptualHashCacheNode,
 )
 
 from ..logger import logger
 
+DEFAULT_MODELS_DIRECTORY = "/app/models"
+
 
 class DocumentProcessorPipelineBuilder(ABC):
     """
@@ -27,6 +35,44 @@ class DocumentProcessorPipelineBuilder(ABC):
         """
         pass
 
+    @staticmethod
+    def build_pdf_to_image_node(**kwargs):
+        """
+        Builds the node that converts the PDF into an image.
+        :param kwargs: kwargs for the Nodes, render_workers sets the number of PDFs rendered in parallel in a batch,
+            render_timeout, max_pdf_pages, max_page_size and max_render_memory set the limits of the converter,
+            render_pool_size renders with a pool of that many worker processes instead of poppler.
+        :return: PdfToImageConverterNode.
+        """
+        limits = dict(
+            timeout=kwargs.get("render_timeout"),
+            max_pages=kwargs.get("max_pdf_pages"),
+            max_page_size=kwargs.get("max_page_size"),
+            max_render_memory=kwargs.get("max_render_memory"),
+        )
+        if kwargs.get("render_pool_size"):
+            converter = PooledPdfToImageConverter(workers=kwargs["render_pool_size"], **limits)
+        else:
+            converter = PdfToJpgConverter(**limits)
+        return PdfToImageConverterNode(converter, max_workers=kwargs.get("render_workers", 1))
+
+    @staticmethod
+    def build_classifier_node(classifier_node, **kwargs):
+        """
+        Wraps the classifier node with a perceptual hash cache if perceptual_cache_size is set.
+        :param classifier_node: MLModelDocumentClassifierNode.
+        :param kwargs: kwargs for the Nodes, perceptual_cache_size sets the number of cached classifications
+            and perceptual_cache_distance the maximum Hamming distance of a near-duplicate.
+        :return: DocumentProcessingNode that classifies the image.
+        """
+        if not kwargs.get("perceptual_cache_size"):
+            return classifier_node
+        return PerceptualHashCacheNode(
+            classifier_node,
+            max_size=kwargs["perceptual_cache_size"],
+            max_distance=kwargs.get("perceptual_cache_distance", 4),
+        )
+
 
 class EffNetDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
     """
@@ -43,7 +89,7 @@ class EffNetDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
         """
         pipeline = DocumentProcessorPipeline()
 
-        pdf_2_image_node = PdfToImageConverterNode(PdfToJpgConverter())
+        pdf_2_image_node = self.build_pdf_to_image_node(**kwargs)
         pipeline.add_processing_node(pdf_2_image_node)
 
         if (min_confidence := kwargs.get("min_confidence")) is None:
@@ -52,14 +98,21 @@ class EffNetDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
         if (model_directory := kwargs.get("model_directory")) is None:
             raise ValueError("model_directory must be set for EfficientNet model")
 
-        eff_net_node = EffNetDocumentClassifierNode(
-            model_directory,
-            min_confidence,
-        )
-        pipeline.add_processing_node(eff_net_node)
+        eff_net_node = self.build_model_node(**kwargs)
+        pipeline.add_processing_node(self.build_classifier_node(eff_net_node, **kwargs))
 
         return pipeline
 
+    def build_model_node(self, model_directory, min_confidence, **kwargs):
+        """
+        Builds the node that classifies the image with the EfficientNet model.
+        :param model_directory: Path to the model.
+        :param min_confidence: Minimum required confidence of the classification.
+        :param kwargs: kwargs for the Nodes.
+        :return: EffNetDocumentClassifierNode.
+        """
+        return EffNetDocumentClassifierNode(model_directory, min_confidence)
+
 
 class EffDetDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
     """
@@ -76,7 +129,7 @@ class EffDetDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
         """
         pipeline = DocumentProcessorPipeline()
 
-        pdf_2_image_node = PdfToImageConverterNode(PdfToJpgConverter())
+        pdf_2_image_node = self.build_pdf_to_image_node(**kwargs)
         pipeline.add_processing_node(pdf_2_image_node)
 
         if (model_directory := kwargs.get("model_directory")) is None:
@@ -85,10 +138,194 @@ class EffDetDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
         if (min_confidence := kwargs.get("min_confidence")) is None:
             raise ValueError("min_confidence must be set for EfficientDet model")
 
-        eff_det_node = EffDetDocumentClassifierNode(
-            model_directory,
-            min_confidence,
+        eff_det_node = self.build_model_node(**kwargs)
+        pipeline.add_processing_node(self.build_classifier_node(eff_det_node, **kwargs))
+
+        return pipeline
+
+    def build_model_node(self, model_directory, min_confidence, **kwargs):
+        """
+        Builds the node that classifies the image with the EfficientDet model.
+        :param model_directory: Path to the model.
+        :param min_confidence: Minimum required confidence of the classification.
+        :param kwargs: kwargs for the Nodes.
+        :return: EffDetDocumentClassifierNode.
+        """
+        return EffDetDocumentClassifierNode(model_directory, min_confidence)
+
+
+class EffDetEffNetDocumentProcessorPipelineBuilder(EffNetDocumentProcessorPipelineBuilder):
+    """
+    DocumentProcessorPipelineBuilder that builds a pipeline with
+    PDF to image conversion,
+    an EfficientDet model at a low resolution that localizes the document and
+    an EfficientNet model that classifies the cropped document.
+    """
+    def build(self, *args, **kwargs):
+        """
+        Builds a DocumentProcessorPipeline.
+        :param args: args for the Nodes.
+        :param kwargs: kwargs for the Nodes, model_directory is the directory that contains both models,
+            localizer_input_size and localizer_min_score configure the localization.
+        :return: DocumentProcessorPipeline.
+        """
+        pipeline = DocumentProcessorPipeline()
+
+        pdf_2_image_node = self.build_pdf_to_image_node(**kwargs)
+        pipeline.add_processing_node(pdf_2_image_node)
+
+        if (min_confidence := kwargs.get("min_confidence")) is None:
+            raise ValueError("min_confidence must be set for EfficientDet and EfficientNet models")
+
+        if (model_directory := kwargs.get("model_directory")) is None:
+            raise ValueError("model_directory must be set for EfficientDet and EfficientNet models")
+
+        localizer_node = EffDetDocumentLocalizerNode(
+            f"{model_directory}/effdet/saved_model/saved_model",
+            min_score=kwargs.get("localizer_min_score") or 0.3,
+            input_size=kwargs.get("localizer_input_size") or 320,
+        )
+        pipeline.add_processing_node(localizer_node)
+
+        eff_net_node = self.build_model_node(**{**kwargs, "model_directory": f"{model_directory}/effnet"})
+        pipeline.add_processing_node(self.build_classifier_node(eff_net_node, **kwargs))
+
+        return pipeline
+
+
+def get_onnx_session_kwargs(**kwargs):
+    """
+    Gets the ONNX Runtime session options from the kwargs for the Nodes.
+    :param kwargs: kwargs for the Nodes, onnx_intra_op_threads, onnx_inter_op_threads and onnx_graph_optimization.
+    :return: kwargs for the ONNX nodes.
+    """
+    return {
+        "intra_op_threads": kwargs.get("onnx_intra_op_threads"),
+        "inter_op_threads": kwargs.get("onnx_inter_op_threads"),
+        "graph_optimization": kwargs.get("onnx_graph_optimization") or "ALL",
+    }
+
+
+class OnnxEffNetDocumentProcessorPipelineBuilder(EffNetDocumentProcessorPipelineBuilder):
+    """
+    EffNetDocumentProcessorPipelineBuilder that runs the EfficientNet model converted to ONNX with ONNX Runtime.
+    """
+    def build_model_node(self, model_directory, min_confidence, **kwargs):
+        return OnnxEffNetDocumentClassifierNode(model_directory, min_confidence, **get_onnx_session_kwargs(**kwargs))
+
+
+class OnnxEffDetDocumentProcessorPipelineBuilder(EffDetDocumentProcessorPipelineBuilder):
+    """
+    EffDetDocumentProcessorPipelineBuilder that runs the EfficientDet model converted to ONNX with ONNX Runtime.
+    """
+    def build_model_node(self, model_directory, min_confidence, **kwargs):
+        return OnnxEffDetDocumentClassifierNode(model_directory, min_confidence, **get_onnx_session_kwargs(**kwargs))
+
+
+def get_tflite_interpreter_kwargs(**kwargs):
+    """
+    Gets the TensorFlow Lite interpreter options from the kwargs for the Nodes.
+    :param kwargs: kwargs for the Nodes, tflite_threads and tflite_xnnpack.
+    :return: kwargs for the TensorFlow Lite nodes.
+    """
+    return {
+        "num_threads": kwargs.get("tflite_threads"),
+        "xnnpack": kwargs.get("tflite_xnnpack") or False,
+    }
+
+
+class TFLiteEffNetDocumentProcessorPipelineBuilder(EffNetDocumentProcessorPipelineBuilder):
+    """
+    EffNetDocumentProcessorPipelineBuilder that runs the EfficientNet model converted to TensorFlow Lite,
+    whose weights are memory-mapped and shared by the workers of a host.
+    """
+    def build_model_node(self, model_directory, min_confidence, **kwargs):
+        return TFLiteEffNetDocumentClassifierNode(
+            model_directory, min_confidence, **get_tflite_interpreter_kwargs(**kwargs)
+        )
+
+
+class TFLiteEffDetDocumentProcessorPipelineBuilder(EffDetDocumentProcessorPipelineBuilder):
+    """
+    EffDetDocumentProcessorPipelineBuilder that runs the EfficientDet model converted to TensorFlow Lite,
+    whose weights are memory-mapped and shared by the workers of a host.
+    """
+    def build_model_node(self, model_directory, min_confidence, **kwargs):
+        return TFLiteEffDetDocumentClassifierNode(
+            model_directory, min_confidence, **get_tflite_interpreter_kwargs(**kwargs)
+        )
+
+
+class RemoteDocumentProcessorPipelineBuilder(DocumentProcessorPipelineBuilder):
+    """
+    DocumentProcessorPipelineBuilder that builds a pipeline with
+    PDF to image conversion and
+    the classification by remote inference workers, see document_processor.inference_worker.
+    """
+    def build(self, *args, **kwargs):
+        """
+        Builds a DocumentProcessorPipeline.
+        :param args: args for the Nodes.
+        :param kwargs: kwargs for the Nodes, remote_inference_address is the comma separated host:port
+            of the inference workers, remote_inference_pool_size, remote_inference_batch_size,
+            remote_inference_batch_delay and remote_inference_timeout configure the client.
+        :return: DocumentProcessorPipeline.
+        """
+        pipeline = DocumentProcessorPipeline()
+
+        pdf_2_image_node = self.build_pdf_to_image_node(**kwargs)
+        pipeline.add_processing_node(pdf_2_image_node)
+
+        if not (addresses := kwargs.get("remote_inference_address")):
+            raise ValueError("remote_inference_address must be set for remote inference")
+
+        remote_node = RemoteDocumentClassifierNode(
+            addresses,
+            pool_size=kwargs.get("remote_inference_pool_size") or 4,
+            max_batch_size=kwargs.get("remote_inference_batch_size") or 8,
+            max_batch_delay=kwargs.get("remote_inference_batch_delay") or 0.005,
+            timeout=kwargs.get("remote_inference_timeout") or 30.0,
         )
-        pipeline.add_processing_node(eff_det_node)
+        pipeline.add_processing_node(self.build_classifier_node(remote_node, **kwargs))
 
         return pipeline
+
+
+def get_pipeline_builder(model, models_directory=DEFAULT_MODELS_DIRECTORY):
+    """
+    Gets the pipeline builder of the pipeline with the corresponding model.
+    :param model: model in the pipeline.
+    :param models_directory: directory that contains the exported models.
+    :return: pipeline with the corresponding model.
+    """
+    if model == "EFFICIENTNET":
+        pipeline_builder = EffNetDocumentProcessorPipelineBuilder()
+        model_directory = f"{models_directory}/effnet"
+    elif model == "EFFICIENTDET":
+        pipeline_builder = EffDetDocumentProcessorPipelineBuilder()
+        model_directory = (
+            f"{models_directory}/effdet/saved_model/saved_model"
+        )
+    elif model == "EFFICIENTDET_EFFICIENTNET":
+        pipeline_builder = EffDetEffNetDocumentProcessorPipelineBuilder()
+        model_directory = models_directory
+    elif model == "EFFICIENTNET_ONNX":
+        pipeline_builder = OnnxEffNetDocumentProcessorPipelineBuilder()
+        model_directory = f"{models_directory}/effnet_onnx/model.onnx"
+    elif model == "EFFICIENTDET_ONNX":
+        pipeline_builder = OnnxEffDetDocumentProcessorPipelineBuilder()
+        model_directory = f"{models_directory}/effdet_onnx/model.onnx"
+    elif model == "EFFICIENTNET_TFLITE":
+        pipeline_builder = TFLiteEffNetDocumentProcessorPipelineBuilder()
+        model_directory = f"{models_directory}/effnet_tflite/model.tflite"
+    elif model == "EFFICIENTDET_TFLITE":
+        pipeline_builder = TFLiteEffDetDocumentProcessorPipelineBuilder()
+        model_directory = f"{models_directory}/effdet_tflite/model.tflite"
+    elif model == "REMOTE":
+        # The models are loaded by the inference workers
+        pipeline_builder = RemoteDocumentProcessorPipelineBuilder()
+        model_directory = None
+    else:
+        raise ValueError("Invalid model specified in environment variable MODEL")
+
+    return pipeline_builder, model_directory
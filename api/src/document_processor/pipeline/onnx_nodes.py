@@ -0,0 +1,157 @@
+import os
+
+import numpy as np
+
+from .buffer_pool import buffer_pool
+from .pipeline_nodes import EffDetDocumentClassifierNode, EffNetDocumentClassifierNode
+
+from ..logger import logger
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "DISABLED": "ORT_DISABLE_ALL",
+    "BASIC": "ORT_ENABLE_BASIC",
+    "EXTENDED": "ORT_ENABLE_EXTENDED",
+    "ALL": "ORT_ENABLE_ALL",
+}
+
+
+class OnnxSessionMixin:
+    """
+    Loads a model converted to ONNX into an ONNX Runtime session on the CPU.
+    onnxruntime is only imported when an ONNX model is used.
+    """
+    def configure_session(self, intra_op_threads=None, inter_op_threads=None, graph_optimization="ALL"):
+        """
+        Stores the session options, call this before load_model.
+        :param intra_op_threads: Threads used within an op, the number of cores if None.
+        :param inter_op_threads: Threads used to run independent ops in parallel, sequential execution if None.
+        :param graph_optimization: DISABLED, BASIC, EXTENDED or ALL.
+        """
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                f"Invalid graph optimization {graph_optimization}, use one of {', '.join(GRAPH_OPTIMIZATION_LEVELS)}"
+            )
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_optimization = graph_optimization
+
+    def load_model(self, model_path):
+        """
+        Loads the ONNX model.
+        :param model_path: Path to the .onnx file.
+        :return: onnxruntime InferenceSession.
+        """
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization]
+        )
+        if self.intra_op_threads:
+            session_options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            session_options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+            session_options.inter_op_num_threads = self.inter_op_threads
+        session = ort.InferenceSession(model_path, session_options, providers=["CPUExecutionProvider"])
+        self.input_name = session.get_inputs()[0].name
+        return session
+
+    def get_footprint(self):
+        """
+        Reports the memory of the weights, ONNX Runtime reads the .onnx file into the heap of the worker.
+        :return: dict with the node, the model path, the MiB of the weights and whether they are memory-mapped.
+        """
+        return {
+            "node": type(self).__name__,
+            "path": self.model_path,
+            "weights_mb": round(os.path.getsize(self.model_path) / 2 ** 20, 1),
+            "memory_mapped": False,
+        }
+
+
+class OnnxEffNetDocumentClassifierNode(OnnxSessionMixin, EffNetDocumentClassifierNode):
+    """
+    EffNetDocumentClassifierNode that runs the EffNet model converted to ONNX with ONNX Runtime.
+    """
+    def __init__(self, model_path, min_confidence, intra_op_threads=None, inter_op_threads=None,
+                 graph_optimization="ALL"):
+        """
+        Initializes an OnnxEffNetDocumentClassifierNode.
+        :param model_path: Path to the .onnx file.
+        :param min_confidence: Minimum required confidence of the classification otherwise classification is unknown.
+        :param intra_op_threads: Threads used within an op, the number of cores if None.
+        :param inter_op_threads: Threads used to run independent ops in parallel, sequential execution if None.
+        :param graph_optimization: DISABLED, BASIC, EXTENDED or ALL.
+        """
+        self.configure_session(intra_op_threads, inter_op_threads, graph_optimization)
+        super().__init__(model_path, min_confidence)
+
+    def classify_images(self, images) -> list:
+        """
+        Classifies several images with a single run of the EffNet model.
+        :param images: Images to be classified.
+        :return: Class and prediction confidences for every image.
+        """
+        with buffer_pool.array((len(images), 224, 224, 3), np.float32) as img_batch:
+            for i, image in enumerate(images):
+                self.preprocess_image(image, img_batch[i])
+            predictions = self.model.run(None, {self.input_name: img_batch})[0]
+        return [self.postprocess_prediction(prediction) for prediction in predictions]
+
+
+class OnnxEffDetDocumentClassifierNode(OnnxSessionMixin, EffDetDocumentClassifierNode):
+    """
+    EffDetDocumentClassifierNode that runs the EffDet model converted to ONNX with ONNX Runtime.
+    """
+
+    detection_outputs = ["detection_scores", "detection_classes"]
+
+    def __init__(self, model_path, min_confidence, intra_op_threads=None, inter_op_threads=None,
+                 graph_optimization="ALL"):
+        """
+        Initializes an OnnxEffDetDocumentClassifierNode.
+        :param model_path: Path to the .onnx file.
+        :param min_confidence: Minimum required confidence of the classification otherwise classification is unknown.
+        :param intra_op_threads: Threads used within an op, the number of cores if None.
+        :param inter_op_threads: Threads used to run independent ops in parallel, sequential execution if None.
+        :param graph_optimization: DISABLED, BASIC, EXTENDED or ALL.
+        """
+        self.configure_session(intra_op_threads, inter_op_threads, graph_optimization)
+        super().__init__(model_path, min_confidence)
+
+    def detect(self, batch):
+        """
+        Runs the EffDet model.
+        :param batch: Array of shape [batch, height, width, 3] of uint8.
+        :return: Detections.
+        """
+        outputs = self.model.run(self.detection_outputs, {self.input_name: batch})
+        return dict(zip(self.detection_outputs, outputs))
+
+    def get_detections(self, image):
+        """
+        Gets all the detections of the EffDet model.
+        :param image: Image to be detected.
+        :return: Detections.
+        """
+        with buffer_pool.array(self.batch_shape([image]), np.uint8) as batch:
+            batch[0] = np.asarray(image.convert("RGB"))
+            return self.detect(batch)
+
+    def get_batch_detections(self, images):
+        """
+        Gets the detections of the EffDet model for several images with a single run.
+        Models exported with a fixed batch size of one are run once per image instead.
+        :param images: Images to be detected.
+        :return: Detections of the batch.
+        """
+        if len(images) > 1 and self.supports_batches:
+            try:
+                with buffer_pool.array(self.batch_shape(images), np.uint8) as batch:
+                    return self.detect(self.pad_images(images, batch))
+            except Exception as e:
+                logger.warning(f"ONNX EffDet model does not accept batches, falling back to one run per image: {e}")
+                self.supports_batches = False
+
+        detections = [self.get_detections(image) for image in images]
+        return {key: np.concatenate([detection[key] for detection in detections]) for key in self.detection_outputs}
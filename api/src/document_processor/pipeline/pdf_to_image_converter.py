@@ -1,20 +1,183 @@
 import io
+import os
+import re
+import signal
+import tempfile
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
 
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes
+from pdf2image.exceptions import PDFPageCountError, PDFPopplerTimeoutError, PDFSyntaxError
+
+from ..deadline import DeadlineExceededError
+from ..metrics import metrics
+
+rejected_pdfs = metrics.counter(
+    "rejected_pdfs_total",
+    "PDFs that were not rendered by reason (pages, page_size, memory, timeout, invalid, crash).",
+)
+
+# pdfinfo reports the size of every page under "Page <number> size" when it is given a range of pages
+PAGE_SIZE_KEY_PATTERN = re.compile(r"Page\s+\d+ size")
+PAGE_SIZE_PATTERN = re.compile(r"([\d.]+) x ([\d.]+) pts")
+# pdfinfo reports up to the last page of the PDF if the last page of the range is larger
+LAST_PAGE = 2 ** 31 - 1
+
+# Seconds between two checks whether the request of a running render was cancelled
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class PdfRejectedError(ValueError):
+    """
+    Raised when a PDF exceeds the limits of the converter and is not rendered.
+    """
+    pass
+
+
+class PdfRenderTimeoutError(TimeoutError):
+    """
+    Raised when rendering a PDF takes longer than the timeout of the converter.
+    """
+    pass
+
+
+def kill_processes(argument, proc_directory="/proc"):
+    """
+    Kills the processes that have an argument in their command line, e.g. poppler rendering a given file.
+    :param argument: Argument of the processes.
+    :param proc_directory: Directory with the processes.
+    :return: Number of killed processes, 0 if /proc is not available.
+    """
+    argument = os.fsencode(argument)
+    try:
+        entries = os.listdir(proc_directory)
+    except OSError:
+        return 0
+    killed = 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_directory, entry, "cmdline"), "rb") as f:
+                if argument not in f.read().split(b"\0"):
+                    continue
+            os.kill(int(entry), signal.SIGKILL)
+            killed += 1
+        except OSError:
+            # Exited in the meantime
+            continue
+    return killed
 
 
 class PdfToImageConverter(ABC):
-    @staticmethod
     @abstractmethod
-    def convert(pdf_bytes: bytes):
+    def convert(self, pdf_bytes: bytes, timeout=None, deadline=None):
         pass
 
 
 class PdfToJpgConverter(PdfToImageConverter):
+    """
+    PdfToImageConverter that renders every page of a PDF with poppler into a JPEG.
+    Limits are checked from the metadata of the PDF before it is rendered,
+    so that a malformed or huge PDF fails fast instead of stalling a worker.
+    """
+
+    # Resolution pdf2image renders with
+    DPI = 200
+
+    def __init__(self, timeout=None, max_pages=None, max_page_size=None, max_render_memory=None):
+        """
+        Initializes a PdfToJpgConverter, all limits are disabled by default.
+        :param timeout: Seconds after which poppler is killed.
+        :param max_pages: Maximum number of pages.
+        :param max_page_size: Maximum width and height of every page in points (1/72 inch).
+        :param max_render_memory: Maximum estimated memory in bytes that rendering all pages may allocate.
+        """
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_page_size = max_page_size
+        self.max_render_memory = max_render_memory
+
+    @property
+    def checks_metadata(self):
+        return any(limit is not None for limit in (self.max_pages, self.max_page_size, self.max_render_memory))
+
+    def estimate_render_memory(self, page_sizes):
+        """
+        Estimates the memory that rendering the pages of a PDF allocates.
+        The output of poppler and the decoded RGB images are both held in memory.
+        :param page_sizes: Width and height in points of every page that is rendered.
+        :return: Bytes.
+        """
+        pixels = sum((width / 72 * self.DPI) * (height / 72 * self.DPI) for width, height in page_sizes)
+        return int(pixels * 3 * 2)
+
+    def get_limit_violation(self, pages, page_sizes=()):
+        """
+        Checks the metadata of a PDF against the limits.
+        :param pages: Number of pages.
+        :param page_sizes: Width and height in points of every page that is rendered, empty if unknown.
+        :return: Reason and message of the first exceeded limit, None if the PDF is within the limits.
+        """
+        if self.max_pages is not None and pages > self.max_pages:
+            return "pages", f"PDF has {pages} pages, at most {self.max_pages} are allowed"
+        if not page_sizes:
+            return None
+        if self.max_page_size is not None:
+            for width, height in page_sizes:
+                if max(width, height) > self.max_page_size:
+                    return "page_size", (
+                        f"PDF page is {width:.0f} x {height:.0f} pts, "
+                        f"at most {self.max_page_size:.0f} pts are allowed"
+                    )
+        if self.max_render_memory is not None:
+            render_memory = self.estimate_render_memory(page_sizes)
+            if render_memory > self.max_render_memory:
+                return "memory", (
+                    f"Rendering the PDF needs about {render_memory // 2 ** 20} MiB, "
+                    f"at most {self.max_render_memory // 2 ** 20} MiB are allowed"
+                )
+        return None
+
+    def check_metadata(self, pdf_bytes: bytes, timeout=None):
+        """
+        Rejects a PDF whose metadata exceeds the limits.
+        :param pdf_bytes: PDF.
+        :param timeout: Seconds after which pdfinfo is killed.
+        """
+        # Without a range of pages pdfinfo only reports the size of the first page
+        info = pdfinfo_from_bytes(pdf_bytes, timeout=timeout, first_page=1, last_page=self.max_pages or LAST_PAGE)
+        page_sizes = []
+        for key, value in info.items():
+            match = PAGE_SIZE_PATTERN.match(value) if PAGE_SIZE_KEY_PATTERN.fullmatch(key) else None
+            if match is not None:
+                page_sizes.append((float(match.group(1)), float(match.group(2))))
+        violation = self.get_limit_violation(info["Pages"], page_sizes)
+        if violation is not None:
+            reason, message = violation
+            rejected_pdfs.inc(reason=reason)
+            raise PdfRejectedError(message)
+
+    def timeout_error(self, timeout, effective_timeout):
+        """
+        Builds the error of a render that did not finish in time.
+        :param timeout: Seconds until the deadline of the request, None for no deadline.
+        :param effective_timeout: Smaller one of the timeout of the converter and the deadline.
+        :return: DeadlineExceededError if the deadline expired first, otherwise PdfRenderTimeoutError.
+        """
+        if timeout is not None and timeout <= effective_timeout:
+            return DeadlineExceededError("Request deadline exceeded while rendering the PDF")
+        rejected_pdfs.inc(reason="timeout")
+        return PdfRenderTimeoutError(f"Rendering the PDF took longer than {self.timeout}s")
+
     @staticmethod
-    def convert(pdf_bytes: bytes):
-        images = convert_from_bytes(pdf_bytes)
+    def encode_images(images):
+        """
+        Encodes rendered pages into JPEGs.
+        :param images: Images of the pages.
+        :return: BytesIO with the JPEGs.
+        """
         image_bytes = io.BytesIO()
 
         for i, page in enumerate(images):
@@ -25,3 +188,64 @@ class PdfToJpgConverter(PdfToImageConverter):
 
         image_bytes.seek(0)
         return image_bytes
+
+    @staticmethod
+    def render(pdf_bytes: bytes, deadline=None, **kwargs):
+        """
+        Renders the pages of a PDF with poppler. With a deadline, poppler is killed as soon as the request
+        is cancelled, e.g. because the client disconnected, instead of rendering the PDF to the end.
+        :param pdf_bytes: PDF.
+        :param deadline: Deadline of the request, None if it cannot be cancelled.
+        :param kwargs: Arguments of pdf2image.
+        :return: Images of the pages.
+        :raises DeadlineExceededError: if the request was cancelled.
+        """
+        if deadline is None:
+            return convert_from_bytes(pdf_bytes, **kwargs)
+
+        cancelled = False
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+            pdf_file.write(pdf_bytes)
+            pdf_file.flush()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(convert_from_path, pdf_file.name, **kwargs)
+                while not wait([future], timeout=CANCEL_POLL_INTERVAL).done:
+                    if deadline.cancelled:
+                        cancelled = True
+                        # Repeated until pdf2image returns, in case poppler was not started yet
+                        kill_processes(pdf_file.name)
+        if cancelled:
+            deadline.check()
+        return future.result()
+
+    def convert(self, pdf_bytes: bytes, timeout=None, deadline=None):
+        """
+        Converts a PDF into JPEGs of all its pages.
+        :param pdf_bytes: PDF.
+        :param timeout: Seconds until the deadline of the request, None for no deadline.
+        :param deadline: Deadline of the request, poppler is killed when it is cancelled.
+        :return: BytesIO with the JPEGs.
+        :raises PdfRejectedError: if the PDF exceeds the limits or cannot be rendered.
+        :raises PdfRenderTimeoutError: if the timeout of the converter expires.
+        :raises DeadlineExceededError: if the deadline of the request expires or it is cancelled.
+        """
+        timeouts = [t for t in (self.timeout, timeout) if t is not None]
+        effective_timeout = min(timeouts) if timeouts else None
+        start = time.monotonic()
+        try:
+            kwargs = {}
+            if self.checks_metadata:
+                self.check_metadata(pdf_bytes, timeout=effective_timeout)
+            if self.max_pages is not None:
+                kwargs["last_page"] = self.max_pages
+            if effective_timeout is not None:
+                # poppler is killed when the timeout expires
+                kwargs["timeout"] = max(effective_timeout - (time.monotonic() - start), 0.001)
+            images = self.render(pdf_bytes, deadline, **kwargs)
+        except PDFPopplerTimeoutError:
+            raise self.timeout_error(timeout, effective_timeout)
+        except (PDFPageCountError, PDFSyntaxError) as e:
+            rejected_pdfs.inc(reason="invalid")
+            raise PdfRejectedError(f"The PDF could not be rendered: {e}")
+
+        return self.encode_images(images)
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+
+
+def dhash(image, hash_size=8):
+    """
+    Computes the difference hash of an image, which stays the same when the image is re-encoded or slightly changed.
+    Every bit tells whether a pixel of the downscaled grayscale image is brighter than its left neighbour.
+    :param image: PIL Image.
+    :param hash_size: Width and height of the compared pixel grid, the hash has hash_size ** 2 bits.
+    :return: int.
+    """
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    differences = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(differences).tobytes(), "big")
+
+
+def hamming_distance(hash_a, hash_b):
+    """
+    :return: Number of bits in which two hashes differ.
+    """
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class PerceptualHashIndex:
+    """
+    LRU cache of values by perceptual hash that finds the entries within a Hamming distance of a hash.
+    Hashes are split into max_distance + 1 chunks, two hashes within max_distance share at least one chunk,
+    so only the entries that share a chunk with the hash are compared instead of all entries.
+    """
+    def __init__(self, max_size, max_distance, hash_bits=HASH_BITS):
+        """
+        Initializes a PerceptualHashIndex.
+        :param max_size: Maximum number of entries, the least recently used entry is evicted first.
+        :param max_distance: Maximum Hamming distance of a near-duplicate.
+        :param hash_bits: Number of bits of the hashes.
+        """
+        self.max_size = max_size
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        self.chunk_bits = [hash_bits // chunks + (1 if i < hash_bits % chunks else 0) for i in range(chunks)]
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(chunks)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def chunks(self, hash_value):
+        """
+        Splits a hash into its chunks.
+        :param hash_value: int.
+        :return: list of ints, one per chunk.
+        """
+        chunks = []
+        for bits in self.chunk_bits:
+            chunks.append(hash_value & ((1 << bits) - 1))
+            hash_value >>= bits
+        return chunks
+
+    def get(self, hash_value):
+        """
+        Gets the value of the closest entry within max_distance and marks it as recently used.
+        :param hash_value: int.
+        :return: value or None if there is no near-duplicate.
+        """
+        with self._lock:
+            candidates = set()
+            for bucket, chunk in zip(self._buckets, self.chunks(hash_value)):
+                candidates.update(bucket.get(chunk, ()))
+            best, best_distance = None, self.max_distance + 1
+            for candidate in candidates:
+                distance = hamming_distance(hash_value, candidate)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def put(self, hash_value, value):
+        """
+        Adds an entry and evicts the least recently used entry if the index is full.
+        :param hash_value: int.
+        :param value: value to be returned for near-duplicates.
+        """
+        with self._lock:
+            if hash_value in self._entries:
+                self._entries.move_to_end(hash_value)
+                self._entries[hash_value] = value
+                return
+            self._entries[hash_value] = value
+            for bucket, chunk in zip(self._buckets, self.chunks(hash_value)):
+                bucket.setdefault(chunk, set()).add(hash_value)
+            if len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                for bucket, chunk in zip(self._buckets, self.chunks(evicted)):
+                    bucket[chunk].discard(evicted)
+                    if not bucket[chunk]:
+                        del bucket[chunk]
@@ -1,4 +1,7 @@
+import time
+
 from .pipeline_nodes import DocumentProcessingNode
+from ..deadline import DeadlineExceededError, check_deadline
 
 
 class DocumentProcessorPipeline:
@@ -18,12 +21,68 @@ class DocumentProcessorPipeline:
         """
         self.processing_nodes.append(node)
 
+    def warm_up(self):
+        """
+        Warms up all nodes of the pipeline.
+        """
+        for node in self.processing_nodes:
+            node.warm_up()
+
+    def get_footprint(self):
+        """
+        Reports the memory of the model weights of the nodes.
+        :return: list of the footprints of the nodes that have a model.
+        """
+        return [footprint for node in self.processing_nodes if (footprint := node.get_footprint()) is not None]
+
     def process_document(self, data: dict):
         """
         Processes a document by iterating through its nodes.
         :param data: Dictionary that contains the document and will be processed when iterating through the pipeline.
         :return: Dictionary that was processed after iterated through the pipeline.
+            Seconds spent in every node are added under "timings".
+        :raises DeadlineExceededError: if the Deadline under "deadline" passes or is cancelled between two nodes.
         """
+        node_timings = {}
         for node in self.processing_nodes:
+            check_deadline(data)
+            start = time.perf_counter()
             data = node.process_document(data)
+            node_timings[type(node).__name__] = time.perf_counter() - start
+        data.setdefault("timings", {})["nodes"] = node_timings
         return data
+
+    def process_documents(self, data_list: list):
+        """
+        Processes several documents by passing all of them through one node at a time,
+        so that nodes can process them as a batch.
+        A document that fails in a node or whose deadline passed gets the exception under "error"
+        and skips the remaining nodes.
+        :param data_list: Dictionaries that contain the documents.
+        :return: Dictionaries in the same order, processed after iterated through the pipeline.
+        """
+        results = list(data_list)
+        for node in self.processing_nodes:
+            for data in results:
+                if "error" not in data:
+                    try:
+                        check_deadline(data)
+                    except DeadlineExceededError as e:
+                        data["error"] = e
+            indices = [i for i, data in enumerate(results) if "error" not in data]
+            if not indices:
+                break
+
+            batch = [results[i] for i in indices]
+            start = time.perf_counter()
+            try:
+                batch = node.process_documents(batch)
+            except Exception as e:
+                for data in batch:
+                    data["error"] = e
+            elapsed = time.perf_counter() - start
+
+            for i, data in zip(indices, batch):
+                data.setdefault("timings", {}).setdefault("nodes", {})[type(node).__name__] = elapsed
+                results[i] = data
+        return results
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 import numpy as np
@@ -6,9 +7,21 @@ import numpy as np
 import tensorflow as tf
 from PIL import Image
 
+from .buffer_pool import buffer_pool
 from .pdf_to_image_converter import PdfToImageConverter
+from .perceptual_hash import PerceptualHashIndex, dhash
 
 from ..logger import logger
+from ..metrics import metrics
+
+perceptual_cache_requests = metrics.counter(
+    "perceptual_cache_requests_total",
+    "Lookups in the perceptual hash cache by result (hit, miss).",
+)
+perceptual_cache_hit_ratio = metrics.gauge(
+    "perceptual_cache_hit_ratio",
+    "Fraction of the lookups in the perceptual hash cache that found a near-duplicate.",
+)
 
 
 class DocumentProcessingNode(ABC):
@@ -23,27 +36,83 @@ class DocumentProcessingNode(ABC):
         """
         pass
 
+    def process_documents(self, data_list: list):
+        """
+        Processes several documents. Processes them one by one by default,
+        a document that fails gets the exception under "error" without affecting the others.
+        :param data_list: Dictionaries containing the documents and other data.
+        :return: Dictionaries in the same order.
+        """
+        return [self.try_process_document(data) for data in data_list]
+
+    def try_process_document(self, data: dict):
+        """
+        Processes a document and stores an exception under "error" instead of raising it.
+        :param data: Dictionary containing the document and other data.
+        :return: Processed dictionary.
+        """
+        try:
+            return self.process_document(data)
+        except Exception as e:
+            data["error"] = e
+            return data
+
+    def warm_up(self):
+        """
+        Warms up the node, e.g. by running a model once. Does nothing by default.
+        """
+        pass
+
+    def get_footprint(self):
+        """
+        Reports the memory of the model weights of the node.
+        :return: dict describing the weights, None for nodes without a model.
+        """
+        return None
+
 
 class PdfToImageConverterNode(DocumentProcessingNode):
     """
     DocumentProcessingNode that converts a PDF into an image.
     """
-    def __init__(self, converter: PdfToImageConverter):
+    def __init__(self, converter: PdfToImageConverter, max_workers=1):
         """
         Initializes the PdfToImageConverterNode.
         :param converter: PdfToImageConverter that will convert the PDF into an image.
+        :param max_workers: Number of PDFs of a batch that are converted in parallel.
         """
         self.converter = converter
+        self.max_workers = max_workers
 
     def process_document(self, data: dict):
         """
         Converts a PDF into an image.
-        :param data: Dictionary containing the PDF.
+        :param data: Dictionary containing the PDF and optionally its Deadline.
         :return: Dictionary containing the image.
         """
-        data["jpg_bytes"] = self.converter.convert(data["pdf_bytes"])
+        deadline = data.get("deadline")
+        if deadline is None:
+            data["jpg_bytes"] = self.converter.convert(data["pdf_bytes"])
+        else:
+            deadline.check()
+            data["jpg_bytes"] = self.converter.convert(
+                data["pdf_bytes"], timeout=deadline.remaining(), deadline=deadline
+            )
         return data
 
+    def process_documents(self, data_list: list):
+        """
+        Converts several PDFs into images, in parallel if max_workers is larger than one.
+        Rendering happens in poppler subprocesses, so threads are enough to use several cores.
+        :param data_list: Dictionaries containing the PDFs.
+        :return: Dictionaries containing the images.
+        """
+        if self.max_workers <= 1 or len(data_list) <= 1:
+            return super().process_documents(data_list)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.try_process_document, data_list))
+
 
 class MLModelDocumentClassifierNode(DocumentProcessingNode):
     """
@@ -58,6 +127,7 @@ class MLModelDocumentClassifierNode(DocumentProcessingNode):
         :param model_path: Path to the Machine Learning model.
         :param min_confidence: Minimum required confidence of the classification otherwise classification is unknown.
         """
+        self.model_path = model_path
         self.model = self.load_model(model_path)
         self.min_confidence = min_confidence
 
@@ -79,14 +149,55 @@ class MLModelDocumentClassifierNode(DocumentProcessingNode):
         """
         pass
 
+    def classify_images(self, images) -> list:
+        """
+        Classifies several images. Classifies them one by one by default,
+        subclasses run a single model call on the whole batch.
+        :param images: Images to be classified.
+        :return: Class and prediction confidences for every image.
+        """
+        return [self.classify_image(image) for image in images]
+
+    def warm_up(self):
+        """
+        Classifies a blank image once so that the model is traced before the first request.
+        """
+        self.classify_image(Image.new("RGB", (224, 224)))
+
+    def get_footprint(self):
+        """
+        Reports the memory of the weights of the model, which are variables in the heap of the worker.
+        :return: dict with the node, the model path, the MiB of the weights (None if the model does not expose
+            its variables) and whether they are memory-mapped.
+        """
+        variables = getattr(self.model, "variables", None)
+        weights = None
+        if variables is not None:
+            weights = sum(int(np.prod(variable.shape)) * variable.dtype.size for variable in variables)
+        return {
+            "node": type(self).__name__,
+            "path": self.model_path,
+            "weights_mb": None if weights is None else round(weights / 2 ** 20, 1),
+            "memory_mapped": False,
+        }
+
+    @staticmethod
+    def get_image(data: dict):
+        """
+        Gets the image to classify.
+        :param data: Dictionary containing the rendered page and optionally an image prepared by an earlier node.
+        :return: data["image"], e.g. the document cropped from the page, if set, otherwise the rendered page.
+        """
+        image = data.get("image")
+        return image if image is not None else Image.open(data["jpg_bytes"])
+
     def process_document(self, data: dict):
         """
         Classifies an image of a document.
         :param data: Dictionary containing the image of the document.
         :return: Dictionary containing document class and prediction confidences.
         """
-        jpg_bytes = data["jpg_bytes"]
-        pil_image = Image.open(jpg_bytes)
+        pil_image = self.get_image(data)
         classification_result, prediction_confidences = self.classify_image(pil_image)
         
         data["document_type"] = classification_result
@@ -94,6 +205,22 @@ class MLModelDocumentClassifierNode(DocumentProcessingNode):
         
         return data
 
+    def process_documents(self, data_list: list):
+        """
+        Classifies the images of several documents with a single batched model call.
+        :param data_list: Dictionaries containing the images of the documents.
+        :return: Dictionaries containing document class and prediction confidences.
+        """
+        pil_images = [self.get_image(data) for data in data_list]
+        results = self.classify_images(pil_images)
+
+        for data, (classification_result, prediction_confidences) in zip(data_list, results):
+            data["document_type"] = classification_result
+            data["prediction_confidences"] = prediction_confidences
+            data.setdefault("timings", {})["batch_size"] = len(data_list)
+
+        return data_list
+
 
 class EffNetDocumentClassifierNode(MLModelDocumentClassifierNode):
     """
@@ -107,39 +234,73 @@ class EffNetDocumentClassifierNode(MLModelDocumentClassifierNode):
         """
         return tf.keras.models.load_model(model_path)
 
-    def classify_image(self, image) -> (str, list):
+    def preprocess_image(self, image, out=None):
         """
-        Classifies an image with the EffNet model.
+        Converts an image into the input of the EffNet model.
         :param image: Image to be classified.
-        :return: Class.
+        :param out: float32 array of shape [224, 224, 3] to write the input into, a new one if None.
+        :return: Array of shape [224, 224, 3].
         """
         image = image.resize((224, 224))
-        # Convert the image into an array
-        img_array = tf.keras.utils.img_to_array(image)
-        # Convert the array into a batch
-        img_batch = tf.expand_dims(img_array, 0)
-        # Get model predictions
-        predictions = self.model.predict(img_batch)
+        if out is None:
+            out = np.empty((224, 224, 3), dtype=np.float32)
+        # Cast the pixels into the array in place instead of allocating a float32 copy
+        out[...] = np.asarray(image.convert("RGB"))
+        return out
 
+    def postprocess_prediction(self, prediction) -> (str, list):
+        """
+        Gets the class and the prediction confidences from the prediction of one image.
+        :param prediction: Prediction of the EffNet model for one image.
+        :return: Class and prediction confidences.
+        """
         prediction_confidences = []
-        for i, prediction in enumerate(predictions[0]):
-            prediction_confidences.append((self.document_classes[i], round(prediction.item(), 2)))
+        for i, confidence in enumerate(prediction):
+            prediction_confidences.append((self.document_classes[i], round(confidence.item(), 2)))
 
         # Get the highest prediction
-        prediction = np.argmax(predictions[0])
-        if predictions[0][prediction] < self.min_confidence:
+        highest_prediction = np.argmax(prediction)
+        if prediction[highest_prediction] < self.min_confidence:
             return None, None
 
         # Get predicted class
-        predicted_class = self.document_classes[prediction]
+        predicted_class = self.document_classes[highest_prediction]
 
         return predicted_class, prediction_confidences
 
+    def classify_images(self, images) -> list:
+        """
+        Classifies several images with a single call of the EffNet model.
+        :param images: Images to be classified.
+        :return: Class and prediction confidences for every image.
+        """
+        with buffer_pool.array((len(images), 224, 224, 3), np.float32) as img_batch:
+            # Write the images into the batch
+            for i, image in enumerate(images):
+                self.preprocess_image(image, img_batch[i])
+            # Get model predictions
+            predictions = self.model.predict(img_batch)
+        return [self.postprocess_prediction(prediction) for prediction in predictions]
+
+    def classify_image(self, image) -> (str, list):
+        """
+        Classifies an image with the EffNet model.
+        :param image: Image to be classified.
+        :return: Class.
+        """
+        return self.classify_images([image])[0]
+
 
 class EffDetDocumentClassifierNode(MLModelDocumentClassifierNode):
     """
     MLModelDocumentClassifierNode that uses an EffDet model.
     """
+
+    # Set to False once the model rejected a batch, e.g. because it was exported with a batch size of one.
+    supports_batches = True
+    # Outputs of the model that are used
+    detection_outputs = ("detection_scores", "detection_classes")
+
     def load_model(self, model_path):
         """
         Loads the EffDet model.
@@ -155,44 +316,122 @@ class EffDetDocumentClassifierNode(MLModelDocumentClassifierNode):
         :return: Detections.
         """
         (im_width, im_height) = image.size
-        image_np = np.array(image.getdata()).reshape(
-            (im_height, im_width, 3)).astype(np.uint8)
-        input_tensor = tf.convert_to_tensor(image_np)
-        input_tensor = input_tensor[tf.newaxis, ...]
-        detections = self.model(input_tensor)
+        with buffer_pool.array((1, im_height, im_width, 3), np.uint8) as batch:
+            batch[0] = np.asarray(image.convert("RGB"))
+            detections = self.model(tf.convert_to_tensor(batch))
         return detections
 
-    def calculate_highest_index(self, detections):
+    @staticmethod
+    def batch_shape(images):
         """
-        Gets the index of the most confident detection.
-        :param detections: Detections.
-        :return: Index of the most confident detection.
+        :param images: Images to be detected.
+        :return: Shape [batch, height, width, 3] of the batch that fits the largest image.
         """
-        return np.argmax(detections['detection_scores'][0])
+        return len(images), max(image.size[1] for image in images), max(image.size[0] for image in images), 3
 
-    def calculate_highest_class_index(self, detections, highest_index):
+    @classmethod
+    def pad_images(cls, images, out=None):
         """
-        Gets the class of the most confident detection.
-        :param detections: Detections.
-        :param highest_index: Index of the most confident detection.
-        :return: Class of the most confident detection.
+        Pads images with black to the size of the largest one and stacks them into a batch.
+        :param images: Images to be detected.
+        :param out: uint8 array of the batch shape to write the batch into, a new one if None.
+        :return: Array of shape [batch, height, width, 3].
+        """
+        if out is None:
+            out = np.empty(cls.batch_shape(images), dtype=np.uint8)
+        for i, image in enumerate(images):
+            image_np = np.asarray(image.convert("RGB"))
+            height, width = image_np.shape[:2]
+            out[i, :height, :width] = image_np
+            # Only the padding is cleared, the buffer may hold an earlier batch
+            out[i, height:] = 0
+            out[i, :height, width:] = 0
+        return out
+
+    def get_batch_detections(self, images):
+        """
+        Gets the detections of the EffDet model for several images with a single call.
+        Models exported with a fixed batch size of one are called once per image instead.
+        :param images: Images to be detected.
+        :return: Detections of the batch.
+        """
+        if len(images) > 1 and self.supports_batches:
+            try:
+                with buffer_pool.array(self.batch_shape(images), np.uint8) as batch:
+                    return self.model(tf.convert_to_tensor(self.pad_images(images, batch)))
+            except (ValueError, tf.errors.InvalidArgumentError):
+                logger.warning("EffDet model does not accept batches, falling back to one call per image")
+                self.supports_batches = False
+
+        detections = [self.get_detections(image) for image in images]
+        return {
+            key: np.concatenate([np.asarray(detection[key]) for detection in detections])
+            for key in self.detection_outputs
+        }
+
+    def classify_images(self, images) -> list:
         """
-        return detections['detection_classes'][0][highest_index].numpy().astype(np.int)
+        Classifies several images with the EffDet model.
+        :param images: Images to be classified.
+        :return: Class and prediction confidences for every image.
+        """
+        return self.postprocess_detections(self.get_batch_detections(images))
 
-    def get_prediction_confidences(self, detections):
+    @staticmethod
+    def detections_to_numpy(detections):
         """
-        Gets the confidences of the detections.
+        Converts the detections of the EffDet model to NumPy arrays once.
         :param detections: Detections.
-        :return: Confidences of the detections.
+        :return: Scores and zero-based class indices of the detections, both of shape [batch, detections].
         """
-        prediction_confidences = []
-        for i, prediction in enumerate(detections['detection_scores'][0]):
-            document_class = self.document_classes[detections['detection_classes'][0][i].numpy().astype(np.int) - 1]
-            confidence = float(prediction.numpy())
-            if confidence >= self.min_confidence:
-                prediction_confidences.append((document_class, round(confidence, 2)))
+        scores = np.asarray(detections['detection_scores'], dtype=np.float32)
+        classes = np.asarray(detections['detection_classes']).astype(np.int64) - 1
+        return scores, classes
 
-        return prediction_confidences
+    def calculate_class_confidences(self, scores, classes):
+        """
+        Gets the highest score of every document class.
+        :param scores: Scores of the detections of shape [batch, detections].
+        :param classes: Zero-based class indices of the detections of shape [batch, detections].
+        :return: Confidences of shape [batch, document classes].
+        """
+        class_matches = classes[..., np.newaxis] == np.arange(len(self.document_classes))
+        class_scores = np.where(class_matches, scores[..., np.newaxis], 0.0)
+        return class_scores.max(axis=1, initial=0.0)
+
+    def get_prediction_confidences(self, class_confidences):
+        """
+        Gets the confidences of the document classes that reach the minimum confidence.
+        :param class_confidences: Confidences of one image of shape [document classes].
+        :return: Confidences of the document classes, highest first.
+        """
+        confident_classes = np.flatnonzero(class_confidences >= self.min_confidence)
+        confident_classes = confident_classes[np.argsort(-class_confidences[confident_classes], kind="stable")]
+        rounded_confidences = np.round(class_confidences[confident_classes].astype(np.float64), 2).tolist()
+        return [
+            (self.document_classes[class_index], confidence)
+            for class_index, confidence in zip(confident_classes.tolist(), rounded_confidences)
+        ]
+
+    def postprocess_detections(self, detections) -> list:
+        """
+        Classifies every image of a batch from its detections.
+        :param detections: Detections.
+        :return: Class and prediction confidences for every image.
+        """
+        scores, classes = self.detections_to_numpy(detections)
+        class_confidences = self.calculate_class_confidences(scores, classes)
+        highest_classes = class_confidences.argmax(axis=1)
+
+        results = []
+        for image_confidences, highest_class in zip(class_confidences, highest_classes.tolist()):
+            if image_confidences[highest_class] < self.min_confidence:
+                results.append((None, None))
+            else:
+                results.append(
+                    (self.document_classes[highest_class], self.get_prediction_confidences(image_confidences))
+                )
+        return results
 
     def classify_image(self, image) -> (str, list):
         """
@@ -201,17 +440,225 @@ class EffDetDocumentClassifierNode(MLModelDocumentClassifierNode):
         :return: Class.
         """
         detections = self.get_detections(image)
-        if len(detections['detection_scores'][0]) == 0:
-            return None, None
+        return self.postprocess_detections(detections)[0]
 
-        highest_index = self.calculate_highest_index(detections)
-        highest_class_index = self.calculate_highest_class_index(detections, highest_index)
-        highest_class = self.document_classes[highest_class_index - 1]
 
-        if detections['detection_scores'][0][highest_index].numpy() < self.min_confidence:
-            return None, None
+class EffDetDocumentLocalizerNode(EffDetDocumentClassifierNode):
+    """
+    DocumentProcessingNode that localizes the document on the rendered page with an EffDet model
+    run on a downscaled copy of the page, and crops the document from the full resolution page into data["image"].
+    The classifier node that follows then only sees the document, so the detector can run at a low resolution.
+    """
+
+    detection_outputs = ("detection_scores", "detection_boxes")
+
+    def __init__(self, model_path, min_score=0.3, input_size=320, margin=0.05):
+        """
+        Initializes an EffDetDocumentLocalizerNode.
+        :param model_path: Path to the EffDet model.
+        :param min_score: Minimum score of a detection to crop it, otherwise the whole page is classified.
+        :param input_size: Longest side in pixels of the page the detector runs on.
+        :param margin: Margin added around the detected document as a fraction of its size.
+        """
+        super().__init__(model_path, min_score)
+        self.input_size = input_size
+        self.margin = margin
+
+    def warm_up(self):
+        """
+        Localizes on a blank page once so that the model is traced before the first request.
+        """
+        self.get_detections(Image.new("RGB", (self.input_size, self.input_size)))
+
+    def downscale(self, image):
+        """
+        Downscales a page so that its longest side is input_size, keeping the aspect ratio.
+        :param image: Rendered page.
+        :return: Image.
+        """
+        scale = self.input_size / max(image.size)
+        if scale >= 1:
+            return image.convert("RGB")
+        size = (max(round(image.size[0] * scale), 1), max(round(image.size[1] * scale), 1))
+        return image.convert("RGB").resize(size, Image.BILINEAR)
+
+    def get_box(self, scores, boxes):
+        """
+        Gets the box of the most confident detection.
+        :param scores: Scores of the detections of an image of shape [detections].
+        :param boxes: Normalized [ymin, xmin, ymax, xmax] boxes of the detections of shape [detections, 4].
+        :return: Box, None if no detection reaches min_score.
+        """
+        if len(scores) == 0:
+            return None
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_confidence:
+            return None
+        return boxes[best]
+
+    def crop(self, image, box):
+        """
+        Crops a document from the page with a margin.
+        :param image: Rendered page.
+        :param box: Normalized [ymin, xmin, ymax, xmax] box of the document.
+        :return: Image of the document.
+        """
+        ymin, xmin, ymax, xmax = (float(value) for value in box)
+        margin_y, margin_x = (ymax - ymin) * self.margin, (xmax - xmin) * self.margin
+        width, height = image.size
+        left, right = max(xmin - margin_x, 0.0) * width, min(xmax + margin_x, 1.0) * width
+        top, bottom = max(ymin - margin_y, 0.0) * height, min(ymax + margin_y, 1.0) * height
+        if right - left < 1 or bottom - top < 1:
+            return image
+        return image.crop((round(left), round(top), round(right), round(bottom)))
+
+    def localize_images(self, images) -> list:
+        """
+        Localizes the documents on several pages with a single call of the EffDet model.
+        :param images: Rendered pages.
+        :return: Box of the document on every page, None where no document was detected.
+        """
+        small_images = [self.downscale(image) for image in images]
+        batched = len(small_images) > 1 and self.supports_batches
+        detections = self.get_batch_detections(small_images)
+        scores = np.asarray(detections["detection_scores"], dtype=np.float32)
+        boxes = np.array(detections["detection_boxes"], dtype=np.float32)
+
+        # A batch is padded to its largest image, so its boxes are relative to the padded size
+        if batched and self.supports_batches:
+            _, height, width, _ = self.batch_shape(small_images)
+            for i, small_image in enumerate(small_images):
+                boxes[i, :, 0::2] *= height / small_image.size[1]
+                boxes[i, :, 1::2] *= width / small_image.size[0]
+
+        return [self.get_box(image_scores, image_boxes) for image_scores, image_boxes in zip(scores, boxes)]
+
+    def set_image(self, data: dict, image, box):
+        """
+        Stores the document cropped from the page, or the whole page if no document was detected.
+        :param data: Dictionary of the document.
+        :param image: Rendered page.
+        :param box: Box of the document, None if no document was detected.
+        :return: Dictionary containing the image of the document and its box on the page.
+        """
+        data["document_box"] = None if box is None else [round(float(value), 4) for value in box]
+        data["image"] = image if box is None else self.crop(image, box)
+        return data
+
+    def process_document(self, data: dict):
+        """
+        Localizes the document on a rendered page and crops it.
+        :param data: Dictionary containing the rendered page, or the page under "image",
+            e.g. in an inference worker.
+        :return: Dictionary containing the image of the document and its box on the page.
+        """
+        image = self.get_image(data)
+        return self.set_image(data, image, self.localize_images([image])[0])
+
+    def process_documents(self, data_list: list):
+        """
+        Localizes the documents on several rendered pages with a single batched model call and crops them.
+        :param data_list: Dictionaries containing the rendered pages, or the pages under "image".
+        :return: Dictionaries containing the images of the documents and their boxes on the pages.
+        """
+        images = [self.get_image(data) for data in data_list]
+        for data, image, box in zip(data_list, images, self.localize_images(images)):
+            self.set_image(data, image, box)
+        return data_list
+
+
+class PerceptualHashCacheNode(DocumentProcessingNode):
+    """
+    DocumentProcessingNode that wraps a classifier node and reuses the classification of a near-duplicate image,
+    e.g. the same document re-scanned or re-exported with different PDF metadata.
+    """
+    def __init__(self, classifier: MLModelDocumentClassifierNode, max_size=1024, max_distance=4):
+        """
+        Initializes a PerceptualHashCacheNode.
+        :param classifier: Node that classifies the images that are not in the cache.
+        :param max_size: Maximum number of cached classifications.
+        :param max_distance: Maximum Hamming distance between the 64 bit hashes of near-duplicates.
+        """
+        self.classifier = classifier
+        self.index = PerceptualHashIndex(max_size, max_distance)
 
-        prediction_confidences = self.get_prediction_confidences(detections)
+    def warm_up(self):
+        self.classifier.warm_up()
 
-        return highest_class, prediction_confidences
+    def get_footprint(self):
+        return self.classifier.get_footprint()
 
+    @staticmethod
+    def hash_image(data: dict):
+        """
+        Computes the perceptual hash of the image of a document and rewinds the image for the classifier.
+        :param data: Dictionary containing the image of the document.
+        :return: int.
+        """
+        if data.get("image") is not None:
+            return dhash(data["image"])
+        jpg_bytes = data["jpg_bytes"]
+        with Image.open(jpg_bytes) as image:
+            hash_value = dhash(image)
+        jpg_bytes.seek(0)
+        return hash_value
+
+    @staticmethod
+    def record_lookup(hit):
+        perceptual_cache_requests.inc(result="hit" if hit else "miss")
+        hits = perceptual_cache_requests.value(result="hit")
+        perceptual_cache_hit_ratio.set(hits / (hits + perceptual_cache_requests.value(result="miss")))
+
+    def lookup(self, data: dict, hash_value):
+        """
+        Copies a cached classification into the data of a document.
+        :param data: Dictionary of the document.
+        :param hash_value: Perceptual hash of the image of the document.
+        :return: Whether a near-duplicate was found.
+        """
+        cached = self.index.get(hash_value)
+        data["cache_hit"] = cached is not None
+        self.record_lookup(data["cache_hit"])
+        if cached is not None:
+            document_type, prediction_confidences = cached
+            data["document_type"] = document_type
+            data["prediction_confidences"] = None if prediction_confidences is None else list(prediction_confidences)
+        return data["cache_hit"]
+
+    def store(self, data: dict, hash_value):
+        self.index.put(hash_value, (data.get("document_type"), data.get("prediction_confidences")))
+
+    def process_document(self, data: dict):
+        """
+        Classifies an image of a document or reuses the classification of a near-duplicate.
+        :param data: Dictionary containing the image of the document.
+        :return: Dictionary containing document class, prediction confidences and whether the cache was hit.
+        """
+        hash_value = self.hash_image(data)
+        if not self.lookup(data, hash_value):
+            data = self.classifier.process_document(data)
+            self.store(data, hash_value)
+        return data
+
+    def process_documents(self, data_list: list):
+        """
+        Reuses the cached classifications and classifies the remaining images as one batch.
+        :param data_list: Dictionaries containing the images of the documents.
+        :return: Dictionaries containing document class, prediction confidences and whether the cache was hit.
+        """
+        misses = []
+        for data in data_list:
+            try:
+                hash_value = self.hash_image(data)
+            except Exception as e:
+                data["error"] = e
+                continue
+            if not self.lookup(data, hash_value):
+                misses.append((data, hash_value))
+
+        if misses:
+            classified = self.classifier.process_documents([data for data, _ in misses])
+            for data, (_, hash_value) in zip(classified, misses):
+                if "error" not in data:
+                    self.store(data, hash_value)
+        return data_list
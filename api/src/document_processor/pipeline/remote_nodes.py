@@ -0,0 +1,404 @@
+"""
+Client side of the remote inference protocol, which runs the classifier in separate inference workers
+so that rendering front-ends and inference back-ends can be scaled independently.
+
+Every message is a frame of
+    header length (4 bytes, big endian) | payload length (4 bytes, big endian) | JSON header | payload
+where the payload is the raw buffer of a NumPy array whose dtype and shape are given in the header.
+"""
+import itertools
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from .pipeline_nodes import DocumentProcessingNode, EffDetDocumentClassifierNode, MLModelDocumentClassifierNode
+
+from ..logger import logger
+from ..metrics import metrics
+
+remote_inference_batch_size = metrics.histogram(
+    "remote_inference_batch_size",
+    "Images per request sent to an inference worker.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+remote_inference_errors = metrics.counter(
+    "remote_inference_errors_total",
+    "Failed requests to inference workers by reason (connection, worker).",
+)
+
+FRAME_PREFIX = struct.Struct("!II")
+DEFAULT_PORT = 8500
+
+
+class RemoteInferenceError(RuntimeError):
+    """
+    Raised when an inference worker cannot be reached or fails to classify the images.
+    """
+    pass
+
+
+def recv_exact(sock, size):
+    """
+    Receives exactly size bytes.
+    :param sock: Connected socket.
+    :param size: Number of bytes.
+    :return: bytearray.
+    :raises ConnectionError: if the connection is closed before.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    while view:
+        received = sock.recv_into(view)
+        if received == 0:
+            raise ConnectionError("Connection closed by the peer")
+        view = view[received:]
+    return buffer
+
+
+def send_message(sock, header: dict, array=None):
+    """
+    Sends a frame.
+    :param sock: Connected socket.
+    :param header: JSON serializable header.
+    :param array: NumPy array sent as the payload without copying, None for no payload.
+    """
+    if array is not None:
+        array = np.ascontiguousarray(array)
+        header = {**header, "dtype": array.dtype.str, "shape": list(array.shape)}
+    header_bytes = json.dumps(header).encode()
+    payload_length = 0 if array is None else array.nbytes
+    sock.sendall(FRAME_PREFIX.pack(len(header_bytes), payload_length) + header_bytes)
+    if payload_length:
+        sock.sendall(memoryview(array).cast("B"))
+
+
+def recv_message(sock):
+    """
+    Receives a frame.
+    :param sock: Connected socket.
+    :return: Header and the NumPy array of the payload, None if there is no payload.
+    :raises ConnectionError: if the connection is closed.
+    """
+    header_length, payload_length = FRAME_PREFIX.unpack(recv_exact(sock, FRAME_PREFIX.size))
+    header = json.loads(recv_exact(sock, header_length))
+    if not payload_length:
+        return header, None
+    payload = recv_exact(sock, payload_length)
+    return header, np.frombuffer(payload, dtype=np.dtype(header["dtype"])).reshape(header["shape"])
+
+
+def parse_addresses(addresses):
+    """
+    Parses the addresses of the inference workers.
+    :param addresses: Comma separated host:port, e.g. "inference-1:8500,inference-2:8500".
+    :return: list of (host, port).
+    """
+    parsed = []
+    for address in filter(None, (address.strip() for address in addresses.split(","))):
+        host, _, port = address.rpartition(":")
+        parsed.append((host, int(port)) if host else (address, DEFAULT_PORT))
+    if not parsed:
+        raise ValueError("At least one inference worker address must be given")
+    return parsed
+
+
+def images_to_batch(images, size=None):
+    """
+    Stacks images into a uint8 batch padded to the largest image.
+    :param images: Images.
+    :param size: (width, height) to resize every image to before sending it, None to send them as they are.
+    :return: Array of shape [batch, height, width, 3] and the (width, height) of every image.
+    """
+    if size is not None:
+        images = [image.resize(size) for image in images]
+    return EffDetDocumentClassifierNode.pad_images(images), [list(image.size) for image in images]
+
+
+def batch_to_images(batch, sizes):
+    """
+    Splits a padded batch back into images.
+    :param batch: Array of shape [batch, height, width, 3].
+    :param sizes: (width, height) of every image.
+    :return: Images.
+    """
+    return [Image.fromarray(image[:height, :width]) for image, (width, height) in zip(batch, sizes)]
+
+
+class ConnectionPool:
+    """
+    Pool of persistent connections to one or more inference workers, new connections go round-robin to them.
+    """
+    def __init__(self, addresses, size=4, timeout=30.0):
+        """
+        Initializes a ConnectionPool, connections are opened when they are first needed.
+        :param addresses: list of (host, port) of the inference workers.
+        :param size: Maximum number of idle connections that are kept open.
+        :param timeout: Seconds after which a connection attempt or a response is given up.
+        """
+        self.addresses = addresses
+        self.size = size
+        self.timeout = timeout
+        self._next_address = itertools.cycle(addresses)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            address = next(self._next_address)
+        sock = socket.create_connection(address, timeout=self.timeout)
+        # Requests are small and latency bound
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @contextmanager
+    def connection(self):
+        """
+        Lends a connection, it is closed instead of returned if the block fails.
+        :return: Context manager of the socket and whether it was reused.
+        """
+        try:
+            sock, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            sock, reused = self.connect(), False
+        try:
+            yield sock, reused
+        except BaseException:
+            sock.close()
+            raise
+        if self._idle.qsize() < self.size:
+            self._idle.put(sock)
+        else:
+            sock.close()
+
+    def request(self, header: dict, array=None, timeout=None):
+        """
+        Sends a request and waits for the response.
+        A reused connection may have been closed by a restarted worker, then the request is sent once more.
+        :param header: Header of the request.
+        :param array: Payload of the request.
+        :param timeout: Seconds to wait for the response, the timeout of the pool if None.
+        :return: Header and payload of the response.
+        :raises RemoteInferenceError: if no inference worker answers.
+        """
+        for attempt in range(2):
+            reused = False
+            try:
+                with self.connection() as (sock, reused):
+                    sock.settimeout(timeout or self.timeout)
+                    send_message(sock, header, array)
+                    return recv_message(sock)
+            except (OSError, ConnectionError) as e:
+                if reused and attempt == 0 and not isinstance(e, socket.timeout):
+                    continue
+                remote_inference_errors.inc(reason="connection")
+                raise RemoteInferenceError(f"Inference worker is not reachable: {e}") from e
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class MicroBatcher:
+    """
+    Collects the items that concurrent callers submit into batches, a batch is processed
+    when it is full or when its first item waited max_delay seconds.
+    """
+    def __init__(self, process_batch, max_batch_size=8, max_delay=0.005, max_in_flight=4):
+        """
+        Initializes a MicroBatcher, its dispatcher thread is started on the first submit.
+        :param process_batch: Function that processes a list of items and returns a list of results,
+            an exception in place of a result fails only that item.
+        :param max_batch_size: Maximum number of items in a batch.
+        :param max_delay: Seconds the first item of a batch waits for more items.
+        :param max_in_flight: Maximum number of batches processed at the same time.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="remote-inference")
+        self._dispatcher = None
+        self._lock = threading.Lock()
+
+    def submit(self, item) -> Future:
+        """
+        Submits an item.
+        :param item: Item to be processed.
+        :return: Future of its result.
+        """
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self.dispatch, name="micro-batcher", daemon=True)
+                self._dispatcher.start()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def collect(self):
+        """
+        Waits for the next batch.
+        :return: list of (item, Future).
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def dispatch(self):
+        while True:
+            self._executor.submit(self.run_batch, self.collect())
+
+    def run_batch(self, batch):
+        """
+        Processes a batch and resolves the futures of its items.
+        :param batch: list of (item, Future).
+        """
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class RemoteDocumentClassifierNode(DocumentProcessingNode):
+    """
+    DocumentProcessingNode that classifies the image of a document with an inference worker,
+    see document_processor.inference_worker. Images of concurrent requests are sent in one batch.
+    """
+    def __init__(self, addresses, pool_size=4, max_batch_size=8, max_batch_delay=0.005, timeout=30.0):
+        """
+        Initializes a RemoteDocumentClassifierNode.
+        :param addresses: Comma separated host:port of the inference workers.
+        :param pool_size: Number of connections kept open and of batches sent at the same time.
+        :param max_batch_size: Maximum number of images sent in one request.
+        :param max_batch_delay: Seconds an image waits for the images of other requests.
+        :param timeout: Seconds after which an inference worker is considered unreachable.
+        """
+        self.pool = ConnectionPool(parse_addresses(addresses), size=pool_size, timeout=timeout)
+        self.max_batch_size = max_batch_size
+        self.batcher = MicroBatcher(self.classify_images, max_batch_size, max_batch_delay, max_in_flight=pool_size)
+        # Size the worker resizes every image to, sent by the worker so that smaller images are transferred
+        self.input_size = None
+        self.info = None
+
+    def get_info(self):
+        """
+        Gets the model and input size of the inference workers.
+        :return: dict.
+        """
+        if self.info is None:
+            header, _ = self.pool.request({"op": "info"})
+            self.info = header
+            self.input_size = tuple(header["input_size"]) if header.get("input_size") else None
+        return self.info
+
+    def warm_up(self):
+        """
+        Checks that an inference worker is reachable and gets its input size.
+        """
+        info = self.get_info()
+        logger.info(f"Classifying with remote inference worker running {info.get('model')}")
+
+    def classify_images(self, images) -> list:
+        """
+        Classifies several images with a single request to an inference worker.
+        :param images: Images to be classified.
+        :return: Class and prediction confidences for every image, or a RemoteInferenceError for images that failed.
+        :raises RemoteInferenceError: if the request failed.
+        """
+        self.get_info()
+        batch, sizes = images_to_batch(images, self.input_size)
+        remote_inference_batch_size.observe(len(images))
+        header, _ = self.pool.request({"op": "classify", "sizes": sizes}, batch)
+        if "error" in header:
+            remote_inference_errors.inc(reason="worker")
+            raise RemoteInferenceError(f"Inference worker failed: {header['error']}")
+        return [self.parse_result(result) for result in header["results"]]
+
+    @staticmethod
+    def parse_result(result):
+        """
+        Parses the result of one image.
+        :param result: [document_type, prediction_confidences] or {"error": message} if the image failed.
+        :return: Class and prediction confidences, or a RemoteInferenceError.
+        """
+        if isinstance(result, dict):
+            remote_inference_errors.inc(reason="worker")
+            return RemoteInferenceError(f"Inference worker failed: {result['error']}")
+        document_type, confidences = result
+        return document_type, None if confidences is None else [tuple(confidence) for confidence in confidences]
+
+    def classify_image(self, image) -> (str, list):
+        """
+        Classifies an image together with the images of concurrent requests.
+        :param image: Image to be classified.
+        :return: Class and prediction confidences.
+        """
+        return self.batcher.submit(image).result()
+
+    def process_document(self, data: dict):
+        """
+        Classifies an image of a document.
+        :param data: Dictionary containing the image of the document.
+        :return: Dictionary containing document class and prediction confidences.
+        """
+        future = self.batcher.submit(MLModelDocumentClassifierNode.get_image(data))
+        deadline = data.get("deadline")
+        try:
+            classification_result, prediction_confidences = future.result(
+                None if deadline is None else deadline.remaining()
+            )
+        except FutureTimeoutError:
+            future.cancel()
+            deadline.check()
+            raise
+        data["document_type"] = classification_result
+        data["prediction_confidences"] = prediction_confidences
+        return data
+
+    def process_documents(self, data_list: list):
+        """
+        Classifies the images of several documents in requests of at most max_batch_size images.
+        :param data_list: Dictionaries containing the images of the documents.
+        :return: Dictionaries containing document class and prediction confidences, or the exception under "error".
+        """
+        images = [MLModelDocumentClassifierNode.get_image(data) for data in data_list]
+        results = []
+        for start in range(0, len(images), self.max_batch_size):
+            results.extend(self.classify_images(images[start:start + self.max_batch_size]))
+
+        for data, result in zip(data_list, results):
+            if isinstance(result, Exception):
+                data["error"] = result
+                continue
+            data["document_type"], data["prediction_confidences"] = result
+            data.setdefault("timings", {})["batch_size"] = len(data_list)
+
+        return data_list
@@ -0,0 +1,362 @@
+import importlib.util
+import multiprocessing
+import queue
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+from .pdf_to_image_converter import CANCEL_POLL_INTERVAL, PdfRejectedError, PdfToJpgConverter, rejected_pdfs
+
+from ..deadline import DeadlineExceededError
+from ..logger import logger
+from ..metrics import metrics
+
+render_worker_restarts = metrics.counter(
+    "render_worker_restarts_total",
+    "Restarts of rendering workers by reason (timeout, cancelled, crash, unhealthy).",
+)
+idle_render_workers = metrics.gauge(
+    "idle_render_workers",
+    "Rendering workers that are waiting for a PDF.",
+)
+
+# Size of the shared memory buffer of a worker without max_render_memory, fits an A4 page at 200 DPI.
+# Pages that do not fit are sent through the pipe. The buffers are in /dev/shm, which is 64 MiB in Docker by default.
+DEFAULT_BUFFER_SIZE = 16 * 2 ** 20
+
+
+def get_buffer_size(max_render_memory=None):
+    """
+    Sizes the shared memory buffer of a worker so that the pixels of every PDF within the limits fit.
+    :param max_render_memory: Maximum estimated memory in bytes that rendering a PDF may allocate, None for no limit.
+    :return: Bytes.
+    """
+    if max_render_memory is None:
+        return DEFAULT_BUFFER_SIZE
+    # The estimate counts the pixels twice, the output of the renderer and the decoded RGB images
+    return max(max_render_memory // 2, 1)
+
+
+class RenderWorkerTimeoutError(TimeoutError):
+    """
+    Raised when a rendering worker does not answer in time.
+    """
+    pass
+
+
+def render_pages(pdf_bytes, checker, shared_buffer):
+    """
+    Renders the pages of a PDF with pdfium into the shared buffer, runs in the worker process.
+    :param pdf_bytes: PDF.
+    :param checker: PdfToJpgConverter whose limits are checked before rendering.
+    :param shared_buffer: memoryview of the shared memory of the worker.
+    :return: ("pages", [(width, height, offset, pixels)]) where either the offset in the buffer or the RGB pixels
+        are given, or ("rejected", reason, message) if the PDF exceeds the limits.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        pages = len(pdf)
+        rendered_pages = pages if checker.max_pages is None else min(pages, checker.max_pages)
+        violation = checker.get_limit_violation(pages, [pdf.get_page_size(i) for i in range(rendered_pages)])
+        if violation is not None:
+            return ("rejected", *violation)
+
+        layout, offset = [], 0
+        for index in range(pages):
+            page = pdf[index]
+            image = page.render(scale=checker.DPI / 72).to_pil().convert("RGB")
+            page.close()
+            pixels = image.tobytes()
+            if offset + len(pixels) <= len(shared_buffer):
+                shared_buffer[offset:offset + len(pixels)] = pixels
+                layout.append((image.width, image.height, offset, None))
+                offset += len(pixels)
+            else:
+                layout.append((image.width, image.height, None, pixels))
+        return "pages", layout
+    finally:
+        pdf.close()
+
+
+def run_render_worker(connection, buffer_name, limits):
+    """
+    Main loop of a worker process, renders the PDFs it receives until it receives None.
+    :param connection: Pipe to the converter.
+    :param buffer_name: Name of the shared memory the pages are written to.
+    :param limits: max_pages, max_page_size and max_render_memory of the converter.
+    """
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    checker = PdfToJpgConverter(None, *limits)
+    try:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            if message[0] == "ping":
+                connection.send(("pong",))
+                continue
+            try:
+                connection.send(render_pages(message[1], checker, buffer.buf))
+            except Exception as e:
+                connection.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        buffer.close()
+
+
+class RenderWorker:
+    """
+    Long-lived process that renders PDFs and returns the raw pixels through shared memory.
+    """
+    def __init__(self, context, limits, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Initializes and starts a RenderWorker.
+        :param context: multiprocessing context the process is started with.
+        :param limits: max_pages, max_page_size and max_render_memory of the converter.
+        :param buffer_size: Bytes of the shared memory buffer.
+        """
+        self.context = context
+        self.limits = limits
+        self.buffer = shared_memory.SharedMemory(create=True, size=buffer_size)
+        self.process = None
+        self.connection = None
+        self.start()
+
+    def start(self):
+        self.connection, worker_connection = self.context.Pipe()
+        self.process = self.context.Process(
+            target=run_render_worker, args=(worker_connection, self.buffer.name, self.limits), daemon=True
+        )
+        self.process.start()
+        worker_connection.close()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.connection.close()
+
+    def restart(self, reason):
+        """
+        Replaces the process of the worker, e.g. after it crashed or hung.
+        :param reason: timeout, cancelled, crash or unhealthy.
+        """
+        logger.warning(f"Restarting rendering worker {self.process.pid} ({reason})")
+        render_worker_restarts.inc(reason=reason)
+        self.stop()
+        self.start()
+
+    def close(self):
+        """
+        Stops the process and frees the shared memory.
+        """
+        self.stop()
+        self.buffer.close()
+        self.buffer.unlink()
+
+    def request(self, message, timeout=None, deadline=None):
+        """
+        Sends a message to the worker and waits for its answer.
+        :param message: Message.
+        :param timeout: Seconds to wait for the answer, None to wait until it answers.
+        :param deadline: Deadline of the request, waiting stops as soon as it is cancelled.
+        :return: Answer of the worker.
+        :raises RenderWorkerTimeoutError: if the worker does not answer in time.
+        :raises DeadlineExceededError: if the request was cancelled before the worker answered.
+        :raises EOFError, OSError: if the worker crashed.
+        """
+        self.connection.send(message)
+        expires = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = None if expires is None else max(expires - time.monotonic(), 0.0)
+            if deadline is not None:
+                wait = CANCEL_POLL_INTERVAL if wait is None else min(wait, CANCEL_POLL_INTERVAL)
+            if self.connection.poll(wait):
+                return self.connection.recv()
+            if deadline is not None and deadline.cancelled:
+                deadline.check()
+            if expires is not None and time.monotonic() >= expires:
+                raise RenderWorkerTimeoutError(f"Rendering worker did not answer within {timeout}s")
+
+    def is_healthy(self, timeout=1.0):
+        """
+        :param timeout: Seconds the worker may take to answer a ping.
+        :return: Whether the process is alive and answers.
+        """
+        if not self.process.is_alive():
+            return False
+        try:
+            return self.request(("ping",), timeout) == ("pong",)
+        except (RenderWorkerTimeoutError, EOFError, OSError):
+            return False
+
+    def read_pages(self, layout):
+        """
+        Copies the pages the worker rendered out of the shared memory.
+        :param layout: Sizes and offsets of the pages returned by the worker.
+        :return: Images of the pages.
+        """
+        images = []
+        for width, height, offset, pixels in layout:
+            if pixels is None:
+                pixels = bytes(self.buffer.buf[offset:offset + width * height * 3])
+            images.append(Image.frombytes("RGB", (width, height), pixels))
+        return images
+
+
+def check_workers(idle_workers, workers, stopped, interval):
+    """
+    Restarts the idle workers that crashed or stopped answering, runs in a daemon thread.
+    Only references the workers and not the converter, so that the converter can be garbage collected.
+    :param idle_workers: Queue of the idle workers.
+    :param workers: All workers of the converter.
+    :param stopped: Event that stops the health checks.
+    :param interval: Seconds between two health checks.
+    """
+    while not stopped.wait(interval):
+        checked = []
+        for _ in range(len(workers)):
+            try:
+                checked.append(idle_workers.get_nowait())
+            except queue.Empty:
+                break
+        for worker in checked:
+            if not worker.is_healthy():
+                worker.restart("unhealthy")
+            idle_workers.put(worker)
+
+
+def close_workers(workers, stopped):
+    stopped.set()
+    for worker in workers:
+        worker.close()
+
+
+class PooledPdfToImageConverter(PdfToJpgConverter):
+    """
+    PdfToJpgConverter that renders with a pool of long-lived worker processes instead of starting poppler,
+    which writes the pages to temporary files, for every PDF.
+    The workers render with pdfium and return the raw pixels through shared memory.
+    Workers that crash or hang are restarted.
+    """
+    def __init__(self, workers=2, timeout=None, max_pages=None, max_page_size=None, max_render_memory=None,
+                 buffer_size=None, health_check_interval=10.0):
+        """
+        Initializes a PooledPdfToImageConverter and starts its workers, all limits are disabled by default.
+        :param workers: Number of worker processes, the number of PDFs that are rendered in parallel.
+        :param timeout: Seconds after which a worker is restarted and the PDF is rejected.
+        :param max_pages: Maximum number of pages.
+        :param max_page_size: Maximum width and height of every page in points (1/72 inch).
+        :param max_render_memory: Maximum estimated memory in bytes that rendering all pages may allocate.
+        :param buffer_size: Bytes of the shared memory buffer of every worker, by default sized from max_render_memory.
+        :param health_check_interval: Seconds between two health checks of the idle workers, 0 disables them.
+        """
+        if importlib.util.find_spec("pypdfium2") is None:
+            raise ImportError("pypdfium2 is required to render with a pool of workers")
+        super().__init__(timeout, max_pages, max_page_size, max_render_memory)
+
+        # Processes are spawned, forking a process that runs TensorFlow is not safe
+        context = multiprocessing.get_context("spawn")
+        limits = (max_pages, max_page_size, max_render_memory)
+        if buffer_size is None:
+            buffer_size = get_buffer_size(max_render_memory)
+        self.workers = [RenderWorker(context, limits, buffer_size) for _ in range(workers)]
+        # The most recently used worker is reused first, so that its memory is warm
+        self.idle_workers = queue.LifoQueue()
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+        idle_render_workers.inc(len(self.workers))
+
+        self.stopped = threading.Event()
+        self.finalizer = weakref.finalize(self, close_workers, self.workers, self.stopped)
+        if health_check_interval > 0:
+            threading.Thread(
+                target=check_workers,
+                args=(self.idle_workers, self.workers, self.stopped, health_check_interval),
+                daemon=True,
+            ).start()
+
+    def close(self):
+        """
+        Stops the workers.
+        """
+        if self.finalizer.alive:
+            idle_render_workers.dec(self.idle_workers.qsize())
+        self.finalizer()
+
+    def render(self, worker, pdf_bytes, timeout=None, deadline=None):
+        """
+        Renders a PDF with a worker.
+        :param worker: RenderWorker.
+        :param pdf_bytes: PDF.
+        :param timeout: Seconds the worker may take, None to wait until it answers.
+        :param deadline: Deadline of the request, the worker is restarted when it is cancelled.
+        :return: Images of the pages.
+        :raises RenderWorkerTimeoutError: if the worker did not answer in time, it is restarted.
+        :raises DeadlineExceededError: if the request was cancelled, the worker is restarted.
+        """
+        if not worker.process.is_alive():
+            # The worker died while it was idle, e.g. killed by the OOM killer, the PDF is not to blame
+            worker.restart("crash")
+        try:
+            answer = worker.request(("render", pdf_bytes), timeout, deadline)
+        except RenderWorkerTimeoutError:
+            # The worker is still busy with the PDF and cannot be reused
+            worker.restart("timeout")
+            raise
+        except DeadlineExceededError:
+            # Stops rendering the PDF of the cancelled request
+            worker.restart("cancelled")
+            raise
+        except (EOFError, OSError):
+            worker.restart("crash")
+            rejected_pdfs.inc(reason="crash")
+            raise PdfRejectedError("The renderer crashed while rendering the PDF")
+
+        if answer[0] == "rejected":
+            _, reason, message = answer
+            rejected_pdfs.inc(reason=reason)
+            raise PdfRejectedError(message)
+        if answer[0] == "error":
+            rejected_pdfs.inc(reason="invalid")
+            raise PdfRejectedError(f"The PDF could not be rendered: {answer[1]}")
+        return worker.read_pages(answer[1])
+
+    def convert(self, pdf_bytes: bytes, timeout=None, deadline=None):
+        """
+        Converts a PDF into JPEGs of all its pages with one of the workers.
+        :param pdf_bytes: PDF.
+        :param timeout: Seconds until the deadline of the request, None for no deadline.
+        :param deadline: Deadline of the request, the worker is restarted when it is cancelled.
+        :return: BytesIO with the JPEGs.
+        :raises PdfRejectedError: if the PDF exceeds the limits or cannot be rendered.
+        :raises PdfRenderTimeoutError: if the timeout of the converter expires.
+        :raises DeadlineExceededError: if the deadline of the request expires or it is cancelled.
+        """
+        timeouts = [t for t in (self.timeout, timeout) if t is not None]
+        effective_timeout = min(timeouts) if timeouts else None
+        start = time.monotonic()
+        try:
+            worker = self.idle_workers.get(timeout=effective_timeout)
+        except queue.Empty:
+            raise self.timeout_error(timeout, effective_timeout)
+        idle_render_workers.dec()
+        try:
+            remaining = None
+            if effective_timeout is not None:
+                remaining = max(effective_timeout - (time.monotonic() - start), 0.001)
+            images = self.render(worker, pdf_bytes, remaining, deadline)
+        except RenderWorkerTimeoutError:
+            raise self.timeout_error(timeout, effective_timeout)
+        finally:
+            self.idle_workers.put(worker)
+            idle_render_workers.inc()
+
+        return self.encode_images(images)
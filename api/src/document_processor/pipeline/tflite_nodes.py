@@ -0,0 +1,179 @@
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from .buffer_pool import buffer_pool
+from .pipeline_nodes import EffDetDocumentClassifierNode, EffNetDocumentClassifierNode
+
+from ..logger import logger
+
+SIGNATURE = "serving_default"
+# Ops that expand weights stored as float16 or in a sparse format into dense tensors when the interpreter is prepared
+EXPANDING_OPS = ("DEQUANTIZE", "DENSIFY")
+
+
+def get_expanded_weights_size(interpreter):
+    """
+    Sums the sizes of the dense tensors that the weights of FLOAT16 and pruned models are expanded into.
+    These are in the heap of every worker, unlike the memory-mapped weights they are expanded from.
+    :param interpreter: tf.lite.Interpreter.
+    :return: Bytes of the expanded weights, 0 if the model has no expanding ops.
+    """
+    tensors = {tensor["index"]: tensor for tensor in interpreter.get_tensor_details()}
+    size = 0
+    for op in interpreter._get_ops_details():
+        if op["op_name"] not in EXPANDING_OPS:
+            continue
+        for index in op["outputs"]:
+            tensor = tensors.get(index)
+            if tensor is not None:
+                size += int(np.prod(tensor["shape"])) * np.dtype(tensor["dtype"]).itemsize
+    return size
+
+
+class TFLiteInterpreterMixin:
+    """
+    Loads a model converted to TensorFlow Lite, see document_processor.export_tflite.
+    The interpreter memory-maps the .tflite file instead of reading the weights into the heap,
+    so the weights are pages of the page cache that all workers on a host share.
+    Weights stored as float16 or in a sparse format are expanded into dense float32 tensors in the heap.
+    XNNPACK, which TensorFlow Lite applies to float models by default, repacks the weights into the heap,
+    so it is only used if enabled. An interpreter runs one batch at a time.
+    """
+    def configure_interpreter(self, num_threads=None, xnnpack=False):
+        """
+        Stores the interpreter options, call this before load_model.
+        :param num_threads: Threads used within an op, the TensorFlow Lite default if None.
+        :param xnnpack: Whether to use XNNPACK, which is faster but keeps a private copy of the float weights.
+        """
+        self.num_threads = num_threads
+        self.xnnpack = xnnpack
+        self.interpreter_lock = threading.Lock()
+
+    def load_model(self, model_path):
+        """
+        Loads the TensorFlow Lite model.
+        :param model_path: Path to the .tflite file.
+        :return: tf.lite.Interpreter.
+        """
+        op_resolver_type = (
+            tf.lite.experimental.OpResolverType.AUTO
+            if self.xnnpack
+            else tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        )
+        interpreter = tf.lite.Interpreter(
+            model_path=model_path, num_threads=self.num_threads, experimental_op_resolver_type=op_resolver_type
+        )
+        signature = interpreter.get_signature_list()[SIGNATURE]
+        self.input_name = signature["inputs"][0]
+        self.output_names = signature["outputs"]
+        self.runner = interpreter.get_signature_runner(SIGNATURE)
+        self.expanded_weights_size = get_expanded_weights_size(interpreter)
+        return interpreter
+
+    def run(self, batch):
+        """
+        Runs the model, the input is resized to the shape of the batch.
+        :param batch: Input of the model.
+        :return: dict of output name to array.
+        """
+        with self.interpreter_lock:
+            return self.runner(**{self.input_name: batch})
+
+    def get_footprint(self):
+        """
+        Reports the memory of the weights, which stay memory-mapped from the .tflite file,
+        and of the weights that are expanded into the heap.
+        :return: dict with the node, the model path, the MiB of the weights, whether they are memory-mapped
+            and the MiB of the expanded weights in the heap.
+        """
+        return {
+            "node": type(self).__name__,
+            "path": os.path.realpath(self.model_path),
+            "weights_mb": round(os.path.getsize(self.model_path) / 2 ** 20, 1),
+            "memory_mapped": not self.xnnpack,
+            "heap_weights_mb": round(self.expanded_weights_size / 2 ** 20, 1),
+        }
+
+
+class TFLiteEffNetDocumentClassifierNode(TFLiteInterpreterMixin, EffNetDocumentClassifierNode):
+    """
+    EffNetDocumentClassifierNode that runs the EffNet model converted to TensorFlow Lite.
+    """
+    def __init__(self, model_path, min_confidence, num_threads=None, xnnpack=False):
+        """
+        Initializes a TFLiteEffNetDocumentClassifierNode.
+        :param model_path: Path to the .tflite file.
+        :param min_confidence: Minimum required confidence of the classification otherwise classification is unknown.
+        :param num_threads: Threads used within an op, the TensorFlow Lite default if None.
+        :param xnnpack: Whether to use XNNPACK, which is faster but keeps a private copy of the float weights.
+        """
+        self.configure_interpreter(num_threads, xnnpack)
+        super().__init__(model_path, min_confidence)
+
+    def classify_images(self, images) -> list:
+        """
+        Classifies several images with a single run of the EffNet model.
+        :param images: Images to be classified.
+        :return: Class and prediction confidences for every image.
+        """
+        with buffer_pool.array((len(images), 224, 224, 3), np.float32) as img_batch:
+            for i, image in enumerate(images):
+                self.preprocess_image(image, img_batch[i])
+            predictions = self.run(img_batch)[self.output_names[0]]
+        return [self.postprocess_prediction(prediction) for prediction in predictions]
+
+
+class TFLiteEffDetDocumentClassifierNode(TFLiteInterpreterMixin, EffDetDocumentClassifierNode):
+    """
+    EffDetDocumentClassifierNode that runs the EffDet model converted to TensorFlow Lite.
+    """
+    def __init__(self, model_path, min_confidence, num_threads=None, xnnpack=False):
+        """
+        Initializes a TFLiteEffDetDocumentClassifierNode.
+        :param model_path: Path to the .tflite file.
+        :param min_confidence: Minimum required confidence of the classification otherwise classification is unknown.
+        :param num_threads: Threads used within an op, the TensorFlow Lite default if None.
+        :param xnnpack: Whether to use XNNPACK, which is faster but keeps a private copy of the float weights.
+        """
+        self.configure_interpreter(num_threads, xnnpack)
+        super().__init__(model_path, min_confidence)
+
+    def detect(self, batch):
+        """
+        Runs the EffDet model.
+        :param batch: Array of shape [batch, height, width, 3] of uint8.
+        :return: Detections.
+        """
+        outputs = self.run(batch)
+        return {key: outputs[key] for key in self.detection_outputs}
+
+    def get_detections(self, image):
+        """
+        Gets all the detections of the EffDet model.
+        :param image: Image to be detected.
+        :return: Detections.
+        """
+        with buffer_pool.array(self.batch_shape([image]), np.uint8) as batch:
+            batch[0] = np.asarray(image.convert("RGB"))
+            return self.detect(batch)
+
+    def get_batch_detections(self, images):
+        """
+        Gets the detections of the EffDet model for several images with a single run.
+        Models converted with a fixed batch size of one are run once per image instead.
+        :param images: Images to be detected.
+        :return: Detections of the batch.
+        """
+        if len(images) > 1 and self.supports_batches:
+            try:
+                with buffer_pool.array(self.batch_shape(images), np.uint8) as batch:
+                    return self.detect(self.pad_images(images, batch))
+            except (ValueError, RuntimeError) as e:
+                logger.warning(f"TFLite EffDet model does not accept batches, falling back to one run per image: {e}")
+                self.supports_batches = False
+
+        detections = [self.get_detections(image) for image in images]
+        return {key: np.concatenate([detection[key] for detection in detections]) for key in self.detection_outputs}
@@ -0,0 +1,177 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from document_processor.logger import logger
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class ProfilerBusyError(RuntimeError):
+    """
+    Raised when a profile is requested while another one is running.
+    """
+    pass
+
+
+class SamplingProfiler:
+    """
+    Profiler that periodically samples the Python stacks of all threads of the process.
+    Nothing is sampled unless a profile is running, so it has no overhead otherwise.
+    """
+    def __init__(self):
+        """
+        Initializes a SamplingProfiler.
+        """
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_stack(frame):
+        """
+        Gets the stack of a frame from the outermost to the innermost call.
+        :param frame: Innermost frame of a thread.
+        :return: tuple of (function, file, line).
+        """
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def sample(self, duration, interval):
+        """
+        Samples the stacks of all other threads.
+        :param duration: Seconds to sample for.
+        :param interval: Seconds between two samples.
+        :return: dict of thread name to list of stacks.
+        """
+        own_ident = threading.get_ident()
+        samples = {}
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                thread_name = thread_names.get(ident, str(ident))
+                samples.setdefault(thread_name, []).append(self.get_stack(frame))
+            time.sleep(interval)
+        return samples
+
+    @staticmethod
+    def to_speedscope(samples, duration, interval):
+        """
+        Converts samples to the speedscope file format.
+        :param samples: dict of thread name to list of stacks.
+        :param duration: Seconds that were sampled.
+        :param interval: Seconds between two samples.
+        :return: dict that can be serialized to a speedscope file.
+        """
+        frames = []
+        frame_indices = {}
+        profiles = []
+        for thread_name, stacks in samples.items():
+            indexed_stacks = []
+            for stack in stacks:
+                indexed_stack = []
+                for frame in stack:
+                    if frame not in frame_indices:
+                        frame_indices[frame] = len(frames)
+                        name, file, line = frame
+                        frames.append({"name": name, "file": file, "line": line})
+                    indexed_stack.append(frame_indices[frame])
+                indexed_stacks.append(indexed_stack)
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "samples": indexed_stacks,
+                "weights": [interval] * len(indexed_stacks),
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": "identity-document-classification-api",
+            "exporter": "document_processor.profiler",
+        }
+
+    @staticmethod
+    def to_collapsed(samples):
+        """
+        Converts samples to the collapsed stack format of flamegraph.pl.
+        :param samples: dict of thread name to list of stacks.
+        :return: str with one "thread;outer;...;inner count" line per unique stack.
+        """
+        counts = {}
+        for thread_name, stacks in samples.items():
+            for stack in stacks:
+                names = [thread_name] + [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack]
+                key = ";".join(names)
+                counts[key] = counts.get(key, 0) + 1
+        return "\n".join(f"{key} {count}" for key, count in counts.items()) + "\n"
+
+    def profile(self, duration, interval=0.01, output="speedscope", tf_trace=False):
+        """
+        Runs a time-boxed profile of the process.
+        :param duration: Seconds to profile for.
+        :param interval: Seconds between two samples.
+        :param output: "speedscope" or "collapsed".
+        :param tf_trace: Whether to also record an op-level trace with the TensorFlow profiler.
+        :return: tuple of (bytes, media type, filename).
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        try:
+            logger.info(f"Profiling for {duration} seconds")
+            with tempfile.TemporaryDirectory() as tf_trace_directory:
+                if tf_trace:
+                    import tensorflow as tf
+                    tf.profiler.experimental.start(tf_trace_directory)
+                try:
+                    samples = self.sample(duration, interval)
+                finally:
+                    if tf_trace:
+                        tf.profiler.experimental.stop()
+
+                if output == "collapsed":
+                    content = self.to_collapsed(samples).encode()
+                    media_type, filename = "text/plain", "profile.collapsed.txt"
+                else:
+                    content = json.dumps(self.to_speedscope(samples, duration, interval)).encode()
+                    media_type, filename = "application/json", "profile.speedscope.json"
+
+                if not tf_trace:
+                    return content, media_type, filename
+                return self.zip_with_tf_trace(content, filename, tf_trace_directory), "application/zip", "profile.zip"
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def zip_with_tf_trace(content, filename, tf_trace_directory):
+        """
+        Zips the Python profile together with the TensorFlow trace, which can be opened in TensorBoard.
+        :param content: Python profile.
+        :param filename: Name of the Python profile in the archive.
+        :param tf_trace_directory: Directory the TensorFlow profiler wrote to.
+        :return: bytes of the zip archive.
+        """
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr(filename, content)
+            for root, _, files in os.walk(tf_trace_directory):
+                for file in files:
+                    path = os.path.join(root, file)
+                    zip_file.write(path, os.path.join("tf_trace", os.path.relpath(path, tf_trace_directory)))
+        return archive.getvalue()
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,108 @@
+import os
+import queue
+import random
+import threading
+import time
+
+from document_processor.logger import correlation_id, logger
+from document_processor.metrics import metrics
+from document_processor.model_registry import ModelRegistry
+
+shadow_requests = metrics.counter(
+    "shadow_requests_total",
+    "Requests mirrored to the shadow model by outcome (agree, disagree, error, dropped).",
+)
+shadow_latency = metrics.histogram(
+    "shadow_latency_seconds",
+    "Pipeline latency of mirrored requests on the primary and the shadow model.",
+)
+
+
+class ShadowRunner:
+    """
+    Mirrors a fraction of the requests to a shadow model after the primary response is returned
+    and records how often and by how much the shadow model differs from the primary model.
+    Requests are handed over through a bounded queue and are dropped when it is full,
+    so the shadow model can never hold up the primary path.
+    """
+    def __init__(self, registry: ModelRegistry, shadow_model, fraction, queue_size=8):
+        """
+        Initializes a ShadowRunner.
+        :param registry: ModelRegistry that contains the shadow model.
+        :param shadow_model: Name of the shadow model in the registry.
+        :param fraction: Fraction of the requests that is mirrored, between 0 and 1.
+        :param queue_size: Maximum number of requests waiting for the shadow model.
+        """
+        self.registry = registry
+        self.shadow_model = shadow_model
+        self.fraction = fraction
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self.run, name="shadow-runner", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def should_shadow(self, primary_model):
+        """
+        Decides whether a request is mirrored to the shadow model.
+        :param primary_model: Name of the model that served the request.
+        :return: bool.
+        """
+        return primary_model != self.shadow_model and random.random() < self.fraction
+
+    def submit(self, document, primary_data: dict, primary_latency):
+        """
+        Queues a request for the shadow model without blocking.
+        :param document: Document that was processed by the primary model.
+        :param primary_data: Dictionary returned by the primary pipeline.
+        :param primary_latency: Seconds the primary pipeline took.
+        """
+        try:
+            self.queue.put_nowait(
+                (correlation_id.get(), document, primary_data.get("document_type"), primary_latency)
+            )
+        except queue.Full:
+            shadow_requests.inc(outcome="dropped")
+
+    def compare(self, document, primary_document_type, primary_latency):
+        """
+        Processes a document with the shadow model and records the comparison with the primary model.
+        :param document: Document that was processed by the primary model.
+        :param primary_document_type: Class predicted by the primary model.
+        :param primary_latency: Seconds the primary pipeline took.
+        """
+        try:
+            with self.registry.lease(self.shadow_model) as processor:
+                start = time.perf_counter()
+                data = processor.process_document(document)
+                latency = time.perf_counter() - start
+        except Exception as e:
+            logger.warning(f"Shadow model {self.shadow_model} failed: {e}")
+            shadow_requests.inc(outcome="error")
+            return
+
+        shadow_latency.observe(primary_latency, pipeline="primary")
+        shadow_latency.observe(latency, pipeline="shadow")
+        if data.get("document_type") == primary_document_type:
+            shadow_requests.inc(outcome="agree")
+        else:
+            shadow_requests.inc(outcome="disagree")
+            logger.debug(
+                f"Shadow model predicted {data.get('document_type')}, primary model predicted {primary_document_type}"
+            )
+
+    def run(self):
+        try:
+            # Lower the priority of this thread so that it yields the CPU to request threads.
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            request_id, *request = self.queue.get()
+            token = correlation_id.set(request_id)
+            try:
+                self.compare(*request)
+            finally:
+                correlation_id.reset(token)
+                self.queue.task_done()
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+from document_processor.metrics import metrics
+
+single_flight_requests = metrics.counter(
+    "single_flight_requests_total",
+    "Requests by role in request coalescing (leader computed the result, follower reused it).",
+)
+coalesced_seconds = metrics.counter(
+    "coalesced_seconds_total",
+    "Seconds of computation that followers saved by reusing the result of a leader.",
+)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, e.g. the hash of a document, into a single computation.
+    The first call becomes the leader and computes the result, calls that arrive while it is running
+    become followers and wait for the result of the leader instead of computing it again.
+    Results are shared, so followers must not modify them.
+    """
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """
+        Joins the computation of a key.
+        :param key: Key of the computation.
+        :return: Future of the result and elapsed seconds, and whether the caller is the leader and has to compute it.
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                single_flight_requests.inc(role="follower")
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by a follower that stops waiting
+            future.set_running_or_notify_cancel()
+            self._flights[key] = future
+        single_flight_requests.inc(role="leader")
+        return future, True
+
+    def leave(self, key, future):
+        """
+        Removes a finished computation so that the next call computes the result again.
+        :param key: Key of the computation.
+        :param future: Future returned by join.
+        """
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def in_flight(self):
+        """
+        :return: Number of computations that are running.
+        """
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key, fn, *args, retry_if=None, **kwargs):
+        """
+        Calls fn or waits for the running call with the same key.
+        :param key: Key of the computation.
+        :param fn: Function that computes the result.
+        :param retry_if: Called with the exception of the leader, the follower computes again if it returns True,
+            e.g. when the leader ran out of its own deadline.
+        :return: Result and whether it was computed by another call.
+        """
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                else:
+                    future.set_result((result, time.perf_counter() - start))
+                    return result, False
+                finally:
+                    self.leave(key, future)
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                if retry_if is not None and retry_if(e):
+                    continue
+                raise
+            coalesced_seconds.inc(elapsed)
+            return result, True
+
+    async def do_async(self, key, fn, *args, retry_if=None, timeout=None, **kwargs):
+        """
+        Awaits fn or the running call with the same key, followers wait without blocking a thread.
+        :param key: Key of the computation.
+        :param fn: Coroutine function that computes the result.
+        :param retry_if: Called with the exception of the leader, the follower computes again if it returns True,
+            e.g. when the leader ran out of its own deadline.
+        :param timeout: Callable that returns the seconds a follower may still wait, None to wait for the leader.
+            Raises asyncio.TimeoutError when it expires.
+        :return: Result and whether it was computed by another call.
+        """
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                else:
+                    future.set_result((result, time.perf_counter() - start))
+                    return result, False
+                finally:
+                    self.leave(key, future)
+            try:
+                result, elapsed = await asyncio.wait_for(
+                    asyncio.wrap_future(future), timeout() if timeout is not None else None
+                )
+            except Exception as e:
+                if retry_if is not None and retry_if(e):
+                    continue
+                raise
+            coalesced_seconds.inc(elapsed)
+            return result, True
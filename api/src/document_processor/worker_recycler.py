@@ -0,0 +1,125 @@
+import os
+import random
+import signal
+import threading
+
+from document_processor.logger import logger
+from document_processor.metrics import metrics
+
+worker_requests_served = metrics.gauge(
+    "worker_requests_served",
+    "Requests the worker finished since it started, it is recycled after MAX_REQUESTS_PER_WORKER.",
+)
+worker_draining = metrics.gauge(
+    "worker_draining",
+    "1 while the worker finishes its requests before it is recycled.",
+)
+
+
+class WorkerDrainingError(RuntimeError):
+    """
+    Raised when a request arrives while the worker is draining before it is recycled.
+    """
+    def __init__(self, message, retry_after=1):
+        """
+        Initializes a WorkerDrainingError.
+        :param message: Message.
+        :param retry_after: Seconds after which another worker can take the request.
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def terminate_process():
+    """
+    Asks the server to shut down gracefully, the process manager, e.g. Docker or gunicorn, starts a new worker.
+    """
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+class WorkerRecycler:
+    """
+    Recycles the worker after it served a number of requests, so that memory it accumulated over time,
+    e.g. fragmentation of the PIL, poppler and TensorFlow allocations, is returned without downtime.
+    Once the limit is reached the worker stops accepting requests, lets the running ones finish and then terminates.
+    """
+    def __init__(self, max_requests, jitter=0, drain_timeout=30.0, on_drained=terminate_process):
+        """
+        Initializes a WorkerRecycler.
+        :param max_requests: Number of requests after which the worker is recycled.
+        :param jitter: Up to this many requests are added to the limit at random,
+            so that workers that started together are not recycled at the same time.
+        :param drain_timeout: Seconds the running requests may take before the worker terminates anyway.
+        :param on_drained: Called once when the worker is drained.
+        """
+        self.max_requests = max_requests + random.randint(0, jitter)
+        self.drain_timeout = drain_timeout
+        self.on_drained = on_drained
+        self.served = 0
+        self.in_flight = 0
+        self.draining = False
+        self.recycling = False
+        # Set once on_drained returned
+        self.drained = threading.Event()
+        self._lock = threading.Lock()
+
+    def start_request(self):
+        """
+        Admits a request.
+        :raises WorkerDrainingError: if the worker is draining.
+        """
+        with self._lock:
+            if self.draining:
+                raise WorkerDrainingError("The worker is restarting, retry the request.")
+            self.in_flight += 1
+
+    def finish_request(self):
+        """
+        Counts a finished request and starts draining when the limit is reached.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self.served += 1
+            worker_requests_served.set(self.served)
+            limit_reached = self.served >= self.max_requests
+        if limit_reached:
+            self.drain(f"served {self.served} requests")
+        self.check_drained()
+
+    def drain(self, reason):
+        """
+        Stops accepting requests and recycles the worker once the running requests finished.
+        :param reason: Reason that is logged.
+        """
+        with self._lock:
+            if self.draining:
+                return
+            self.draining = True
+        worker_draining.set(1)
+        logger.info(f"Draining the worker to recycle it, {reason}")
+        timer = threading.Timer(self.drain_timeout, self.finish_draining)
+        timer.daemon = True
+        timer.start()
+        self.check_drained()
+
+    def check_drained(self):
+        with self._lock:
+            drained = self.draining and self.in_flight == 0
+        if drained:
+            self.finish_draining()
+
+    def finish_draining(self):
+        """
+        Recycles the worker, only the first call has an effect.
+        """
+        with self._lock:
+            if self.recycling:
+                return
+            self.recycling = True
+            in_flight = self.in_flight
+        if in_flight:
+            logger.warning(f"Recycling the worker with {in_flight} requests still running after the drain timeout")
+        else:
+            logger.info("Worker drained, recycling it")
+        self.on_drained()
+        self.drained.set()
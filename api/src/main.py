@@ -1,19 +1,59 @@
+import asyncio
+import hashlib
+import importlib.util
 import os
-from fastapi import FastAPI, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Optional
+
+from fastapi import BackgroundTasks, Depends, FastAPI, File, Header, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 
-from document_processor.logger import logger
-from document_processor.document_processor import PDFDocumentProcessor
-from document_processor.pipeline.builder import (
-    EffNetDocumentProcessorPipelineBuilder,
-    EffDetDocumentProcessorPipelineBuilder,
+from document_processor.admission import (
+    AdaptiveConcurrencyLimiter,
+    OverloadedError,
+    RateLimitedError,
+    RateLimiter,
+    parse_quotas,
+)
+from document_processor.autoscaling import load_tracker
+from document_processor.deadline import Deadline, DeadlineExceededError
+from document_processor.diagnostics import diagnostics, get_model_footprint
+from document_processor.inference_config import FLOAT32, configure_inference
+from document_processor.job_queue import JobNotFoundError, JobWorkerPool, PRIORITIES, SQLiteJobQueue
+from document_processor.logger import correlation_id, logger
+from document_processor.metrics import metrics
+from document_processor.model_registry import (
+    ModelDirectoryWatcher,
+    ModelNotFoundError,
+    ModelRegistry,
 )
+from document_processor.profiler import ProfilerBusyError, profiler
+from document_processor.shadow import ShadowRunner
+from document_processor.single_flight import SingleFlight
+from document_processor.worker_recycler import WorkerDrainingError, WorkerRecycler
+from document_processor.pipeline.builder import get_pipeline_builder
+from document_processor.pipeline.pdf_to_image_converter import PdfRejectedError, PdfRenderTimeoutError
+from document_processor.pipeline.remote_nodes import RemoteInferenceError
 
 DEFAULT_MIN_CONFIDENCE = 0.5
 
+# Classification responses are serialized with orjson, which is several times faster than the standard encoder,
+# and are returned as responses so that FastAPI does not encode them again. Falls back if orjson is missing.
+FastJSONResponse = ORJSONResponse if importlib.util.find_spec("orjson") is not None else JSONResponse
+
 app = FastAPI()
-document_processor = None
+model_registry = ModelRegistry()
+shadow_runner = None
+job_queue = None
+concurrency_limiter = None
+rate_limiter = None
+priority_api_keys = set()
+worker_recycler = None
+single_flight = None
 
 def get_env_vars():
     # Model to use is loaded from environment variable
@@ -28,24 +68,201 @@ def get_env_vars():
     return model, min_confidence, mode
 
 
-def get_pipeline_builder(model):
+def get_registry_env_vars():
+    # Additional models that are loaded next to MODEL, e.g. "EFFICIENTDET,candidate=EFFICIENTNET:/app/models/new"
+    models = os.getenv("MODELS", "")
+
+    # Seconds between checks of the model directories for changes, 0 disables hot reloading
+    model_watch_interval = float(os.getenv("MODEL_WATCH_INTERVAL", 0))
+
+    # Token that has to be sent in the X-Admin-Token header to use the admin endpoints
+    admin_token = os.getenv("ADMIN_TOKEN")
+
+    return models, model_watch_interval, admin_token
+
+
+def get_shadow_env_vars():
+    # Loaded model that receives a copy of the requests, e.g. a model listed in MODELS
+    shadow_model = os.getenv("SHADOW_MODEL")
+
+    # Fraction of the requests that is mirrored to the shadow model
+    shadow_fraction = float(os.getenv("SHADOW_FRACTION", 0))
+
+    # Maximum number of mirrored requests waiting for the shadow model
+    shadow_queue_size = int(os.getenv("SHADOW_QUEUE_SIZE", 8))
+
+    return shadow_model, shadow_fraction, shadow_queue_size
+
+
+def get_job_env_vars():
+    # Path of the SQLite database of the job queue, the job endpoints are disabled if not set
+    job_queue_path = os.getenv("JOB_QUEUE_PATH")
+
+    # Number of threads that process jobs
+    job_workers = int(os.getenv("JOB_WORKERS", 1))
+
+    # Maximum number of jobs that are classified as one batch
+    job_batch_size = int(os.getenv("JOB_BATCH_SIZE", 8))
+
+    # Seconds after which a claimed job that is not finished is requeued, e.g. after its process stopped
+    job_lease_timeout = float(os.getenv("JOB_LEASE_TIMEOUT", 600))
+
+    return job_queue_path, job_workers, job_batch_size, job_lease_timeout
+
+
+def get_admission_env_vars():
+    # Maximum number of concurrently classified documents, 0 disables load shedding
+    max_concurrency = int(os.getenv("MAX_CONCURRENCY", 0))
+
+    # Requests per second and optional burst per API key, e.g. "key1:10,key2:50:100"
+    api_key_quotas = parse_quotas(os.getenv("API_KEY_QUOTAS", ""))
+
+    # Requests per second of clients without a quota, 0 for unlimited
+    default_rate_limit = float(os.getenv("DEFAULT_RATE_LIMIT", 0))
+
+    # API keys whose requests may use the capacity that is kept free for high priority callers
+    priority_keys = set(filter(None, os.getenv("PRIORITY_API_KEYS", "").split(",")))
+
+    return max_concurrency, api_key_quotas, default_rate_limit, priority_keys
+
+
+def get_render_env_vars():
+    # Limits for rendering a PDF, unset limits are disabled
+    render_limits = {
+        # Seconds after which poppler or the rendering worker is killed
+        "render_timeout": float(os.getenv("RENDER_TIMEOUT", 0)) or None,
+        # Maximum number of pages of a PDF
+        "max_pdf_pages": int(os.getenv("MAX_PDF_PAGES", 0)) or None,
+        # Maximum width and height of a page in points (1/72 inch)
+        "max_page_size": float(os.getenv("MAX_PAGE_SIZE", 0)) or None,
+        # Maximum estimated memory that rendering a PDF may allocate
+        "max_render_memory": int(float(os.getenv("MAX_RENDER_MEMORY_MB", 0)) * 2 ** 20) or None,
+        # Number of long-lived rendering worker processes per model, 0 starts poppler for every PDF instead
+        "render_pool_size": int(os.getenv("RENDER_POOL_SIZE", 0)),
+    }
+
+    return render_limits
+
+
+def get_cache_env_vars():
+    # Number of classifications cached by perceptual hash of the rendered page, 0 disables the cache
+    perceptual_cache_size = int(os.getenv("PERCEPTUAL_CACHE_SIZE", 0))
+
+    # Maximum number of differing bits of the 64 bit hashes of two near-duplicate pages
+    perceptual_cache_distance = int(os.getenv("PERCEPTUAL_CACHE_DISTANCE", 4))
+
+    return perceptual_cache_size, perceptual_cache_distance
+
+
+def get_localizer_env_vars():
+    # Longest side in pixels of the page EfficientDet localizes the document on in the EFFICIENTDET_EFFICIENTNET model
+    localizer_input_size = int(os.getenv("LOCALIZER_INPUT_SIZE", 320))
+
+    # Minimum score of the detected document to classify only the document instead of the whole page
+    localizer_min_score = float(os.getenv("LOCALIZER_MIN_SCORE", 0.3))
+
+    return localizer_input_size, localizer_min_score
+
+
+def get_inference_env_vars():
+    # FLOAT32 or MIXED_BFLOAT16, which falls back to FLOAT32 if the CPU does not support bfloat16
+    inference_precision = os.getenv("INFERENCE_PRECISION", FLOAT32)
+
+    return inference_precision
+
+
+def get_onnx_env_vars():
+    # Threads used within an op of the ONNX models, 0 for the number of cores
+    onnx_intra_op_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", 0)) or None
+
+    # Threads used to run independent ops of the ONNX models in parallel, 0 for sequential execution
+    onnx_inter_op_threads = int(os.getenv("ONNX_INTER_OP_THREADS", 0)) or None
+
+    # Graph optimizations of ONNX Runtime: DISABLED, BASIC, EXTENDED or ALL
+    onnx_graph_optimization = os.getenv("ONNX_GRAPH_OPTIMIZATION", "ALL")
+
+    return onnx_intra_op_threads, onnx_inter_op_threads, onnx_graph_optimization
+
+
+def get_tflite_env_vars():
+    # Threads used within an op of the _TFLITE models, 0 uses the default
+    tflite_threads = int(os.getenv("TFLITE_THREADS", 0)) or None
+
+    # Whether the _TFLITE models use XNNPACK, which is faster but copies the weights into the heap of every worker
+    tflite_xnnpack = os.getenv("TFLITE_XNNPACK", "false").lower() in ("1", "true", "yes")
+
+    return tflite_threads, tflite_xnnpack
+
+
+def get_remote_inference_env_vars():
+    # Comma separated host:port of the inference workers of the REMOTE model
+    remote_inference_address = os.getenv("REMOTE_INFERENCE_ADDRESS")
+
+    # Connections kept open to the inference workers and batches sent at the same time
+    remote_inference_pool_size = int(os.getenv("REMOTE_INFERENCE_POOL_SIZE", 4))
+
+    # Maximum number of images of concurrent requests sent to an inference worker in one batch
+    remote_inference_batch_size = int(os.getenv("REMOTE_INFERENCE_BATCH_SIZE", 8))
+
+    # Seconds an image waits for the images of other requests before its batch is sent
+    remote_inference_batch_delay = float(os.getenv("REMOTE_INFERENCE_BATCH_DELAY", 0.005))
+
+    # Seconds after which an inference worker is considered unreachable
+    remote_inference_timeout = float(os.getenv("REMOTE_INFERENCE_TIMEOUT", 30))
+
+    return {
+        "remote_inference_address": remote_inference_address,
+        "remote_inference_pool_size": remote_inference_pool_size,
+        "remote_inference_batch_size": remote_inference_batch_size,
+        "remote_inference_batch_delay": remote_inference_batch_delay,
+        "remote_inference_timeout": remote_inference_timeout,
+    }
+
+
+def get_deadline_env_vars():
+    # Seconds a classification may take at most, 0 for no limit. Clients can ask for less with X-Request-Timeout
+    request_timeout = float(os.getenv("REQUEST_TIMEOUT", 0))
+
+    return request_timeout
+
+
+def get_coalescing_env_vars():
+    # Whether concurrent requests with the same document and model share a single classification
+    coalesce_requests = os.getenv("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+
+    return coalesce_requests
+
+
+def get_recycle_env_vars():
+    # Number of classification requests after which the worker is recycled, 0 disables recycling
+    max_requests_per_worker = int(os.getenv("MAX_REQUESTS_PER_WORKER", 0))
+
+    # Up to this many requests are added to the limit at random so that workers are not recycled together
+    max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+
+    # Seconds the running requests may take to finish before the worker is recycled anyway
+    drain_timeout = float(os.getenv("DRAIN_TIMEOUT", 30))
+
+    return max_requests_per_worker, max_requests_jitter, drain_timeout
+
+
+def parse_model_specs(models):
     """
-    Gets the pipeline builder of the pipeline with the corresponding model.
-    :param model: model in the pipeline.
-    :return: pipeline with the corresponding model.
+    Parses the MODELS environment variable.
+    Every comma separated entry is either a model, which is registered under its own name,
+    or "name=MODEL:directory" to load a model from a custom directory.
+    :param models: value of the MODELS environment variable.
+    :return: list of (name, model, model_directory) where model_directory may be None.
     """
-    if model == "EFFICIENTNET":
-        pipeline_builder = EffNetDocumentProcessorPipelineBuilder()
-        model_directory = "/app/models/effnet"
-    elif model == "EFFICIENTDET":
-        pipeline_builder = EffDetDocumentProcessorPipelineBuilder()
-        model_directory = (
-            "/app/models/effdet/saved_model/saved_model"
-        )
-    else:
-        raise ValueError("Invalid model specified in environment variable MODEL")
-
-    return pipeline_builder, model_directory
+    specs = []
+    for entry in filter(None, (entry.strip() for entry in models.split(","))):
+        if "=" in entry:
+            name, entry = entry.split("=", 1)
+        else:
+            name = None
+        model, _, model_directory = entry.partition(":")
+        specs.append((name or model, model, model_directory or None))
+    return specs
 
 
 model, min_confidence, mode = get_env_vars()
@@ -54,7 +271,7 @@ if mode != "TESTING":
     logger.info(f"Starting the API in {mode} mode")
 
     if mode == "DEVELOPMENT":
-        logger.warn(f"Adding CORS!")
+        logger.warning(f"Adding CORS!")
         from fastapi.middleware.cors import CORSMiddleware
         app.add_middleware(
             CORSMiddleware,
@@ -64,23 +281,136 @@ if mode != "TESTING":
             allow_headers=["*"],
         )
 
-    pipeline_builder, model_directory = get_pipeline_builder(model)
+    configure_inference(get_inference_env_vars())
 
-    document_processor = PDFDocumentProcessor(
-        pipeline_builder, model_directory=model_directory, min_confidence=min_confidence
-    )
+    models, model_watch_interval, _ = get_registry_env_vars()
+    render_limits = get_render_env_vars()
+    perceptual_cache_size, perceptual_cache_distance = get_cache_env_vars()
+    onnx_intra_op_threads, onnx_inter_op_threads, onnx_graph_optimization = get_onnx_env_vars()
+    tflite_threads, tflite_xnnpack = get_tflite_env_vars()
+    localizer_input_size, localizer_min_score = get_localizer_env_vars()
+    remote_inference = get_remote_inference_env_vars()
+
+    for name, model_spec, model_directory_override in [(model, model, None)] + parse_model_specs(models):
+        if name in model_registry.names():
+            continue
+        pipeline_builder, model_directory = get_pipeline_builder(model_spec)
+        model_registry.load(
+            name,
+            pipeline_builder,
+            model_directory=model_directory_override or model_directory,
+            min_confidence=min_confidence,
+            perceptual_cache_size=perceptual_cache_size,
+            perceptual_cache_distance=perceptual_cache_distance,
+            onnx_intra_op_threads=onnx_intra_op_threads,
+            onnx_inter_op_threads=onnx_inter_op_threads,
+            onnx_graph_optimization=onnx_graph_optimization,
+            tflite_threads=tflite_threads,
+            tflite_xnnpack=tflite_xnnpack,
+            localizer_input_size=localizer_input_size,
+            localizer_min_score=localizer_min_score,
+            **render_limits,
+            **remote_inference,
+        )
+    model_registry.activate(model)
+
+    if model_watch_interval > 0:
+        ModelDirectoryWatcher(model_registry, model_watch_interval).start()
+
+    shadow_model, shadow_fraction, shadow_queue_size = get_shadow_env_vars()
+
+    if shadow_model is not None and shadow_fraction > 0:
+        if shadow_model not in model_registry.names():
+            raise ValueError("SHADOW_MODEL must be one of the models in MODELS")
+        logger.info(f"Mirroring {shadow_fraction:.0%} of the requests to shadow model {shadow_model}")
+        shadow_runner = ShadowRunner(model_registry, shadow_model, shadow_fraction, shadow_queue_size)
+        shadow_runner.start()
+
+    max_concurrency, api_key_quotas, default_rate_limit, priority_api_keys = get_admission_env_vars()
+
+    if max_concurrency > 0:
+        concurrency_limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+    if api_key_quotas or default_rate_limit > 0:
+        rate_limiter = RateLimiter(api_key_quotas, default_rate_limit)
+
+    job_queue_path, job_workers, job_batch_size, job_lease_timeout = get_job_env_vars()
+
+    if job_queue_path is not None:
+        job_queue = SQLiteJobQueue(job_queue_path)
+        JobWorkerPool(job_queue, model_registry, job_workers, job_batch_size, lease_timeout=job_lease_timeout).start()
+
+    max_requests_per_worker, max_requests_jitter, drain_timeout = get_recycle_env_vars()
+
+    if max_requests_per_worker > 0:
+        worker_recycler = WorkerRecycler(max_requests_per_worker, max_requests_jitter, drain_timeout)
+
+    if get_coalescing_env_vars():
+        single_flight = SingleFlight()
+
+
+@app.middleware("http")
+async def add_correlation_id(request: Request, call_next):
+    """
+    Tags all logs of a request with the X-Request-ID header of the request or a new id.
+    The id is returned in the X-Request-ID header of the response.
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = correlation_id.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        correlation_id.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
 
 
 @app.get("/")
 def api_running_check():
     """
     Get request for root directory to check that service is running.
-    :return: "{"message": "Running"}".
+    :return: "{"message": "Running"}", or 503 while the worker drains before it is recycled.
     """
+    if worker_recycler is not None and worker_recycler.draining:
+        # Load balancers stop sending requests to a worker that is about to be recycled
+        return JSONResponse(content={"message": "Draining"}, status_code=503)
     message = {"message": "Running"}
     return JSONResponse(content=message)
 
 
+def get_autoscaling_report(window=60.0):
+    """
+    Builds the autoscaling signals of the instance from its requests, its job queue and its concurrency limit.
+    :param window: seconds of history the rates and latencies are computed from.
+    :return: report of the LoadTracker.
+    """
+    return load_tracker.report(
+        window,
+        pending_jobs=job_queue.count() if job_queue is not None else 0,
+        concurrency_limit=concurrency_limiter.limit if concurrency_limiter is not None else None,
+    )
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Get request for the metrics of the service in the Prometheus text format.
+    """
+    # Updates the autoscaling gauges
+    get_autoscaling_report()
+    return PlainTextResponse(metrics.render())
+
+
+@app.get("/autoscaling")
+def get_autoscaling_signals(window: float = Query(60.0, gt=0, le=300)):
+    """
+    Get request for the signals an orchestrator can scale the service on: queue depth, recent throughput,
+    estimated capacity of the instance from the measured latencies and the estimated time to drain the queue.
+    :param window: seconds of history the rates and latencies are computed from.
+    :return: autoscaling signals.
+    """
+    return get_autoscaling_report(window)
+
+
 class DocumentTypeResponse(BaseModel):
     document_type: str
     meta: dict
@@ -90,11 +420,298 @@ def check_document(document: File):
     return document.content_type == "application/pdf"
 
 
+def include_timings(timings: bool = False, x_include_timings: Optional[str] = Header(None)):
+    """
+    Dependency that checks whether the client asked for the timing breakdown,
+    either with the timings query parameter or the X-Include-Timings header.
+    """
+    return timings or (x_include_timings or "").lower() in ("1", "true", "yes")
+
+
+def get_timings_meta(data: dict, queue_wait):
+    """
+    Builds the timing breakdown of a request for the response meta.
+    :param data: Dictionary returned by the pipeline.
+    :param queue_wait: Seconds the request waited for a worker thread.
+    :return: dict with all timings in milliseconds.
+    """
+    timings = data.get("timings", {})
+    cache_hit = data.get("cache_hit")
+    return {
+        "queue_wait_ms": round(queue_wait * 1000, 2),
+        "nodes_ms": {node: round(timing * 1000, 2) for node, timing in timings.get("nodes", {}).items()},
+        "batch_size": timings.get("batch_size", 1),
+        "cache": None if cache_hit is None else ("hit" if cache_hit else "miss"),
+    }
+
+
+def request_deadline(x_request_timeout: Optional[float] = Header(None, gt=0)):
+    """
+    Dependency that creates the Deadline of a request from its X-Request-Timeout header in seconds,
+    capped by REQUEST_TIMEOUT.
+    """
+    request_timeout = get_deadline_env_vars()
+    timeouts = [timeout for timeout in (x_request_timeout, request_timeout) if timeout]
+    return Deadline(min(timeouts) if timeouts else None)
+
+
+async def cancel_on_disconnect(request: Request, deadline: Deadline, poll_interval=0.1):
+    """
+    Cancels the deadline of a request as soon as its client disconnects.
+    Runs until it is cancelled itself.
+    :param request: request whose client is watched.
+    :param deadline: Deadline to cancel.
+    :param poll_interval: seconds between two checks of the connection.
+    """
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+    logger.info("Client disconnected, cancelling the request")
+    deadline.cancel()
+
+
+def classify(document_processor, byte_file, submitted, deadline: Deadline = None):
+    """
+    Processes a document in a worker thread.
+    :param document_processor: PDFDocumentProcessor to process the document with.
+    :param byte_file: PDF document.
+    :param submitted: perf_counter value when the request was handed to the thread pool.
+    :param deadline: Deadline of the request, checked again after waiting for the worker thread.
+    :return: processed data, seconds waited for the worker thread and seconds spent processing.
+    """
+    start = time.perf_counter()
+    if deadline is not None:
+        deadline.check()
+    with load_tracker.processing_slot(request=True):
+        data = document_processor.process_document(byte_file, deadline)
+    return data, start - submitted, time.perf_counter() - start
+
+
+def admit_client(request: Request, x_api_key: Optional[str] = Header(None)):
+    """
+    Dependency that applies the rate limit of the client, identified by its X-API-Key header or address.
+    :return: whether the client has priority.
+    """
+    if rate_limiter is not None:
+        try:
+            rate_limiter.check(x_api_key or request.client.host)
+        except RateLimitedError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return x_api_key in priority_api_keys
+
+
+def recycle_worker():
+    """
+    Dependency that counts the request towards MAX_REQUESTS_PER_WORKER until its response is sent,
+    and rejects it while the worker drains before it is recycled.
+    """
+    if worker_recycler is None:
+        yield
+        return
+    try:
+        worker_recycler.start_request()
+    except WorkerDrainingError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    try:
+        yield
+    finally:
+        worker_recycler.finish_request()
+
+
+def concurrency_slot(priority):
+    """
+    Holds a slot of the concurrency limiter, if load shedding is enabled.
+    :param priority: whether the request may use the capacity kept free for high priority callers.
+    """
+    if concurrency_limiter is None:
+        return nullcontext()
+    return concurrency_limiter.slot(priority)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency that only lets requests with the correct X-Admin-Token header through.
+    Admin endpoints are disabled if ADMIN_TOKEN is not set.
+    """
+    _, _, admin_token = get_registry_env_vars()
+    if admin_token is None or x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+def list_models():
+    """
+    Get request to list the loaded models.
+    :return: names of the loaded models and the active model.
+    """
+    return {"models": model_registry.names(), "active": model_registry.active_name}
+
+
+@app.post("/admin/models/{name}/reload", dependencies=[Depends(require_admin)])
+def reload_model(name: str):
+    """
+    Post request to reload a model from its directory and swap it in after warm-up.
+    :param name: name of the model.
+    """
+    try:
+        model_registry.reload(name)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {name} is not loaded.")
+    return {"reloaded": name}
+
+
+@app.post("/admin/models/{name}/activate", dependencies=[Depends(require_admin)])
+def activate_model(name: str):
+    """
+    Post request to make a loaded model the default model.
+    :param name: name of the model.
+    """
+    try:
+        model_registry.activate(name)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {name} is not loaded.")
+    return {"active": name}
+
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(
+    duration: float = Query(10.0, gt=0, le=120),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    output: str = Query("speedscope", regex="^(speedscope|collapsed)$"),
+    tf_trace: bool = False,
+):
+    """
+    Post request to profile the worker for a limited time while it keeps serving requests.
+    :param duration: seconds to profile for.
+    :param interval_ms: milliseconds between two samples of the Python stacks.
+    :param output: "speedscope" for a speedscope file or "collapsed" for flamegraph.pl.
+    :param tf_trace: whether to add an op-level TensorFlow trace, the response is then a zip archive.
+    :return: profile file.
+    """
+    try:
+        content, media_type, filename = await run_in_threadpool(
+            profiler.profile, duration, interval_ms / 1000, output, tf_trace
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def get_model_weights_footprint():
+    """
+    Reports the memory of the weights of the loaded models.
+    :return: footprints of the models and the resident MiB of all their weights in this worker.
+    """
+    footprints = {}
+    for name in model_registry.names():
+        try:
+            footprints[name] = model_registry.get(name).get_footprint()
+        except ModelNotFoundError:
+            # Unloaded since the names were listed
+            continue
+    return get_model_footprint(footprints)
+
+
+@app.get("/admin/diagnostics", dependencies=[Depends(require_admin)])
+def get_diagnostics(top: int = Query(10, ge=1, le=100)):
+    """
+    Get request for the memory diagnostics of the worker: RSS, open files, temporary files, TensorFlow allocators,
+    the resident memory of the model weights and, while tracing is started, the Python allocations that grew
+    since then by pipeline node.
+    :param top: number of allocation sites reported per node.
+    :return: diagnostics report.
+    """
+    report = diagnostics.report(top)
+    report["model_weights"] = get_model_weights_footprint()
+    if worker_recycler is not None:
+        report["recycling"] = {
+            "served": worker_recycler.served,
+            "max_requests": worker_recycler.max_requests,
+            "in_flight": worker_recycler.in_flight,
+            "draining": worker_recycler.draining,
+        }
+    return report
+
+
+@app.post("/admin/diagnostics/tracemalloc", dependencies=[Depends(require_admin)])
+def start_tracing(frames: int = Query(25, ge=1, le=100)):
+    """
+    Post request to start tracing the Python allocations, later diagnostics report the growth since now.
+    Tracing slows down the worker until it is stopped.
+    :param frames: number of frames stored per allocation.
+    """
+    diagnostics.start_tracing(frames)
+    return {"tracing": True, "frames": frames}
+
+
+@app.delete("/admin/diagnostics/tracemalloc", dependencies=[Depends(require_admin)])
+def stop_tracing():
+    """
+    Delete request to stop tracing the Python allocations.
+    """
+    diagnostics.stop_tracing()
+    return {"tracing": False}
+
+
+@app.post("/admin/drain", dependencies=[Depends(require_admin)])
+def drain_worker():
+    """
+    Post request to recycle the worker that handles it after its running requests finished.
+    """
+    if worker_recycler is None:
+        raise HTTPException(status_code=409, detail="Worker recycling is not enabled.")
+    worker_recycler.drain("requested by an admin")
+    return {"draining": True}
+
+
+def build_response(data: dict, filename, compact=False):
+    """
+    Builds the classification response of a document.
+    :param data: Dictionary returned by the pipeline.
+    :param filename: name of the uploaded file.
+    :param compact: whether to return only the document type, without the filename and prediction confidences.
+    :return: response dict.
+    """
+    document_type = data.get("document_type", None)
+    if compact:
+        return {"document_type": document_type if document_type is not None else "unknown"}
+    if document_type is not None:
+        return {
+            "document_type": document_type,
+            "meta": {
+                "filename": filename,
+                "prediction_confidences": data.get("prediction_confidences", None),
+            },
+        }
+    else:
+        return {"document_type": "unknown", "meta": {"filename": filename}}
+
+
 @app.post("/classify-document/")
-async def process_document(document: UploadFile):
+async def process_document(
+    request: Request,
+    document: UploadFile,
+    background_tasks: BackgroundTasks,
+    model: Optional[str] = None,
+    compact: bool = False,
+    with_timings: bool = Depends(include_timings),
+    priority: bool = Depends(admit_client),
+    deadline: Deadline = Depends(request_deadline),
+    _: None = Depends(recycle_worker),
+):
     """
     Post request for document/ directory to classify a PDF document.
+    :param request: request, watched for a disconnect of the client.
     :param document: identity document to be classified.
+    :param background_tasks: tasks that run after the response is sent.
+    :param model: name of the loaded model to use, the active model if not given.
+    :param compact: whether to return only the document type.
+    :param with_timings: whether to add the server-side timing breakdown to the meta.
+    :param priority: whether the client has priority when the service is overloaded.
+    :param deadline: Deadline after which processing is stopped.
     :return: class of the identity document.
     """
     if not check_document(document):
@@ -104,15 +721,127 @@ async def process_document(document: UploadFile):
 
     byte_file = await document.read()
 
-    data = document_processor.process_document(byte_file)
+    primary_model = model or model_registry.active_name
 
-    if data.get("document_type", None) is not None:
-        return {
-            "document_type": data.get("document_type"),
-            "meta": {
-                "filename": document.filename,
-                "prediction_confidences": data.get("prediction_confidences", None),
-            },
-        }
-    else:
-        return {"document_type": "unknown", "meta": {"filename": document.filename}}
+    async def classify_in_threadpool():
+        with load_tracker.request(), concurrency_slot(priority), model_registry.lease(model) as document_processor:
+            return await run_in_threadpool(classify, document_processor, byte_file, time.perf_counter(), deadline)
+
+    disconnect_watcher = asyncio.create_task(cancel_on_disconnect(request, deadline))
+    try:
+        deadline.check()
+        if single_flight is None:
+            (data, queue_wait, latency), coalesced = await classify_in_threadpool(), False
+        else:
+            # Identical documents that arrive while one of them is classified, e.g. retries, share its result.
+            # A follower classifies the document itself if the leader ran out of its own deadline.
+            try:
+                (data, queue_wait, latency), coalesced = await single_flight.do_async(
+                    f"{primary_model}:{hashlib.sha256(byte_file).hexdigest()}",
+                    classify_in_threadpool,
+                    retry_if=lambda e: isinstance(e, DeadlineExceededError) and not deadline.expired,
+                    timeout=deadline.remaining,
+                )
+            except asyncio.TimeoutError:
+                # The deadline passed while waiting for the leader
+                deadline.check()
+                raise
+    except OverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model {model} is not loaded.")
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except (PdfRejectedError, PdfRenderTimeoutError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RemoteInferenceError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    finally:
+        disconnect_watcher.cancel()
+
+    if not coalesced and shadow_runner is not None and shadow_runner.should_shadow(primary_model):
+        background_tasks.add_task(shadow_runner.submit, byte_file, data, latency)
+
+    response = build_response(data, document.filename, compact)
+
+    if with_timings:
+        response.setdefault("meta", {})["timings"] = get_timings_meta(data, queue_wait)
+
+    return FastJSONResponse(response)
+
+
+def get_job_queue():
+    """
+    Dependency that returns the job queue or rejects the request if it is not enabled.
+    """
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is not enabled.")
+    return job_queue
+
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(
+    document: UploadFile,
+    model: Optional[str] = None,
+    priority: str = Query("normal", regex=f"^({'|'.join(PRIORITIES)})$"),
+    queue: SQLiteJobQueue = Depends(get_job_queue),
+    _: bool = Depends(admit_client),
+):
+    """
+    Post request to queue a PDF document for classification without waiting for the result.
+    :param document: identity document to be classified.
+    :param model: name of the loaded model to use, the active model if not given.
+    :param priority: "high", "normal" or "low".
+    :return: id of the job.
+    """
+    if not check_document(document):
+        raise HTTPException(
+            status_code=400, detail="Invalid file type. File must be pdf."
+        )
+    if model is not None and model not in model_registry.names():
+        raise HTTPException(status_code=404, detail=f"Model {model} is not loaded.")
+
+    byte_file = await document.read()
+    job_id = await run_in_threadpool(queue.submit, byte_file, document.filename, model, priority)
+    load_tracker.arrive()
+    return {"job_id": job_id, "status": "pending"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, queue: SQLiteJobQueue = Depends(get_job_queue)):
+    """
+    Get request for the status of a job.
+    :param job_id: id of the job.
+    :return: status of the job.
+    """
+    try:
+        job = queue.get(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "error": job["error"],
+    }
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, compact: bool = False, queue: SQLiteJobQueue = Depends(get_job_queue)):
+    """
+    Get request for the classification of a finished job.
+    :param job_id: id of the job.
+    :param compact: whether to return only the document type.
+    :return: class of the identity document, same as the response of classify-document.
+    """
+    try:
+        job = queue.get(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=422, detail=f"Job failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+    return FastJSONResponse(build_response(job["result"], job["filename"], compact))
@@ -0,0 +1,152 @@
+"""
+Measurements and budgets of the performance tests.
+"""
+import gc
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from document_processor.benchmark import summarize
+from document_processor.diagnostics import read_proc_status
+from document_processor.logger import logger
+
+# Baseline of the reference machine, record it with UPDATE_PERFORMANCE_BASELINE=1
+BASELINE_PATH = os.getenv("PERFORMANCE_BASELINE", os.path.join(os.path.dirname(__file__), "baseline.json"))
+# Allowed regression relative to the baseline, 0.25 fails a test that is more than 25% slower
+LATENCY_TOLERANCE = float(os.getenv("PERFORMANCE_LATENCY_TOLERANCE", 0.25))
+MEMORY_TOLERANCE = float(os.getenv("PERFORMANCE_MEMORY_TOLERANCE", 0.25))
+# Memory budgets get this many MiB on top, so that a baseline close to 0 does not fail on noise
+MEMORY_SLACK_MB = 1.0
+
+LATENCY_METRICS = ("p50_ms", "p95_ms")
+
+# Absolute budgets of the measurements without a baseline, generous enough for any machine that runs the service,
+# so that a test without a recorded baseline still catches large regressions instead of being skipped
+DEFAULT_BUDGETS = {
+    "PdfToJpgConverter.convert": {"p95_ms": 2000.0, "peak_traced_mb": 100.0, "rss_growth_mb": 50.0},
+    "EffNetDocumentClassifierNode.classify_image": {"p95_ms": 1000.0, "peak_traced_mb": 50.0, "rss_growth_mb": 50.0},
+    "EffNetDocumentClassifierNode.classify_images[8]": {
+        "p95_ms": 5000.0, "peak_traced_mb": 100.0, "rss_growth_mb": 100.0
+    },
+    "EffDetDocumentClassifierNode.classify_image": {"p95_ms": 3000.0, "peak_traced_mb": 50.0, "rss_growth_mb": 50.0},
+    "EffDetDocumentClassifierNode.classify_images[4]": {
+        "p95_ms": 10000.0, "peak_traced_mb": 100.0, "rss_growth_mb": 100.0
+    },
+}
+
+
+def rss_mb():
+    """
+    :return: Current resident set size of the process in MiB, None if /proc is not available.
+    """
+    return read_proc_status().get("rss_mb")
+
+
+def measure(fn, repeat=20, warm_up=2):
+    """
+    Measures the latency and memory of a function.
+    Latency is measured without tracemalloc, which slows down allocations, and memory in one extra traced call.
+    :param fn: Function without arguments.
+    :param repeat: Number of measured calls.
+    :param warm_up: Number of calls before measuring, e.g. to trace the TensorFlow graph.
+    :return: dict with the p50 and p95 latency in milliseconds, the peak of the memory traced by tracemalloc during
+        one call and how much the RSS of the process grew during all calls, both in MiB. The RSS growth is missing
+        if /proc is not available.
+    """
+    for _ in range(warm_up):
+        fn()
+    gc.collect()
+
+    # The current and not the peak RSS, the peak of an earlier test would hide the growth of this one
+    rss_before = rss_mb()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    gc.collect()
+    rss_after = rss_mb()
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    summary = summarize(latencies)
+    measurement = {
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "peak_traced_mb": peak / 2 ** 20,
+    }
+    if rss_before is not None and rss_after is not None:
+        measurement["rss_growth_mb"] = rss_after - rss_before
+    return measurement
+
+
+class PerformanceBudget:
+    """
+    Compares measurements with the stored baseline, or records them as the new baseline.
+    Measurements without a baseline are compared with their absolute default budgets.
+    """
+    def __init__(self, baseline, update=False, default_budgets=None):
+        """
+        Initializes a PerformanceBudget.
+        :param baseline: dict of name to the measurement of the baseline.
+        :param update: Whether the measurements replace the baseline instead of being checked.
+        :param default_budgets: dict of name to the budgets of the metrics without a baseline, DEFAULT_BUDGETS if None.
+        """
+        self.baseline = baseline
+        self.update = update
+        self.default_budgets = DEFAULT_BUDGETS if default_budgets is None else default_budgets
+
+    @staticmethod
+    def get_budget(metric, baseline_value):
+        """
+        :param metric: Name of the metric.
+        :param baseline_value: Value of the baseline.
+        :return: Highest value that passes.
+        """
+        if metric in LATENCY_METRICS:
+            return baseline_value * (1 + LATENCY_TOLERANCE)
+        return baseline_value * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_MB
+
+    def get_violations(self, name, measurement):
+        """
+        :param name: Name of the measurement.
+        :param measurement: Measurement returned by measure.
+        :return: Descriptions of the metrics over their budget.
+        """
+        violations = []
+        if name not in self.baseline:
+            for metric, budget in self.default_budgets[name].items():
+                if measurement.get(metric, 0) > budget:
+                    violations.append(f"{metric} {measurement[metric]:.1f} exceeds its default budget {budget:.1f}")
+            return violations
+
+        for metric, baseline_value in self.baseline[name].items():
+            budget = self.get_budget(metric, baseline_value)
+            if measurement.get(metric, 0) > budget:
+                violations.append(
+                    f"{metric} {measurement[metric]:.1f} exceeds its budget {budget:.1f} (baseline {baseline_value:.1f})"
+                )
+        return violations
+
+    def check(self, name, measurement):
+        """
+        Fails the test if a metric is over its budget, skips it if there is neither a baseline nor a default budget.
+        :param name: Name of the measurement.
+        :param measurement: Measurement returned by measure.
+        """
+        logger.info(f"Performance of {name}: {measurement}")
+        if self.update:
+            self.baseline[name] = {metric: round(value, 3) for metric, value in measurement.items()}
+            return
+        if name not in self.baseline and name not in self.default_budgets:
+            pytest.skip(f"No baseline for {name}, record one with UPDATE_PERFORMANCE_BASELINE=1")
+        violations = self.get_violations(name, measurement)
+        if violations:
+            pytest.fail(f"{name}: " + "; ".join(violations))
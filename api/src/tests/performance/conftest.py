@@ -0,0 +1,25 @@
+import json
+import os
+
+import pytest
+
+from budgets import BASELINE_PATH, PerformanceBudget
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "performance: latency and memory budgets, run with RUN_PERFORMANCE_TESTS=1")
+
+
+@pytest.fixture(scope="session")
+def performance_budget():
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    update = os.getenv("UPDATE_PERFORMANCE_BASELINE", "").lower() in ("1", "true", "yes")
+    budget = PerformanceBudget(baseline, update)
+    yield budget
+    if update:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(budget.baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
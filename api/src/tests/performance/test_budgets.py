@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from budgets import PerformanceBudget, measure
+
+
+class TestMeasure:
+    def test_measure_returns_latency_and_memory(self):
+        measurement = measure(lambda: bytearray(2 ** 20), repeat=5, warm_up=1)
+        assert set(measurement) <= {"p50_ms", "p95_ms", "peak_traced_mb", "rss_growth_mb"}
+        assert measurement["p95_ms"] >= measurement["p50_ms"] >= 0
+        assert measurement["peak_traced_mb"] >= 1
+
+    def test_measure_reports_rss_growth(self):
+        if not os.path.exists("/proc/self/status"):
+            pytest.skip("needs /proc")
+        retained = []
+        measurement = measure(lambda: retained.append(b"x" * 8 * 2 ** 20), repeat=4, warm_up=0)
+        assert measurement["rss_growth_mb"] >= 24
+
+
+class TestPerformanceBudget:
+    @pytest.fixture
+    def budget(self):
+        return PerformanceBudget({"node": {"p50_ms": 10.0, "peak_traced_mb": 4.0}}, default_budgets={
+            "default": {"p95_ms": 100.0},
+        })
+
+    def test_measurement_within_budget_passes(self, budget):
+        budget.check("node", {"p50_ms": 12.0, "peak_traced_mb": 5.0})
+
+    def test_slower_measurement_fails(self, budget):
+        assert budget.get_violations("node", {"p50_ms": 13.0, "peak_traced_mb": 4.0}) == [
+            "p50_ms 13.0 exceeds its budget 12.5 (baseline 10.0)"
+        ]
+
+    def test_memory_budget_has_slack(self, budget):
+        assert budget.get_violations("node", {"p50_ms": 10.0, "peak_traced_mb": 5.9}) == []
+        assert len(budget.get_violations("node", {"p50_ms": 10.0, "peak_traced_mb": 6.1})) == 1
+
+    def test_missing_baseline_uses_default_budget(self, budget):
+        budget.check("default", {"p95_ms": 90.0})
+        assert budget.get_violations("default", {"p95_ms": 110.0}) == [
+            "p95_ms 110.0 exceeds its default budget 100.0"
+        ]
+
+    def test_missing_baseline_and_default_budget_skips(self, budget):
+        with pytest.raises(pytest.skip.Exception):
+            budget.check("other", {"p50_ms": 1.0})
+
+    def test_update_records_baseline(self):
+        budget = PerformanceBudget({}, update=True)
+        budget.check("node", {"p50_ms": 1.23456})
+        assert budget.baseline == {"node": {"p50_ms": 1.235}}
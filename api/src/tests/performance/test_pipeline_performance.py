@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from document_processor.pipeline.pdf_to_image_converter import PdfToJpgConverter
+from document_processor.pipeline.pipeline_nodes import EffDetDocumentClassifierNode, EffNetDocumentClassifierNode
+
+from budgets import measure
+
+TEST_FILES = "/app/api/src/tests/files"
+EFFNET_MODEL_DIRECTORY = "/app/models/effnet"
+EFFDET_MODEL_DIRECTORY = "/app/models/effdet/saved_model/saved_model"
+
+pytestmark = [
+    pytest.mark.performance,
+    pytest.mark.skipif(
+        os.getenv("RUN_PERFORMANCE_TESTS", "").lower() not in ("1", "true", "yes"),
+        reason="performance tests run with RUN_PERFORMANCE_TESTS=1",
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def pdf_bytes():
+    with open(f"{TEST_FILES}/id_card_1.pdf", "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def page():
+    return Image.open(f"{TEST_FILES}/id.jpg").convert("RGB")
+
+
+@pytest.mark.skipif(shutil.which("pdftoppm") is None, reason="needs poppler")
+class TestPdfToJpgConverterPerformance:
+    def test_convert(self, performance_budget, pdf_bytes):
+        converter = PdfToJpgConverter()
+        performance_budget.check("PdfToJpgConverter.convert", measure(lambda: converter.convert(pdf_bytes), repeat=10))
+
+
+@pytest.mark.skipif(not os.path.isdir(EFFNET_MODEL_DIRECTORY), reason="needs the EfficientNet model")
+class TestEffNetDocumentClassifierNodePerformance:
+    @pytest.fixture(scope="class")
+    def node(self):
+        return EffNetDocumentClassifierNode(EFFNET_MODEL_DIRECTORY, 0.5)
+
+    def test_classify_image(self, performance_budget, node, page):
+        performance_budget.check(
+            "EffNetDocumentClassifierNode.classify_image", measure(lambda: node.classify_image(page))
+        )
+
+    def test_classify_images(self, performance_budget, node, page):
+        performance_budget.check(
+            "EffNetDocumentClassifierNode.classify_images[8]", measure(lambda: node.classify_images([page] * 8))
+        )
+
+
+@pytest.mark.skipif(not os.path.isdir(EFFDET_MODEL_DIRECTORY), reason="needs the EfficientDet model")
+class TestEffDetDocumentClassifierNodePerformance:
+    @pytest.fixture(scope="class")
+    def node(self):
+        return EffDetDocumentClassifierNode(EFFDET_MODEL_DIRECTORY, 0.5)
+
+    def test_classify_image(self, performance_budget, node, page):
+        performance_budget.check(
+            "EffDetDocumentClassifierNode.classify_image", measure(lambda: node.classify_image(page), repeat=10)
+        )
+
+    def test_classify_images(self, performance_budget, node, page):
+        performance_budget.check(
+            "EffDetDocumentClassifierNode.classify_images[4]",
+            measure(lambda: node.classify_images([page] * 4), repeat=10),
+        )
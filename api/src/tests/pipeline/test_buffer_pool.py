@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+import pytest
+
+from document_processor.pipeline.buffer_pool import ALIGNMENT, MIN_BUCKET_SIZE, BufferPool, bucket_size
+
+
+class TestBucketSize:
+    def test_small_sizes_share_smallest_bucket(self):
+        assert bucket_size(1) == bucket_size(MIN_BUCKET_SIZE) == MIN_BUCKET_SIZE
+
+    def test_bucket_fits_size(self):
+        for nbytes in (MIN_BUCKET_SIZE + 1, 602112, 11_594_301, 3 * 2 ** 20):
+            assert nbytes <= bucket_size(nbytes) < nbytes * 1.25
+
+    def test_similar_sizes_share_bucket(self):
+        # Pages of slightly different sizes rendered at the same resolution
+        assert bucket_size(1653 * 2339 * 3) == bucket_size(1650 * 2339 * 3)
+
+
+class TestBufferPool:
+    @pytest.fixture
+    def pool(self):
+        return BufferPool(max_bytes=8 * 2 ** 20, max_buffers_per_bucket=2)
+
+    def test_array_has_shape_dtype_and_alignment(self, pool):
+        with pool.array((2, 224, 224, 3), np.float32) as array:
+            assert array.shape == (2, 224, 224, 3)
+            assert array.dtype == np.float32
+            assert array.ctypes.data % ALIGNMENT == 0
+
+    def test_array_reuses_buffer(self, pool):
+        with pool.array((224, 224, 3), np.float32) as array:
+            address = array.ctypes.data
+        with pool.array((224, 224, 3), np.float32) as array:
+            assert array.ctypes.data == address
+        assert pool.idle_bytes == bucket_size(224 * 224 * 3 * 4)
+
+    def test_concurrent_arrays_use_different_buffers(self, pool):
+        with pool.array((100, 100), np.uint8) as first, pool.array((100, 100), np.uint8) as second:
+            assert first.ctypes.data != second.ctypes.data
+
+    def test_release_limits_buffers_per_bucket(self, pool):
+        buffers = [pool.acquire(1000) for _ in range(3)]
+        for buffer in buffers:
+            pool.release(buffer)
+        assert pool.idle_bytes == 2 * MIN_BUCKET_SIZE
+
+    def test_release_limits_idle_bytes(self, pool):
+        pool.release(pool.acquire(10 * 2 ** 20))
+        assert pool.idle_bytes == 0
+
+    def test_clear_frees_idle_buffers(self, pool):
+        pool.release(pool.acquire(1000))
+        pool.clear()
+        assert pool.idle_bytes == 0
+
+    def test_threads_never_share_a_buffer(self, pool):
+        errors = []
+
+        def fill(value):
+            for _ in range(200):
+                with pool.array((64, 64), np.uint8) as array:
+                    array[...] = value
+                    if not (array == value).all():
+                        errors.append(value)
+
+        threads = [threading.Thread(target=fill, args=(value,)) for value in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
@@ -2,14 +2,25 @@ import pytest
 
 from document_processor.pipeline.builder import (
     DocumentProcessorPipelineBuilder,
+    EffDetEffNetDocumentProcessorPipelineBuilder,
+    OnnxEffDetDocumentProcessorPipelineBuilder,
+    OnnxEffNetDocumentProcessorPipelineBuilder,
+    RemoteDocumentProcessorPipelineBuilder,
+    TFLiteEffDetDocumentProcessorPipelineBuilder,
+    TFLiteEffNetDocumentProcessorPipelineBuilder,
+    get_pipeline_builder,
     EffNetDocumentProcessorPipelineBuilder,
     EffDetDocumentProcessorPipelineBuilder
 )
 from document_processor.pipeline.pipeline_nodes import (
     PdfToImageConverterNode,
     EffNetDocumentClassifierNode,
-    EffDetDocumentClassifierNode
+    EffDetDocumentClassifierNode,
+    EffDetDocumentLocalizerNode,
+    PerceptualHashCacheNode,
 )
+from document_processor.pipeline.remote_nodes import RemoteDocumentClassifierNode
+from document_processor.pipeline.tflite_nodes import TFLiteEffNetDocumentClassifierNode
 from document_processor.pipeline.pipeline import (
     DocumentProcessorPipeline
 )
@@ -21,6 +32,35 @@ class TestDocumentProcessorPipelineBuilderAbstract:
             DocumentProcessorPipelineBuilder().build(0.5)
 
 
+class TestBuildPdfToImageNode:
+    def test_build_pdf_to_image_node_passes_render_limits(self):
+        node = DocumentProcessorPipelineBuilder.build_pdf_to_image_node(
+            render_workers=4, render_timeout=10.0, max_pdf_pages=5
+        )
+        assert node.max_workers == 4
+        assert node.converter.timeout == 10.0
+        assert node.converter.max_pages == 5
+        assert node.converter.max_render_memory is None
+
+    def test_build_pdf_to_image_node_with_render_pool(self, mocker):
+        pooled_converter = mocker.patch("document_processor.pipeline.builder.PooledPdfToImageConverter")
+        node = DocumentProcessorPipelineBuilder.build_pdf_to_image_node(render_pool_size=2, render_timeout=10.0)
+        pooled_converter.assert_called_once_with(
+            workers=2, timeout=10.0, max_pages=None, max_page_size=None, max_render_memory=None
+        )
+        assert node.converter is pooled_converter.return_value
+
+    def test_build_classifier_node_without_cache(self, mocker):
+        classifier = mocker.Mock(spec=EffNetDocumentClassifierNode)
+        assert DocumentProcessorPipelineBuilder.build_classifier_node(classifier) is classifier
+
+    def test_build_classifier_node_with_cache(self, mocker):
+        classifier = mocker.Mock(spec=EffNetDocumentClassifierNode)
+        node = DocumentProcessorPipelineBuilder.build_classifier_node(classifier, perceptual_cache_size=16)
+        assert isinstance(node, PerceptualHashCacheNode)
+        assert node.classifier is classifier
+
+
 class TestEffNetDocumentProcessorPipelineBuilder:
     @pytest.fixture(scope="class")
     def builder(self):
@@ -92,3 +132,89 @@ class TestEffDetDocumentProcessorPipelineBuilder:
     def test_build_second_node_has_correct_model_path(self, pipeline):
         nodes = pipeline.processing_nodes
         assert isinstance(nodes[1], EffDetDocumentClassifierNode)
+
+
+class TestGetPipelineBuilder:
+    @pytest.mark.parametrize("model, builder_class", [
+        ("EFFICIENTNET_ONNX", OnnxEffNetDocumentProcessorPipelineBuilder),
+        ("EFFICIENTDET_ONNX", OnnxEffDetDocumentProcessorPipelineBuilder),
+    ])
+    def test_get_pipeline_builder_onnx(self, model, builder_class):
+        pipeline_builder, model_path = get_pipeline_builder(model, "/models")
+        assert isinstance(pipeline_builder, builder_class)
+        assert model_path.startswith("/models/") and model_path.endswith(".onnx")
+
+    @pytest.mark.parametrize("model, builder_class", [
+        ("EFFICIENTNET_TFLITE", TFLiteEffNetDocumentProcessorPipelineBuilder),
+        ("EFFICIENTDET_TFLITE", TFLiteEffDetDocumentProcessorPipelineBuilder),
+    ])
+    def test_get_pipeline_builder_tflite(self, model, builder_class):
+        pipeline_builder, model_path = get_pipeline_builder(model, "/models")
+        assert isinstance(pipeline_builder, builder_class)
+        assert model_path.startswith("/models/") and model_path.endswith(".tflite")
+
+    def test_get_pipeline_builder_effdet_effnet(self):
+        pipeline_builder, model_directory = get_pipeline_builder("EFFICIENTDET_EFFICIENTNET", "/models")
+        assert isinstance(pipeline_builder, EffDetEffNetDocumentProcessorPipelineBuilder)
+        assert model_directory == "/models"
+
+    def test_get_pipeline_builder_remote(self):
+        pipeline_builder, model_directory = get_pipeline_builder("REMOTE", "/models")
+        assert isinstance(pipeline_builder, RemoteDocumentProcessorPipelineBuilder)
+        assert model_directory is None
+
+
+class TestEffDetEffNetDocumentProcessorPipelineBuilder:
+    @pytest.fixture
+    def pipeline(self, mocker):
+        mocker.patch("tensorflow.saved_model.load")
+        mocker.patch("tensorflow.keras.models.load_model")
+        return EffDetEffNetDocumentProcessorPipelineBuilder().build(
+            min_confidence=0.5, model_directory="/models", localizer_input_size=256
+        )
+
+    def test_build_localizes_before_classifying(self, pipeline):
+        pdf_node, localizer_node, classifier_node = pipeline.processing_nodes
+        assert isinstance(pdf_node, PdfToImageConverterNode)
+        assert isinstance(localizer_node, EffDetDocumentLocalizerNode)
+        assert isinstance(classifier_node, EffNetDocumentClassifierNode)
+
+    def test_build_configures_localizer(self, pipeline):
+        localizer_node = pipeline.processing_nodes[1]
+        assert localizer_node.input_size == 256
+        assert localizer_node.min_confidence == 0.3
+
+    def test_build_requires_model_directory(self):
+        with pytest.raises(ValueError):
+            EffDetEffNetDocumentProcessorPipelineBuilder().build(min_confidence=0.5)
+
+
+class TestTFLiteEffNetDocumentProcessorPipelineBuilder:
+    def test_build_passes_interpreter_options(self, mocker):
+        interpreter = mocker.patch("document_processor.pipeline.tflite_nodes.tf.lite.Interpreter")
+        interpreter.return_value.get_signature_list.return_value = {
+            "serving_default": {"inputs": ["input"], "outputs": ["output"]}
+        }
+        pipeline = TFLiteEffNetDocumentProcessorPipelineBuilder().build(
+            min_confidence=0.5, model_directory="/models/effnet_tflite/model.tflite", tflite_threads=2
+        )
+        node = pipeline.processing_nodes[1]
+        assert isinstance(node, TFLiteEffNetDocumentClassifierNode)
+        assert interpreter.call_args.kwargs["num_threads"] == 2
+        assert not node.xnnpack
+
+
+class TestRemoteDocumentProcessorPipelineBuilder:
+    def test_build_classifies_remotely(self):
+        pipeline = RemoteDocumentProcessorPipelineBuilder().build(
+            remote_inference_address="inference-1:8500,inference-2:8501", remote_inference_batch_size=16
+        )
+        pdf_node, remote_node = pipeline.processing_nodes
+        assert isinstance(pdf_node, PdfToImageConverterNode)
+        assert isinstance(remote_node, RemoteDocumentClassifierNode)
+        assert remote_node.pool.addresses == [("inference-1", 8500), ("inference-2", 8501)]
+        assert remote_node.max_batch_size == 16
+
+    def test_build_requires_address(self):
+        with pytest.raises(ValueError):
+            RemoteDocumentProcessorPipelineBuilder().build(min_confidence=0.5)
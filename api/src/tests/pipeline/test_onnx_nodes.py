@@ -0,0 +1,133 @@
+import glob
+import os
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from document_processor.pipeline.onnx_nodes import OnnxEffDetDocumentClassifierNode, OnnxEffNetDocumentClassifierNode
+
+TEST_FILES = "/app/api/src/tests/files"
+MODELS_DIRECTORY = "/app/models"
+
+
+@pytest.fixture
+def ort_mock(mocker):
+    ort = mocker.MagicMock()
+    ort.InferenceSession.return_value.get_inputs.return_value = [mocker.Mock()]
+    ort.InferenceSession.return_value.get_inputs.return_value[0].name = "input"
+    mocker.patch.dict("sys.modules", {"onnxruntime": ort})
+    return ort
+
+
+@pytest.fixture
+def mock_image():
+    return Image.new('RGB', (60, 30))
+
+
+class TestOnnxEffNetDocumentClassifierNode:
+    @pytest.fixture
+    def node(self, ort_mock):
+        return OnnxEffNetDocumentClassifierNode("model.onnx", 0.5, intra_op_threads=2)
+
+    def test_load_model_creates_cpu_session(self, node, ort_mock):
+        args, kwargs = ort_mock.InferenceSession.call_args
+        assert args[0] == "model.onnx"
+        assert kwargs["providers"] == ["CPUExecutionProvider"]
+        assert ort_mock.SessionOptions.return_value.intra_op_num_threads == 2
+
+    def test_invalid_graph_optimization(self, ort_mock):
+        with pytest.raises(ValueError):
+            OnnxEffNetDocumentClassifierNode("model.onnx", 0.5, graph_optimization="MAXIMUM")
+
+    def test_classify_images_runs_model_once(self, node, mock_image):
+        node.model.run.return_value = [np.asarray([[0.1, 0.1, 0.8], [0.7, 0.2, 0.1]], dtype=np.float32)]
+        results = node.classify_images([mock_image, mock_image])
+        node.model.run.assert_called_once()
+        batch = node.model.run.call_args[0][1]["input"]
+        assert batch.shape == (2, 224, 224, 3) and batch.dtype == np.float32
+        assert [result[0] for result in results] == ["passport", "driving_license"]
+
+
+class TestOnnxEffDetDocumentClassifierNode:
+    @pytest.fixture
+    def node(self, ort_mock):
+        return OnnxEffDetDocumentClassifierNode("model.onnx", 0.5)
+
+    @pytest.fixture
+    def outputs(self):
+        return [np.asarray([[0.9, 0.2]], dtype=np.float32), np.asarray([[3., 1.]], dtype=np.float32)]
+
+    def test_get_detections_names_outputs(self, node, mock_image, outputs):
+        node.model.run.return_value = outputs
+        detections = node.get_detections(mock_image)
+        assert node.model.run.call_args[0][1]["input"].shape == (1, 30, 60, 3)
+        assert set(detections) == {"detection_scores", "detection_classes"}
+
+    def test_classify_image(self, node, mock_image, outputs):
+        node.model.run.return_value = outputs
+        assert node.classify_image(mock_image) == ("passport", [("passport", 0.9)])
+
+    def test_get_batch_detections_falls_back_to_single_images(self, node, mock_image, outputs):
+        node.model.run.side_effect = [Exception("Expected batch size 1"), outputs, outputs]
+        detections = node.get_batch_detections([mock_image, mock_image])
+        assert detections["detection_scores"].shape == (2, 2)
+        assert not node.supports_batches
+
+
+def onnx_and_tf_nodes(model):
+    pytest.importorskip("onnxruntime")
+    from document_processor.pipeline.builder import get_pipeline_builder
+
+    _, tf_model_path = get_pipeline_builder(model, MODELS_DIRECTORY)
+    _, onnx_model_path = get_pipeline_builder(f"{model}_ONNX", MODELS_DIRECTORY)
+    if not os.path.exists(tf_model_path) or not os.path.exists(onnx_model_path):
+        pytest.skip(f"needs the {model} model and its ONNX export")
+    if model == "EFFICIENTNET":
+        from document_processor.pipeline.pipeline_nodes import EffNetDocumentClassifierNode
+        return EffNetDocumentClassifierNode(tf_model_path, 0.5), OnnxEffNetDocumentClassifierNode(onnx_model_path, 0.5)
+    from document_processor.pipeline.pipeline_nodes import EffDetDocumentClassifierNode
+    return EffDetDocumentClassifierNode(tf_model_path, 0.5), OnnxEffDetDocumentClassifierNode(onnx_model_path, 0.5)
+
+
+def load_test_images():
+    from document_processor.pipeline.pdf_to_image_converter import PdfToJpgConverter
+
+    images = []
+    for path in sorted(glob.glob(f"{TEST_FILES}/*.pdf")):
+        with open(path, "rb") as f:
+            images.append(Image.open(PdfToJpgConverter().convert(f.read())).convert("RGB"))
+    return images
+
+
+def mean_latency(node, images, repeat=5):
+    node.warm_up()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image in images:
+            node.classify_image(image)
+    return (time.perf_counter() - start) / (repeat * len(images))
+
+
+@pytest.mark.parametrize("model", ["EFFICIENTNET", "EFFICIENTDET"])
+class TestOnnxParity:
+    def test_onnx_matches_tensorflow(self, model):
+        tf_node, onnx_node = onnx_and_tf_nodes(model)
+        for image in load_test_images():
+            tf_class, tf_confidences = tf_node.classify_image(image)
+            onnx_class, onnx_confidences = onnx_node.classify_image(image)
+            assert onnx_class == tf_class
+            for (tf_name, tf_confidence), (onnx_name, onnx_confidence) in zip(
+                tf_confidences or [], onnx_confidences or []
+            ):
+                assert onnx_name == tf_name
+                assert onnx_confidence == pytest.approx(tf_confidence, abs=0.02)
+
+    def test_onnx_is_not_slower_than_tensorflow(self, model):
+        tf_node, onnx_node = onnx_and_tf_nodes(model)
+        images = load_test_images()
+        tf_latency = mean_latency(tf_node, images)
+        onnx_latency = mean_latency(onnx_node, images)
+        print(f"{model}: TensorFlow {tf_latency * 1000:.1f} ms, ONNX Runtime {onnx_latency * 1000:.1f} ms")
+        assert onnx_latency <= tf_latency * 1.2
@@ -1,13 +1,18 @@
 import io
+import threading
 
 import pdf2image as p2i
 import pytest
 from PIL import Image
 
+from document_processor.deadline import Deadline, DeadlineExceededError
 from document_processor.logger import logger
 from document_processor.pipeline.pdf_to_image_converter import (
+    PdfRejectedError,
+    PdfRenderTimeoutError,
     PdfToImageConverter,
     PdfToJpgConverter,
+    kill_processes,
 )
 
 
@@ -72,16 +77,152 @@ class TestPdfToJpgConverter:
 
     def test_convert_invalid_pdf_throws_exception(self):
         empty_pdf_bytes = b""
-        with pytest.raises(p2i.exceptions.PDFPageCountError):
+        with pytest.raises(PdfRejectedError):
             PdfToJpgConverter().convert(empty_pdf_bytes)
 
     def test_convert_calls_convert_from_bytes(self, mocker, pdf_and_image_bytes, mock_image):
         pdf_bytes, _, _ = pdf_and_image_bytes
         mock_p2i_convert = mocker.patch("document_processor.pipeline.pdf_to_image_converter.convert_from_bytes", return_value=[mock_image])
-        PdfToJpgConverter.convert(pdf_bytes)
+        PdfToJpgConverter().convert(pdf_bytes)
         mock_p2i_convert.assert_called_once_with(pdf_bytes)
 
     def test_convert_returns_image_bytes(self, pdf_and_image_bytes):
         pdf_bytes, _, _ = pdf_and_image_bytes
-        result = PdfToJpgConverter.convert(pdf_bytes)
+        result = PdfToJpgConverter().convert(pdf_bytes)
         assert isinstance(result, io.BytesIO)
+
+    def test_convert_passes_timeout_to_convert_from_bytes(self, mocker, mock_image):
+        mock_p2i_convert = mocker.patch("document_processor.pipeline.pdf_to_image_converter.convert_from_bytes", return_value=[mock_image])
+        PdfToJpgConverter().convert(b"pdf", timeout=5)
+        assert 0 < mock_p2i_convert.call_args.kwargs["timeout"] <= 5
+
+    def test_convert_timeout_raises_deadline_exceeded(self, mocker):
+        mocker.patch("document_processor.pipeline.pdf_to_image_converter.convert_from_bytes",
+                     side_effect=p2i.exceptions.PDFPopplerTimeoutError("Run poppler timeout."))
+        with pytest.raises(DeadlineExceededError):
+            PdfToJpgConverter().convert(b"pdf", timeout=5)
+
+
+class TestPdfToJpgConverterLimits:
+    @pytest.fixture
+    def mock_image(self):
+        return Image.new('RGB', (60, 30))
+
+    @pytest.fixture
+    def mock_convert(self, mocker, mock_image):
+        return mocker.patch("document_processor.pipeline.pdf_to_image_converter.convert_from_bytes",
+                            return_value=[mock_image])
+
+    @pytest.fixture
+    def mock_pdfinfo(self, mocker):
+        return mocker.patch("document_processor.pipeline.pdf_to_image_converter.pdfinfo_from_bytes",
+                            return_value={"Pages": 2, "Page    1 size": "595.276 x 841.89 pts (A4)",
+                                          "Page    2 size": "595.276 x 841.89 pts (A4)"})
+
+    def test_convert_without_limits_does_not_read_metadata(self, mock_convert, mock_pdfinfo):
+        PdfToJpgConverter().convert(b"pdf")
+        mock_pdfinfo.assert_not_called()
+
+    def test_convert_within_limits(self, mock_convert, mock_pdfinfo):
+        converter = PdfToJpgConverter(max_pages=2, max_page_size=1000, max_render_memory=2 ** 30)
+        assert isinstance(converter.convert(b"pdf"), io.BytesIO)
+        mock_convert.assert_called_once_with(b"pdf", last_page=2)
+        assert mock_pdfinfo.call_args.kwargs["first_page"] == 1
+        assert mock_pdfinfo.call_args.kwargs["last_page"] == 2
+
+    def test_convert_rejects_too_many_pages(self, mock_convert, mock_pdfinfo):
+        with pytest.raises(PdfRejectedError, match="pages"):
+            PdfToJpgConverter(max_pages=1).convert(b"pdf")
+        mock_convert.assert_not_called()
+
+    def test_convert_rejects_too_large_pages(self, mock_convert, mock_pdfinfo):
+        mock_pdfinfo.return_value = {"Pages": 1, "Page    1 size": "14400 x 14400 pts"}
+        with pytest.raises(PdfRejectedError, match="pts"):
+            PdfToJpgConverter(max_page_size=1000).convert(b"pdf")
+        mock_convert.assert_not_called()
+
+    def test_convert_rejects_too_large_later_page(self, mock_convert, mock_pdfinfo):
+        mock_pdfinfo.return_value["Page    2 size"] = "14400 x 14400 pts"
+        with pytest.raises(PdfRejectedError, match="14400 x 14400 pts"):
+            PdfToJpgConverter(max_page_size=1000).convert(b"pdf")
+        mock_convert.assert_not_called()
+
+    def test_convert_rejects_invalid_pdf(self, mock_convert, mock_pdfinfo):
+        mock_pdfinfo.side_effect = p2i.exceptions.PDFPageCountError("Unable to get page count.")
+        with pytest.raises(PdfRejectedError, match="could not be rendered"):
+            PdfToJpgConverter(max_pages=2).convert(b"pdf")
+
+    def test_convert_rejects_pdf_with_syntax_error(self, mock_convert):
+        mock_convert.side_effect = p2i.exceptions.PDFSyntaxError("Syntax Error: Couldn't find trailer dictionary")
+        with pytest.raises(PdfRejectedError, match="could not be rendered"):
+            PdfToJpgConverter().convert(b"pdf")
+
+    def test_convert_rejects_too_much_render_memory(self, mock_convert, mock_pdfinfo):
+        with pytest.raises(PdfRejectedError, match="MiB"):
+            PdfToJpgConverter(max_render_memory=10 * 2 ** 20).convert(b"pdf")
+        mock_convert.assert_not_called()
+
+    def test_estimate_render_memory_of_a4_page(self):
+        # An A4 page at 200 DPI has about 1654 x 2339 pixels
+        memory = PdfToJpgConverter().estimate_render_memory([(595.276, 841.89)])
+        assert memory == pytest.approx(1654 * 2339 * 3 * 2, rel=0.01)
+
+    def test_convert_timeout_raises_render_timeout(self, mock_convert):
+        mock_convert.side_effect = p2i.exceptions.PDFPopplerTimeoutError("Run poppler timeout.")
+        with pytest.raises(PdfRenderTimeoutError):
+            PdfToJpgConverter(timeout=1).convert(b"pdf", timeout=5)
+        assert mock_convert.call_args.kwargs["timeout"] <= 1
+
+
+class TestPdfToJpgConverterCancellation:
+    @pytest.fixture
+    def mock_image(self):
+        return Image.new('RGB', (60, 30))
+
+    @pytest.fixture
+    def mock_convert(self, mocker, mock_image):
+        return mocker.patch("document_processor.pipeline.pdf_to_image_converter.convert_from_path",
+                            return_value=[mock_image])
+
+    @pytest.fixture
+    def mock_kill(self, mocker):
+        return mocker.patch("document_processor.pipeline.pdf_to_image_converter.kill_processes")
+
+    def test_convert_with_deadline_renders_pdf(self, mock_convert, mock_kill):
+        assert isinstance(PdfToJpgConverter().convert(b"pdf", timeout=5, deadline=Deadline(5)), io.BytesIO)
+        assert mock_convert.call_args.args[0].endswith(".pdf")
+        mock_kill.assert_not_called()
+
+    def test_convert_kills_poppler_when_cancelled(self, mock_convert, mock_kill, mock_image):
+        killed = threading.Event()
+        deadline = Deadline()
+
+        def render(path, **kwargs):
+            deadline.cancel()
+            killed.wait(5)
+            return [mock_image]
+
+        mock_convert.side_effect = render
+        mock_kill.side_effect = lambda path: killed.set()
+        with pytest.raises(DeadlineExceededError, match="cancelled"):
+            PdfToJpgConverter().convert(b"pdf", deadline=deadline)
+        mock_kill.assert_called_with(mock_convert.call_args.args[0])
+
+
+class TestKillProcesses:
+    @pytest.fixture
+    def proc(self, tmp_path):
+        for pid, cmdline in (("101", b"pdftoppm\0-r\0200\0/tmp/a.pdf\0/tmp/out\0"),
+                             ("102", b"pdftoppm\0-r\0200\0/tmp/b.pdf\0/tmp/out\0")):
+            (tmp_path / pid).mkdir()
+            (tmp_path / pid / "cmdline").write_bytes(cmdline)
+        (tmp_path / "self").mkdir()
+        return str(tmp_path)
+
+    def test_kill_processes_kills_matching_processes_only(self, mocker, proc):
+        kill = mocker.patch("document_processor.pipeline.pdf_to_image_converter.os.kill")
+        assert kill_processes("/tmp/a.pdf", proc) == 1
+        assert kill.call_args.args[0] == 101
+
+    def test_kill_processes_without_proc(self, tmp_path):
+        assert kill_processes("/tmp/a.pdf", str(tmp_path / "missing")) == 0
@@ -0,0 +1,85 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from document_processor.pipeline.perceptual_hash import PerceptualHashIndex, dhash, hamming_distance
+
+
+def document_image(text_position):
+    image = Image.new("RGB", (400, 250), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, 120, 150), fill="gray")
+    draw.rectangle((text_position, 60, text_position + 200, 80), fill="black")
+    return image
+
+
+def reencode(image, quality):
+    jpg_bytes = io.BytesIO()
+    image.save(jpg_bytes, format="JPEG", quality=quality)
+    jpg_bytes.seek(0)
+    return Image.open(jpg_bytes)
+
+
+class TestDhash:
+    def test_dhash_has_64_bits(self):
+        assert 0 <= dhash(document_image(150)) < 2 ** 64
+
+    def test_dhash_of_reencoded_image_is_close(self):
+        image = document_image(150)
+        assert hamming_distance(dhash(image), dhash(reencode(image, 30))) <= 4
+
+    def test_dhash_of_different_images_is_far(self):
+        assert hamming_distance(dhash(document_image(150)), dhash(Image.fromarray(
+            np.random.default_rng(0).integers(0, 255, (250, 400, 3), dtype=np.uint8)
+        ))) > 4
+
+
+class TestHammingDistance:
+    def test_hamming_distance(self):
+        assert hamming_distance(0b1011, 0b0001) == 2
+        assert hamming_distance(5, 5) == 0
+
+
+class TestPerceptualHashIndex:
+    @pytest.fixture
+    def index(self):
+        return PerceptualHashIndex(max_size=2, max_distance=3)
+
+    def test_chunks_cover_all_bits(self, index):
+        assert sum(index.chunk_bits) == 64
+        assert len(index.chunk_bits) == 4
+
+    def test_get_exact_match(self, index):
+        index.put(0xFFFF, "passport")
+        assert index.get(0xFFFF) == "passport"
+
+    def test_get_within_distance(self, index):
+        index.put(0xFFFF, "passport")
+        assert index.get(0xFFFF ^ 0b10101) == "passport"
+
+    def test_get_beyond_distance(self, index):
+        index.put(0xFFFF, "passport")
+        assert index.get(0xFFFF ^ 0b1111) is None
+
+    def test_get_returns_closest(self, index):
+        index.put(0b0000, "id_card")
+        index.put(0b0111, "passport")
+        assert index.get(0b0011) == "passport"
+        assert index.get(0b0001) == "id_card"
+
+    def test_put_evicts_least_recently_used(self, index):
+        index.put(0, "id_card")
+        index.put(2 ** 64 - 1, "passport")
+        index.get(0)
+        index.put(2 ** 32 - 1, "driving_license")
+        assert len(index) == 2
+        assert index.get(2 ** 64 - 1) is None
+        assert index.get(0) == "id_card"
+
+    def test_put_same_hash_updates_value(self, index):
+        index.put(7, "id_card")
+        index.put(7, "passport")
+        assert len(index) == 1
+        assert index.get(7) == "passport"
@@ -1,5 +1,6 @@
 import pytest
 
+from document_processor.deadline import Deadline, DeadlineExceededError
 from document_processor.pipeline.pipeline import DocumentProcessorPipeline
 from document_processor.pipeline.pipeline_nodes import DocumentProcessingNode
 
@@ -61,4 +62,79 @@ class TestDocumentProcessorPipeline:
         nodes[0].process_document.side_effect = Exception(error_message)
 
         with pytest.raises(Exception, match=error_message):
-            pipeline.process_document(data)
\ No newline at end of file
+            pipeline.process_document(data)
+
+    def test_process_document_records_node_timings(self, pipeline, nodes, data):
+        for node in nodes:
+            pipeline.add_processing_node(node)
+            node.process_document.return_value = data
+
+        result = pipeline.process_document(data)
+
+        assert set(result["timings"]["nodes"]) == {type(node).__name__ for node in nodes}
+        assert all(timing >= 0 for timing in result["timings"]["nodes"].values())
+
+    def test_process_documents_calls_process_documents_on_all_nodes(self, pipeline, nodes, data):
+        for node in nodes:
+            pipeline.add_processing_node(node)
+            node.process_documents.side_effect = lambda batch: batch
+
+        pipeline.process_documents([data, {"text": "Bye!"}])
+
+        for node in nodes:
+            node.process_documents.assert_called_once()
+            batch = node.process_documents.call_args[0][0]
+            assert [document["text"] for document in batch] == ["Hello world!", "Bye!"]
+
+    def test_process_documents_skips_failed_documents_in_later_nodes(self, pipeline, nodes):
+        for node in nodes:
+            pipeline.add_processing_node(node)
+
+        def fail_first(batch):
+            batch[0]["error"] = ValueError("Broken PDF")
+            return batch
+
+        nodes[0].process_documents.side_effect = fail_first
+        nodes[1].process_documents.side_effect = lambda batch: batch
+
+        results = pipeline.process_documents([{"text": "a"}, {"text": "b"}])
+
+        batch = nodes[1].process_documents.call_args[0][0]
+        assert [document["text"] for document in batch] == ["b"]
+        assert isinstance(results[0]["error"], ValueError)
+
+    def test_process_documents_marks_all_documents_when_node_fails(self, pipeline, nodes):
+        pipeline.add_processing_node(nodes[0])
+        nodes[0].process_documents.side_effect = Exception("Model failed")
+
+        results = pipeline.process_documents([{"text": "a"}, {"text": "b"}])
+
+        assert all("error" in result for result in results)
+
+    def test_process_document_stops_when_deadline_is_cancelled(self, pipeline, nodes, data):
+        for node in nodes:
+            pipeline.add_processing_node(node)
+        deadline = Deadline()
+        data["deadline"] = deadline
+
+        def cancel(data):
+            deadline.cancel()
+            return data
+
+        nodes[0].process_document.side_effect = cancel
+
+        with pytest.raises(DeadlineExceededError):
+            pipeline.process_document(data)
+        nodes[1].process_document.assert_not_called()
+
+    def test_process_documents_skips_documents_past_their_deadline(self, pipeline, nodes):
+        pipeline.add_processing_node(nodes[0])
+        nodes[0].process_documents.side_effect = lambda batch: batch
+        deadline = Deadline()
+        deadline.cancel()
+
+        results = pipeline.process_documents([{"text": "a", "deadline": deadline}, {"text": "b"}])
+
+        batch = nodes[0].process_documents.call_args[0][0]
+        assert [document["text"] for document in batch] == ["b"]
+        assert isinstance(results[0]["error"], DeadlineExceededError)
@@ -3,13 +3,16 @@ import pytest
 import io
 from PIL import Image
 
+from document_processor.deadline import Deadline, DeadlineExceededError
 from document_processor.pipeline.pdf_to_image_converter import PdfToImageConverter
 from document_processor.pipeline.pipeline_nodes import (
     DocumentProcessingNode,
     PdfToImageConverterNode,
     EffNetDocumentClassifierNode,
     EffDetDocumentClassifierNode,
+    EffDetDocumentLocalizerNode,
     MLModelDocumentClassifierNode,
+    PerceptualHashCacheNode,
 )
 
 from document_processor.logger import logger
@@ -47,6 +50,96 @@ class TestPdfToImageConverterNode:
         result = node.process_document(data)
         assert result["jpg_bytes"] == converter_mock.convert.return_value
 
+    def test_process_document_passes_remaining_time_as_timeout(self, node, data, converter_mock):
+        data["deadline"] = Deadline(10)
+        node.process_document(data)
+        timeout = converter_mock.convert.call_args.kwargs["timeout"]
+        assert 0 < timeout <= 10
+
+    def test_process_document_passes_deadline(self, node, data, converter_mock):
+        data["deadline"] = Deadline(10)
+        node.process_document(data)
+        assert converter_mock.convert.call_args.kwargs["deadline"] is data["deadline"]
+
+    def test_process_document_does_not_convert_after_deadline(self, node, data, converter_mock):
+        data["deadline"] = Deadline()
+        data["deadline"].cancel()
+        with pytest.raises(DeadlineExceededError):
+            node.process_document(data)
+        converter_mock.convert.assert_not_called()
+
+    def test_process_documents_isolates_failing_documents(self, node, converter_mock):
+        converter_mock.convert.side_effect = [ValueError("Broken PDF"), b"test jpg bytes"]
+        results = node.process_documents([{"pdf_bytes": b"broken"}, {"pdf_bytes": b"fine"}])
+        assert isinstance(results[0]["error"], ValueError)
+        assert results[1]["jpg_bytes"] == b"test jpg bytes"
+
+    def test_process_documents_in_parallel_keeps_order(self, converter_mock):
+        converter_mock.convert.side_effect = lambda pdf_bytes: pdf_bytes + b" as jpg"
+        node = PdfToImageConverterNode(converter=converter_mock, max_workers=4)
+        results = node.process_documents([{"pdf_bytes": str(i).encode()} for i in range(8)])
+        assert [result["jpg_bytes"] for result in results] == [f"{i} as jpg".encode() for i in range(8)]
+
+
+class TestPerceptualHashCacheNode:
+    @pytest.fixture
+    def classifier_mock(self, mocker):
+        classifier = mocker.Mock(spec=MLModelDocumentClassifierNode)
+
+        def classify(data):
+            Image.open(data["jpg_bytes"]).load()
+            data["document_type"] = "passport"
+            data["prediction_confidences"] = [("passport", 0.9)]
+            return data
+
+        classifier.process_document.side_effect = classify
+        classifier.process_documents.side_effect = lambda data_list: [classify(data) for data in data_list]
+        return classifier
+
+    @pytest.fixture
+    def node(self, classifier_mock):
+        return PerceptualHashCacheNode(classifier_mock, max_size=8, max_distance=4)
+
+    @staticmethod
+    def jpg_data(color, quality=90):
+        image = Image.new("RGB", (200, 120), "white")
+        image.paste(Image.new("RGB", (80, 60), color), (20, 20))
+        jpg_bytes = io.BytesIO()
+        image.save(jpg_bytes, format="JPEG", quality=quality)
+        jpg_bytes.seek(0)
+        return {"jpg_bytes": jpg_bytes}
+
+    def test_process_document_miss_calls_classifier(self, node, classifier_mock):
+        result = node.process_document(self.jpg_data("black"))
+        classifier_mock.process_document.assert_called_once()
+        assert result["cache_hit"] is False
+        assert result["document_type"] == "passport"
+
+    def test_hash_image_prefers_prepared_image(self, node):
+        page = self.jpg_data("black")
+        crop = Image.open(self.jpg_data("black")["jpg_bytes"]).crop((20, 20, 100, 80))
+        assert node.hash_image({**page, "image": crop}) != node.hash_image(page)
+
+    def test_process_document_near_duplicate_is_hit(self, node, classifier_mock):
+        node.process_document(self.jpg_data("black", quality=90))
+        result = node.process_document(self.jpg_data("black", quality=40))
+        classifier_mock.process_document.assert_called_once()
+        assert result["cache_hit"] is True
+        assert result["document_type"] == "passport"
+        assert result["prediction_confidences"] == [("passport", 0.9)]
+
+    def test_process_document_rewinds_image_for_classifier(self, node):
+        data = self.jpg_data("black")
+        node.process_document(data)
+        assert "error" not in data
+
+    def test_process_documents_classifies_only_misses(self, node, classifier_mock):
+        node.process_document(self.jpg_data("black"))
+        results = node.process_documents([self.jpg_data("black"), {"jpg_bytes": io.BytesIO(b"not a jpg")}])
+        classifier_mock.process_documents.assert_not_called()
+        assert results[0]["cache_hit"] is True
+        assert "error" in results[1]
+
 
 @pytest.fixture
 def model_path():
@@ -131,6 +224,36 @@ class TestMLModelDocumentClassifierNode:
         result_data = dummy_node.process_document(input_data)
         assert "prediction_confidences" in result_data
 
+    def test_process_documents_calls_classify_images_once(self, mocker, input_data, dummy_node, mock_image,
+                                                         res_document_type, res_confidences):
+        mocker.patch("PIL.Image.open", return_value=mock_image)
+        mock_classify_images = mocker.patch.object(dummy_node,
+                                                   "classify_images",
+                                                   return_value=[(res_document_type, res_confidences)] * 2
+                                                   )
+        dummy_node.process_documents([input_data, dict(input_data)])
+        mock_classify_images.assert_called_once_with([mock_image, mock_image])
+
+    def test_process_documents_records_batch_size(self, mocker, input_data, dummy_node):
+        mocker.patch("PIL.Image.open")
+        results = dummy_node.process_documents([input_data, dict(input_data)])
+        assert all(result["timings"]["batch_size"] == 2 for result in results)
+
+    def test_classify_images_defaults_to_classify_image(self, dummy_node, mock_image, res_document_type):
+        results = dummy_node.classify_images([mock_image, mock_image])
+        assert [result[0] for result in results] == [res_document_type, res_document_type]
+
+    def test_get_footprint_sums_variables(self, mocker, dummy_node, model_path):
+        variable = mocker.Mock(shape=(256, 1024), dtype=mocker.Mock(size=4))
+        dummy_node.model = mocker.Mock(variables=[variable, variable])
+        assert dummy_node.get_footprint() == {
+            "node": "DummyDocumentClassifierNode", "path": model_path, "weights_mb": 2.0, "memory_mapped": False,
+        }
+
+    def test_get_footprint_without_variables(self, dummy_node):
+        dummy_node.model = object()
+        assert dummy_node.get_footprint()["weights_mb"] is None
+
     def test_classify_image_not_implemented(self, model_path, min_confidence):
         with pytest.raises(TypeError):
             MLModelDocumentClassifierNode(model_path, min_confidence).classify_image(None)
@@ -154,7 +277,7 @@ class TestEffNetDocumentClassifierNode:
         return node
 
     def test_classify_image_calls_image_resize(self, mocker, effnet_node, mock_image):
-        mock_resize_image = mocker.patch.object(mock_image, "resize", return_value=mock_image)
+        mock_resize_image = mocker.patch.object(mock_image, "resize", return_value=Image.new('RGB', (224, 224)))
 
         effnet_node.classify_image(mock_image)
         mock_resize_image.assert_called_once_with((224, 224))
@@ -177,6 +300,18 @@ class TestEffNetDocumentClassifierNode:
         expected_confidences = list(zip(effnet_node.document_classes, res_confidences[0]))
         assert result[1] == expected_confidences
 
+    def test_classify_images_calls_model_predict_once(self, effnet_node, mock_image, mock_model):
+        mock_model.predict.return_value = np.asarray([[0.1, 0.1, 0.8], [0.7, 0.2, 0.1]])
+        results = effnet_node.classify_images([mock_image, mock_image])
+        mock_model.predict.assert_called_once()
+        assert mock_model.predict.call_args[0][0].shape == (2, 224, 224, 3)
+        assert [result[0] for result in results] == ["passport", "driving_license"]
+
+    def test_preprocess_image_writes_into_out(self, effnet_node):
+        out = np.full((224, 224, 3), -1, dtype=np.float32)
+        assert effnet_node.preprocess_image(Image.new('RGB', (60, 30), color=(255, 0, 0)), out) is out
+        assert out[0, 0].tolist() == [255.0, 0.0, 0.0]
+
 
 class TestEffDetDocumentClassifierNode:
     @pytest.fixture
@@ -193,69 +328,160 @@ class TestEffDetDocumentClassifierNode:
         return node
 
     @pytest.fixture
-    def mock_detections(self, mocker):
-        mock_data_prediction_small = mocker.MagicMock()
-        mock_data_prediction_small.numpy.return_value = 0
-        mock_data_prediction_large = mocker.MagicMock()
-        mock_data_prediction_large.numpy.return_value = 1
-
-        mock_data = mocker.MagicMock()
-        mock_data.numpy.return_value = mocker.MagicMock(astype=lambda dtype: 1)
-        mock_detections = {"detection_scores": [[mock_data_prediction_large, mock_data_prediction_small]],
-                           "detection_classes": [[mock_data, mock_data], [mock_data]]}
-        return mock_detections
-
-    def test_get_detections_gets_image_data(self, mocker, effdet_node, mock_image):
-        mocker.patch.object(mock_image, "getdata", return_value=mocker.MagicMock())
-        effdet_node.get_detections(mock_image)
-        mock_image.getdata.assert_called_once()
+    def detections(self):
+        return {"detection_scores": np.asarray([[0.9, 0.7, 0.6, 0.1]], dtype=np.float32),
+                "detection_classes": np.asarray([[3., 1., 3., 2.]], dtype=np.float32)}
+
+    def test_get_detections_writes_image_into_batch(self, mocker, effdet_node, mock_model):
+        mocker.patch("tensorflow.convert_to_tensor", side_effect=lambda array: array.copy())
+        effdet_node.get_detections(Image.new('RGB', (60, 30), color=(255, 0, 0)))
+        batch = mock_model.call_args[0][0]
+        assert batch.shape == (1, 30, 60, 3) and batch.dtype == np.uint8
+        assert batch[0, 0, 0].tolist() == [255, 0, 0]
 
     def test_get_detections_calls_model(self, mocker, effdet_node, mock_image, mock_model):
         mocker.patch.object(mock_image, "getdata", return_value=mocker.MagicMock())
         effdet_node.get_detections(mock_image)
         mock_model.assert_called_once()
 
-    def test_calculate_highest_index_returns_int(self, effdet_node):
-        mock_detections = {"detection_scores": [[5, 5, 5], [0, 0, 0]]}
-        result = effdet_node.calculate_highest_index(mock_detections)
-        assert isinstance(result, np.int64)
-
-    def test_calculate_highest_class_index_returns_int(self, effdet_node, mock_detections):
-        highest_index = 0
-        result = effdet_node.calculate_highest_class_index(mock_detections, highest_index)
-        assert isinstance(result, int)
-
-    def test_get_prediction_confidences_discards_all_small_confidences(self, effdet_node, mock_detections):
-        result = effdet_node.get_prediction_confidences(mock_detections)
-        assert len(result) == 1
-
-    def test_classify_image_calls_calculate_highest_index(self, mocker, effdet_node, mock_detections):
-        mocker.patch.object(effdet_node, "get_prediction_confidences", return_value=None)
-        mocker.patch.object(effdet_node, "get_detections", return_value=mock_detections)
-        mock_get_index = mocker.patch.object(effdet_node, "calculate_highest_index", return_value=0)
-        effdet_node.classify_image(mock_image)
-        mock_get_index.assert_called_once_with(mock_detections)
-
-    def test_classify_image_calculate_highest_class_index(self, mocker, effdet_node, mock_detections):
-        mocker.patch.object(effdet_node, "get_prediction_confidences", return_value=None)
-        mocker.patch.object(effdet_node, "get_detections", return_value=mock_detections)
-        mocker.patch.object(effdet_node, "calculate_highest_index", return_value=0)
-        mock_get_class_index = mocker.patch.object(effdet_node, "calculate_highest_class_index", return_value=1)
+    def test_detections_to_numpy_returns_zero_based_classes(self, effdet_node, detections):
+        scores, classes = effdet_node.detections_to_numpy(detections)
+        assert scores.shape == (1, 4)
+        assert classes.tolist() == [[2, 0, 2, 1]]
+
+    def test_calculate_class_confidences_takes_max_per_class(self, effdet_node, detections):
+        scores, classes = effdet_node.detections_to_numpy(detections)
+        result = effdet_node.calculate_class_confidences(scores, classes)
+        np.testing.assert_allclose(result, [[0.7, 0.1, 0.9]])
+
+    def test_calculate_class_confidences_without_detections(self, effdet_node):
+        scores, classes = np.zeros((1, 0), dtype=np.float32), np.zeros((1, 0), dtype=np.int64)
+        result = effdet_node.calculate_class_confidences(scores, classes)
+        np.testing.assert_array_equal(result, [[0.0, 0.0, 0.0]])
+
+    def test_calculate_class_confidences_batched(self, effdet_node):
+        scores = np.asarray([[0.9, 0.2], [0.3, 0.8]], dtype=np.float32)
+        classes = np.asarray([[0, 1], [0, 1]])
+        result = effdet_node.calculate_class_confidences(scores, classes)
+        np.testing.assert_allclose(result, [[0.9, 0.2, 0.0], [0.3, 0.8, 0.0]])
+
+    def test_get_prediction_confidences_discards_all_small_confidences(self, effdet_node):
+        result = effdet_node.get_prediction_confidences(np.asarray([0.7, 0.1, 0.9]))
+        assert result == [("passport", 0.9), ("driving_license", 0.7)]
+
+    def test_postprocess_detections_returns_highest_class(self, effdet_node, detections):
+        result = effdet_node.postprocess_detections(detections)
+        assert result == [("passport", [("passport", 0.9), ("driving_license", 0.7)])]
+
+    def test_postprocess_detections_below_min_confidence(self, effdet_node):
+        detections = {"detection_scores": np.asarray([[0.3]]), "detection_classes": np.asarray([[1.]])}
+        assert effdet_node.postprocess_detections(detections) == [(None, None)]
+
+    def test_classify_image_calls_postprocess_detections(self, mocker, effdet_node, mock_image, detections):
+        mocker.patch.object(effdet_node, "get_detections", return_value=detections)
+        mock_postprocess = mocker.patch.object(effdet_node, "postprocess_detections", return_value=[(None, None)])
         effdet_node.classify_image(mock_image)
-        mock_get_class_index.assert_called_once()
+        mock_postprocess.assert_called_once_with(detections)
 
-    def test_classify_image_calls_get_prediction_confidences(self, mocker, effdet_node, mock_image, mock_detections):
-        mock_get_pred = mocker.patch.object(effdet_node, "get_prediction_confidences", return_value=None)
-        mocker.patch.object(effdet_node, "get_detections", return_value=mock_detections)
-        mocker.patch.object(effdet_node, "calculate_highest_index", return_value=0)
-        mocker.patch.object(effdet_node, "calculate_highest_class_index", return_value=1)
-        effdet_node.classify_image(mock_image)
-        mock_get_pred.assert_called_once()
-
-    def test_classify_image_returns_tuple(self, mocker, effdet_node, mock_image):
-        mocker.patch.object(mock_image, "getdata", return_value=mocker.MagicMock())
+    def test_classify_image_returns_tuple(self, mocker, effdet_node, mock_image, detections):
+        mocker.patch.object(effdet_node, "get_detections", return_value=detections)
         result = effdet_node.classify_image(mock_image)
         assert isinstance(result, tuple)
 
+    def test_pad_images_clears_padding_of_reused_buffer(self, effdet_node):
+        images = [Image.new('RGB', (60, 30), color=(255, 255, 255)), Image.new('RGB', (20, 40), color=(1, 1, 1))]
+        out = np.full((2, 40, 60, 3), 7, dtype=np.uint8)
+        batch = effdet_node.pad_images(images, out)
+        assert batch is out
+        assert batch[0, 35, 0, 0] == 0 and batch[1, 0, 30, 0] == 0
+        assert batch[1, 39, 19, 0] == 1
+
+    def test_pad_images_pads_to_largest_image(self, effdet_node):
+        images = [Image.new('RGB', (60, 30), color=(255, 255, 255)), Image.new('RGB', (20, 40))]
+        batch = effdet_node.pad_images(images)
+        assert batch.shape == (2, 40, 60, 3)
+        assert batch[0, 35, 0, 0] == 0
+        assert batch[0, 0, 0, 0] == 255
+
+    def test_classify_images_calls_model_once(self, mocker, effdet_node, mock_image, mock_model, detections):
+        mocker.patch("tensorflow.convert_to_tensor", side_effect=lambda array: array)
+        mock_model.return_value = {key: np.concatenate([value, value]) for key, value in detections.items()}
+        results = effdet_node.classify_images([mock_image, mock_image])
+        mock_model.assert_called_once()
+        assert len(results) == 2
+
+    def test_get_batch_detections_falls_back_to_single_images(self, mocker, effdet_node, mock_image, mock_model,
+                                                              detections):
+        mocker.patch("tensorflow.convert_to_tensor", side_effect=lambda array: array)
+        mock_model.side_effect = ValueError("Expected batch size 1")
+        mocker.patch.object(effdet_node, "get_detections", return_value=detections)
+        result = effdet_node.get_batch_detections([mock_image, mock_image])
+        assert result["detection_scores"].shape == (2, 4)
+        assert not effdet_node.supports_batches
 
 
+class TestEffDetDocumentLocalizerNode:
+    @pytest.fixture
+    def mock_model(self, mocker):
+        return mocker.MagicMock()
+
+    @pytest.fixture
+    def node(self, mocker, mock_model, model_path):
+        mocker.patch("tensorflow.saved_model.load", return_value=mock_model)
+        mocker.patch("tensorflow.convert_to_tensor", side_effect=lambda array: array.copy())
+        return EffDetDocumentLocalizerNode(model_path, min_score=0.5, input_size=100, margin=0.0)
+
+    @staticmethod
+    def page_data(size=(400, 200)):
+        jpg_bytes = io.BytesIO()
+        Image.new("RGB", size, "white").save(jpg_bytes, format="JPEG")
+        jpg_bytes.seek(0)
+        return {"jpg_bytes": jpg_bytes}
+
+    @staticmethod
+    def detections(scores, boxes):
+        return {"detection_scores": np.asarray(scores, dtype=np.float32),
+                "detection_boxes": np.asarray(boxes, dtype=np.float32)}
+
+    def test_downscale_keeps_aspect_ratio(self, node):
+        assert node.downscale(Image.new("RGB", (400, 200))).size == (100, 50)
+        assert node.downscale(Image.new("RGB", (60, 30))).size == (60, 30)
+
+    def test_process_document_detects_on_downscaled_page(self, node, mock_model):
+        mock_model.return_value = self.detections([[0.1]], [[[0, 0, 1, 1]]])
+        node.process_document(self.page_data())
+        assert mock_model.call_args[0][0].shape == (1, 50, 100, 3)
+
+    def test_process_document_crops_detected_document(self, node, mock_model):
+        mock_model.return_value = self.detections([[0.2, 0.9]], [[[0, 0, 1, 1], [0.25, 0.5, 0.75, 1.0]]])
+        result = node.process_document(self.page_data())
+        assert result["image"].size == (200, 100)
+        assert result["document_box"] == [0.25, 0.5, 0.75, 1.0]
+
+    def test_process_document_keeps_page_without_confident_detection(self, node, mock_model):
+        mock_model.return_value = self.detections([[0.2]], [[[0.25, 0.5, 0.75, 1.0]]])
+        result = node.process_document(self.page_data())
+        assert result["image"].size == (400, 200)
+        assert result["document_box"] is None
+
+    def test_crop_adds_margin_within_page(self, node):
+        node.margin = 0.1
+        crop = node.crop(Image.new("RGB", (400, 200)), [0.0, 0.5, 0.5, 1.0])
+        assert crop.size == (220, 110)
+
+    def test_process_documents_rescales_boxes_of_padded_batch(self, node, mock_model):
+        # The second page is padded from 100 x 50 to 100 x 100, its box is relative to the padded size
+        mock_model.return_value = self.detections([[0.9], [0.9]], [[[0, 0, 1, 1]], [[0, 0, 0.5, 0.5]]])
+        results = node.process_documents([self.page_data((200, 400)), self.page_data((400, 200))])
+        mock_model.assert_called_once()
+        assert results[0]["image"].size == (200, 400)
+        assert results[1]["document_box"] == [0.0, 0.0, 1.0, 0.5]
+        assert results[1]["image"].size == (200, 200)
+
+    def test_classifier_prefers_prepared_image(self, mocker, model_path, min_confidence):
+        mocker.patch("tensorflow.keras.models.load_model")
+        classifier = EffNetDocumentClassifierNode(model_path, min_confidence)
+        classify_image = mocker.patch.object(classifier, "classify_image", return_value=("passport", []))
+        crop = Image.new("RGB", (20, 10))
+        classifier.process_document({**self.page_data(), "image": crop})
+        classify_image.assert_called_once_with(crop)
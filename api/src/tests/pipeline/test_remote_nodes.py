@@ -0,0 +1,215 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from document_processor.deadline import Deadline, DeadlineExceededError
+from document_processor.inference_worker import InferenceServer
+from document_processor.pipeline.pipeline import DocumentProcessorPipeline
+from document_processor.pipeline.pipeline_nodes import DocumentProcessingNode
+from document_processor.pipeline.remote_nodes import (
+    ConnectionPool,
+    MicroBatcher,
+    RemoteDocumentClassifierNode,
+    RemoteInferenceError,
+    batch_to_images,
+    images_to_batch,
+    parse_addresses,
+    recv_message,
+    send_message,
+)
+
+
+class SizeClassifierNode(DocumentProcessingNode):
+    """
+    Classifies an image by its width, so that tests can check which image a result belongs to.
+    """
+    def __init__(self):
+        self.batch_sizes = []
+
+    def process_document(self, data: dict):
+        return self.process_documents([data])[0]
+
+    def process_documents(self, data_list: list):
+        self.batch_sizes.append(len(data_list))
+        for data in data_list:
+            if data["image"].width == 13:
+                data["error"] = ValueError("unlucky width")
+                continue
+            data["document_type"] = f"width_{data['image'].width}"
+            data["prediction_confidences"] = [("id_card", 0.9)]
+        return data_list
+
+
+@pytest.fixture
+def classifier():
+    return SizeClassifierNode()
+
+
+@pytest.fixture
+def server(classifier):
+    pipeline = DocumentProcessorPipeline()
+    pipeline.add_processing_node(classifier)
+    server = InferenceServer(("127.0.0.1", 0), pipeline, "TEST")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def address(server):
+    return f"127.0.0.1:{server.server_address[1]}"
+
+
+class TestFraming:
+    def test_send_and_receive_array(self):
+        left, right = socket.socketpair()
+        array = np.arange(24, dtype=np.uint8).reshape(2, 3, 4)
+        send_message(left, {"op": "classify"}, array)
+        header, received = recv_message(right)
+        assert header["op"] == "classify"
+        np.testing.assert_array_equal(received, array)
+
+    def test_send_and_receive_header_only(self):
+        left, right = socket.socketpair()
+        send_message(left, {"op": "info"})
+        assert recv_message(right) == ({"op": "info"}, None)
+
+    def test_receive_from_closed_connection_raises(self):
+        left, right = socket.socketpair()
+        left.close()
+        with pytest.raises(ConnectionError):
+            recv_message(right)
+
+
+class TestBatchConversion:
+    def test_images_survive_round_trip(self):
+        images = [Image.new("RGB", (10, 20), (255, 0, 0)), Image.new("RGB", (30, 5), (0, 255, 0))]
+        batch, sizes = images_to_batch(images)
+        assert batch.shape == (2, 20, 30, 3)
+        restored = batch_to_images(batch, sizes)
+        assert [image.size for image in restored] == [(10, 20), (30, 5)]
+        assert restored[1].getpixel((0, 0)) == (0, 255, 0)
+
+    def test_images_are_resized_to_input_size(self):
+        batch, sizes = images_to_batch([Image.new("L", (1000, 800))], (224, 224))
+        assert batch.shape == (1, 224, 224, 3)
+        assert sizes == [[224, 224]]
+
+
+class TestParseAddresses:
+    def test_parse_addresses(self):
+        assert parse_addresses("a:1, b:2") == [("a", 1), ("b", 2)]
+
+    def test_parse_address_without_port_uses_default(self):
+        assert parse_addresses("inference") == [("inference", 8500)]
+
+    def test_parse_empty_addresses_raises(self):
+        with pytest.raises(ValueError):
+            parse_addresses(" , ")
+
+
+class TestMicroBatcher:
+    def test_concurrent_items_are_batched(self):
+        batches = []
+
+        def process_batch(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process_batch, max_batch_size=4, max_delay=0.2)
+        futures = [batcher.submit(i) for i in range(4)]
+        assert [future.result(5) for future in futures] == [0, 2, 4, 6]
+        assert batches == [[0, 1, 2, 3]]
+
+    def test_exception_fails_whole_batch(self):
+        def process_batch(items):
+            raise ValueError("failed")
+
+        future = MicroBatcher(process_batch, max_delay=0).submit(1)
+        with pytest.raises(ValueError):
+            future.result(5)
+
+    def test_exception_as_result_fails_only_its_item(self):
+        batcher = MicroBatcher(lambda items: [ValueError("failed"), "ok"], max_batch_size=2, max_delay=0.2)
+        failed, ok = batcher.submit(1), batcher.submit(2)
+        assert ok.result(5) == "ok"
+        with pytest.raises(ValueError):
+            failed.result(5)
+
+
+class TestConnectionPool:
+    def test_connection_is_reused(self, server):
+        pool = ConnectionPool([server.server_address], size=1)
+        pool.request({"op": "info"})
+        with pool.connection() as (_, reused):
+            assert reused
+
+    def test_stale_connection_is_replaced(self, server):
+        pool = ConnectionPool([server.server_address], size=1)
+        with pool.connection() as (sock, _):
+            pass
+        sock.shutdown(socket.SHUT_RDWR)
+        header, _ = pool.request({"op": "info"})
+        assert header["model"] == "TEST"
+
+    def test_unreachable_worker_raises(self):
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+        pool = ConnectionPool([("127.0.0.1", port)], timeout=1)
+        with pytest.raises(RemoteInferenceError):
+            pool.request({"op": "info"})
+
+
+class TestRemoteDocumentClassifierNode:
+    @pytest.fixture
+    def node(self, address):
+        return RemoteDocumentClassifierNode(address, max_batch_size=4, max_batch_delay=0.05, timeout=5)
+
+    def test_warm_up_gets_info(self, node):
+        node.warm_up()
+        assert node.info["model"] == "TEST"
+        assert node.input_size is None
+
+    def test_process_document(self, node):
+        data = node.process_document({"image": Image.new("RGB", (42, 10))})
+        assert data["document_type"] == "width_42"
+        assert data["prediction_confidences"] == [("id_card", 0.9)]
+
+    def test_process_document_raises_error_of_worker(self, node):
+        with pytest.raises(RemoteInferenceError):
+            node.process_document({"image": Image.new("RGB", (13, 10))})
+
+    def test_concurrent_documents_are_sent_in_one_batch(self, node, classifier):
+        node.warm_up()
+        results = [None] * 4
+
+        def classify(i):
+            results[i] = node.process_document({"image": Image.new("RGB", (20 + i, 10))})["document_type"]
+
+        threads = [threading.Thread(target=classify, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        assert results == ["width_20", "width_21", "width_22", "width_23"]
+        assert max(classifier.batch_sizes) > 1
+
+    def test_process_documents_sends_chunks(self, node, classifier):
+        data_list = [{"image": Image.new("RGB", (20 + i, 10))} for i in range(6)] + [
+            {"image": Image.new("RGB", (13, 10))}
+        ]
+        results = node.process_documents(data_list)
+        assert classifier.batch_sizes == [4, 3]
+        assert [data.get("document_type") for data in results[:6]] == [f"width_{20 + i}" for i in range(6)]
+        assert isinstance(results[6]["error"], RemoteInferenceError)
+
+    def test_process_document_respects_deadline(self, address):
+        node = RemoteDocumentClassifierNode(address, max_batch_delay=0.5)
+        with pytest.raises(DeadlineExceededError):
+            node.process_document({"image": Image.new("RGB", (20, 10)), "deadline": Deadline(0.01)})
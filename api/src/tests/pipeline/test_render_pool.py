@@ -0,0 +1,185 @@
+import io
+import multiprocessing
+
+import pytest
+from PIL import Image
+
+from document_processor.deadline import Deadline, DeadlineExceededError
+from document_processor.pipeline.pdf_to_image_converter import (
+    PdfRejectedError,
+    PdfRenderTimeoutError,
+    PdfToJpgConverter,
+)
+from document_processor.pipeline.render_pool import (
+    PooledPdfToImageConverter,
+    RenderWorker,
+    RenderWorkerTimeoutError,
+    get_buffer_size,
+    render_pages,
+)
+
+ONE_PAGE_PDF = b"%PDF-1.7\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Count 1/Kids[3 0 " \
+               b"R]>>endobj\n3 0 obj<</Type/Page/MediaBox[0 0 595 842]>>endobj\nxref\n0 4\n0000000000 65535 " \
+               b"f\n0000000018 00000 n\n0000000063 00000 n\n0000000108 00000 n\ntrailer<</Size 4/Root 1 0 " \
+               b"R>>startxref\n142\n%%EOF\n"
+TWO_PAGE_PDF = b"%PDF-1.7\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Kids[3 0 R 4 0 " \
+               b"R]/Count 2>>endobj\n3 0 obj<</Type/Page/MediaBox[0 0 595 842]>>endobj\n4 0 " \
+               b"obj<</Type/Page/MediaBox[0 0 595 842]>>endobj\nxref\n0 5\n0000000000 65535 f\n0000000018 " \
+               b"00000 n\n0000000062 00000 n\n0000000106 00000 n\n0000000150 00000 n\ntrailer<</Size 5/Root " \
+               b"1 0 R>>startxref\n146\n%%EOF\n"
+
+
+class TestRenderPages:
+    @pytest.fixture(autouse=True)
+    def pdfium(self):
+        return pytest.importorskip("pypdfium2")
+
+    def test_render_pages_writes_pages_to_buffer(self):
+        buffer = bytearray(64 * 2 ** 20)
+        kind, layout = render_pages(TWO_PAGE_PDF, PdfToJpgConverter(), memoryview(buffer))
+        assert kind == "pages"
+        assert len(layout) == 2
+        (width, height, offset, pixels), (_, _, second_offset, _) = layout
+        # 595 x 842 pts at 200 DPI
+        assert (width, height) == (1653, 2339)
+        assert offset == 0 and pixels is None
+        assert second_offset == width * height * 3
+
+    def test_render_pages_sends_pages_that_do_not_fit_through_the_pipe(self):
+        kind, layout = render_pages(ONE_PAGE_PDF, PdfToJpgConverter(), memoryview(bytearray(16)))
+        width, height, offset, pixels = layout[0]
+        assert offset is None
+        assert len(pixels) == width * height * 3
+
+    def test_render_pages_rejects_pdf_over_limit(self):
+        answer = render_pages(TWO_PAGE_PDF, PdfToJpgConverter(max_pages=1), memoryview(bytearray(16)))
+        assert answer == ("rejected", "pages", "PDF has 2 pages, at most 1 are allowed")
+
+    def test_render_pages_checks_every_page(self):
+        first_page, second_page = TWO_PAGE_PDF.rsplit(b"595 842", 1)
+        kind, reason, _ = render_pages(first_page + b"5950 842" + second_page, PdfToJpgConverter(max_page_size=1000),
+                                       memoryview(bytearray(16)))
+        assert (kind, reason) == ("rejected", "page_size")
+
+
+class TestPooledPdfToImageConverter:
+    @pytest.fixture
+    def converter(self):
+        pytest.importorskip("pypdfium2")
+        converter = PooledPdfToImageConverter(workers=1, max_page_size=1000, health_check_interval=0)
+        yield converter
+        converter.close()
+
+    def test_convert_returns_jpeg(self, converter):
+        image = Image.open(converter.convert(ONE_PAGE_PDF))
+        assert image.format == "JPEG"
+        assert image.size == (1653, 2339)
+
+    def test_convert_reuses_worker(self, converter):
+        pid = converter.workers[0].process.pid
+        converter.convert(ONE_PAGE_PDF)
+        converter.convert(ONE_PAGE_PDF)
+        assert converter.workers[0].process.pid == pid
+
+    def test_convert_rejects_invalid_pdf(self, converter):
+        with pytest.raises(PdfRejectedError, match="could not be rendered"):
+            converter.convert(b"%PDF-1.7 invalid")
+
+    def test_convert_rejects_pdf_over_limit(self, converter):
+        large_page_pdf = ONE_PAGE_PDF.replace(b"595 842", b"5950 842")
+        with pytest.raises(PdfRejectedError, match="at most 1000 pts"):
+            converter.convert(large_page_pdf)
+
+    def test_convert_restarts_worker_that_died_while_idle(self, converter):
+        worker = converter.workers[0]
+        worker.process.kill()
+        worker.process.join()
+        assert not worker.is_healthy()
+        assert isinstance(converter.convert(ONE_PAGE_PDF), io.BytesIO)
+        assert worker.is_healthy()
+
+
+class TestRenderWorkerRequest:
+    @pytest.fixture
+    def worker(self):
+        worker = RenderWorker.__new__(RenderWorker)
+        worker.connection, worker_connection = multiprocessing.Pipe()
+        yield worker
+        worker.connection.close()
+        worker_connection.close()
+
+    def test_request_stops_waiting_when_cancelled(self, worker):
+        deadline = Deadline()
+        deadline.cancel()
+        with pytest.raises(DeadlineExceededError):
+            worker.request(("render", ONE_PAGE_PDF), deadline=deadline)
+
+    def test_request_times_out(self, worker):
+        with pytest.raises(RenderWorkerTimeoutError):
+            worker.request(("render", ONE_PAGE_PDF), 0.01, Deadline())
+
+
+class TestPooledPdfToImageConverterFailures:
+    @pytest.fixture
+    def worker(self, mocker):
+        worker = mocker.Mock(spec=RenderWorker)
+        worker.process = mocker.Mock()
+        worker.process.is_alive.return_value = True
+        return worker
+
+    @pytest.fixture
+    def converter(self, mocker, worker):
+        mocker.patch("document_processor.pipeline.render_pool.importlib.util.find_spec", return_value=True)
+        mocker.patch("document_processor.pipeline.render_pool.RenderWorker", return_value=worker)
+        converter = PooledPdfToImageConverter(workers=1, timeout=5, health_check_interval=0)
+        yield converter
+        converter.finalizer.detach()
+
+    def test_convert_restarts_hung_worker(self, converter, worker):
+        worker.request.side_effect = RenderWorkerTimeoutError("Rendering worker did not answer within 5s")
+        with pytest.raises(PdfRenderTimeoutError):
+            converter.convert(ONE_PAGE_PDF)
+        worker.restart.assert_called_once_with("timeout")
+        assert converter.idle_workers.qsize() == 1
+
+    def test_convert_raises_deadline_exceeded_for_shorter_deadline(self, converter, worker):
+        worker.request.side_effect = RenderWorkerTimeoutError("Rendering worker did not answer within 1s")
+        with pytest.raises(DeadlineExceededError):
+            converter.convert(ONE_PAGE_PDF, timeout=1)
+        assert worker.request.call_args.args[1] <= 1
+
+    def test_convert_restarts_worker_of_cancelled_request(self, converter, worker):
+        worker.request.side_effect = DeadlineExceededError("Request was cancelled")
+        deadline = Deadline()
+        with pytest.raises(DeadlineExceededError):
+            converter.convert(ONE_PAGE_PDF, deadline=deadline)
+        assert worker.request.call_args.args[2] is deadline
+        worker.restart.assert_called_once_with("cancelled")
+        assert converter.idle_workers.qsize() == 1
+
+    def test_convert_restarts_crashed_worker(self, converter, worker):
+        worker.request.side_effect = EOFError()
+        with pytest.raises(PdfRejectedError, match="crashed"):
+            converter.convert(ONE_PAGE_PDF)
+        worker.restart.assert_called_once_with("crash")
+
+    def test_convert_waits_for_idle_worker_until_timeout(self, converter):
+        converter.idle_workers.get()
+        with pytest.raises(DeadlineExceededError):
+            converter.convert(ONE_PAGE_PDF, timeout=0.01)
+
+    def test_buffer_size_is_sized_from_max_render_memory(self, mocker, worker):
+        mocker.patch("document_processor.pipeline.render_pool.importlib.util.find_spec", return_value=True)
+        render_worker = mocker.patch("document_processor.pipeline.render_pool.RenderWorker", return_value=worker)
+        converter = PooledPdfToImageConverter(workers=1, max_render_memory=8 * 2 ** 20, health_check_interval=0)
+        converter.finalizer.detach()
+        assert render_worker.call_args.args[2] == 4 * 2 ** 20
+
+    def test_default_buffer_fits_a4_page(self):
+        # An A4 page at 200 DPI has 1653 x 2339 RGB pixels
+        assert get_buffer_size() >= 1653 * 2339 * 3
+
+    def test_missing_pypdfium2_raises_import_error(self, mocker):
+        mocker.patch("document_processor.pipeline.render_pool.importlib.util.find_spec", return_value=None)
+        with pytest.raises(ImportError):
+            PooledPdfToImageConverter(workers=1)
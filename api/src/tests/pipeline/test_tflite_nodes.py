@@ -0,0 +1,152 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from document_processor.pipeline.tflite_nodes import (
+    TFLiteEffDetDocumentClassifierNode,
+    TFLiteEffNetDocumentClassifierNode,
+)
+
+TEST_FILES = "/app/api/src/tests/files"
+MODELS_DIRECTORY = "/app/models"
+
+
+@pytest.fixture
+def interpreter_mock(mocker):
+    interpreter = mocker.patch("document_processor.pipeline.tflite_nodes.tf.lite.Interpreter")
+    interpreter.return_value.get_signature_list.return_value = {
+        "serving_default": {"inputs": ["input_tensor"], "outputs": ["detection_classes", "detection_scores"]}
+    }
+    return interpreter
+
+
+@pytest.fixture
+def mock_image():
+    return Image.new('RGB', (60, 30))
+
+
+class TestTFLiteEffNetDocumentClassifierNode:
+    @pytest.fixture
+    def node(self, interpreter_mock):
+        interpreter_mock.return_value.get_signature_list.return_value = {
+            "serving_default": {"inputs": ["input_1"], "outputs": ["dense"]}
+        }
+        return TFLiteEffNetDocumentClassifierNode("model.tflite", 0.5, num_threads=2)
+
+    def test_load_model_maps_file(self, node, interpreter_mock):
+        kwargs = interpreter_mock.call_args.kwargs
+        assert kwargs["model_path"] == "model.tflite"
+        assert kwargs["num_threads"] == 2
+
+    def test_load_model_applies_default_delegates_only_with_xnnpack(self, interpreter_mock):
+        from document_processor.pipeline.tflite_nodes import tf
+
+        TFLiteEffNetDocumentClassifierNode("model.tflite", 0.5)
+        assert interpreter_mock.call_args.kwargs["experimental_op_resolver_type"] == (
+            tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        )
+        TFLiteEffNetDocumentClassifierNode("model.tflite", 0.5, xnnpack=True)
+        assert interpreter_mock.call_args.kwargs["experimental_op_resolver_type"] == (
+            tf.lite.experimental.OpResolverType.AUTO
+        )
+
+    def test_classify_images_runs_model_once(self, node, mock_image):
+        node.runner.return_value = {"dense": np.asarray([[0.1, 0.1, 0.8], [0.7, 0.2, 0.1]], dtype=np.float32)}
+        results = node.classify_images([mock_image, mock_image])
+        node.runner.assert_called_once()
+        batch = node.runner.call_args.kwargs["input_1"]
+        assert batch.shape == (2, 224, 224, 3) and batch.dtype == np.float32
+        assert [result[0] for result in results] == ["passport", "driving_license"]
+
+    def test_get_footprint_reports_mapped_file(self, node, tmp_path):
+        node.model_path = str(tmp_path / "model.tflite")
+        (tmp_path / "model.tflite").write_bytes(b"\0" * 2 ** 21)
+        assert node.get_footprint() == {
+            "node": "TFLiteEffNetDocumentClassifierNode",
+            "path": os.path.realpath(node.model_path),
+            "weights_mb": 2.0,
+            "memory_mapped": True,
+            "heap_weights_mb": 0.0,
+        }
+
+    def test_get_footprint_reports_expanded_weights(self, interpreter_mock, tmp_path):
+        interpreter_mock.return_value.get_signature_list.return_value = {
+            "serving_default": {"inputs": ["input_1"], "outputs": ["dense"]}
+        }
+        interpreter_mock.return_value.get_tensor_details.return_value = [
+            {"index": 0, "shape": np.asarray([1024, 512]), "dtype": np.float16},
+            {"index": 1, "shape": np.asarray([1024, 512]), "dtype": np.float32},
+            {"index": 2, "shape": np.asarray([1, 512]), "dtype": np.float32},
+        ]
+        interpreter_mock.return_value._get_ops_details.return_value = [
+            {"op_name": "DEQUANTIZE", "inputs": np.asarray([0]), "outputs": np.asarray([1])},
+            {"op_name": "FULLY_CONNECTED", "inputs": np.asarray([1]), "outputs": np.asarray([2])},
+        ]
+        (tmp_path / "model.tflite").write_bytes(b"\0" * 2 ** 20)
+        node = TFLiteEffNetDocumentClassifierNode(str(tmp_path / "model.tflite"), 0.5)
+        footprint = node.get_footprint()
+        assert footprint["weights_mb"] == 1.0
+        assert footprint["heap_weights_mb"] == 2.0
+
+
+class TestTFLiteEffDetDocumentClassifierNode:
+    @pytest.fixture
+    def node(self, interpreter_mock):
+        return TFLiteEffDetDocumentClassifierNode("model.tflite", 0.5)
+
+    @pytest.fixture
+    def outputs(self):
+        return {
+            "detection_scores": np.asarray([[0.9, 0.2]], dtype=np.float32),
+            "detection_classes": np.asarray([[3., 1.]], dtype=np.float32),
+        }
+
+    def test_get_detections_passes_image(self, node, mock_image, outputs):
+        node.runner.return_value = outputs
+        detections = node.get_detections(mock_image)
+        assert node.runner.call_args.kwargs["input_tensor"].shape == (1, 30, 60, 3)
+        assert set(detections) == {"detection_scores", "detection_classes"}
+
+    def test_classify_image(self, node, mock_image, outputs):
+        node.runner.return_value = outputs
+        assert node.classify_image(mock_image) == ("passport", [("passport", 0.9)])
+
+    def test_get_batch_detections_falls_back_to_single_images(self, node, mock_image, outputs):
+        node.runner.side_effect = [ValueError("Cannot set tensor: Dimension mismatch"), outputs, outputs]
+        detections = node.get_batch_detections([mock_image, mock_image])
+        assert detections["detection_scores"].shape == (2, 2)
+        assert not node.supports_batches
+
+
+def tflite_and_tf_nodes(model):
+    from document_processor.pipeline.builder import get_pipeline_builder
+
+    _, tf_model_path = get_pipeline_builder(model, MODELS_DIRECTORY)
+    _, tflite_model_path = get_pipeline_builder(f"{model}_TFLITE", MODELS_DIRECTORY)
+    if not os.path.exists(tf_model_path) or not os.path.exists(tflite_model_path):
+        pytest.skip(f"needs the {model} model and its TensorFlow Lite export")
+    if model == "EFFICIENTNET":
+        from document_processor.pipeline.pipeline_nodes import EffNetDocumentClassifierNode
+        return (
+            EffNetDocumentClassifierNode(tf_model_path, 0.5),
+            TFLiteEffNetDocumentClassifierNode(tflite_model_path, 0.5),
+        )
+    from document_processor.pipeline.pipeline_nodes import EffDetDocumentClassifierNode
+    return EffDetDocumentClassifierNode(tf_model_path, 0.5), TFLiteEffDetDocumentClassifierNode(tflite_model_path, 0.5)
+
+
+@pytest.mark.parametrize("model", ["EFFICIENTNET", "EFFICIENTDET"])
+class TestTFLiteParity:
+    def test_tflite_matches_tensorflow(self, model):
+        from document_processor.pipeline.pdf_to_image_converter import PdfToJpgConverter
+
+        tf_node, tflite_node = tflite_and_tf_nodes(model)
+        for path in sorted(glob.glob(f"{TEST_FILES}/*.pdf")):
+            with open(path, "rb") as f:
+                image = Image.open(PdfToJpgConverter().convert(f.read())).convert("RGB")
+            tf_class, _ = tf_node.classify_image(image)
+            tflite_class, _ = tflite_node.classify_image(image)
+            assert tflite_class == tf_class
@@ -0,0 +1,123 @@
+import pytest
+
+from document_processor.admission import (
+    AdaptiveConcurrencyLimiter,
+    OverloadedError,
+    RateLimitedError,
+    RateLimiter,
+    TokenBucket,
+    parse_quotas,
+)
+
+
+class TestAdaptiveConcurrencyLimiter:
+    @pytest.fixture
+    def limiter(self):
+        return AdaptiveConcurrencyLimiter(max_concurrency=4)
+
+    def test_acquire_until_limit(self, limiter):
+        for _ in range(4):
+            limiter.acquire()
+        with pytest.raises(OverloadedError):
+            limiter.acquire()
+
+    def test_overloaded_error_has_retry_after(self, limiter):
+        limiter.limit = 0
+        with pytest.raises(OverloadedError) as e:
+            limiter.acquire()
+        assert e.value.retry_after >= 1
+
+    def test_priority_uses_headroom(self, limiter):
+        limiter.limit = 1
+        limiter.acquire()
+        limiter.acquire(priority=True)
+        assert limiter.in_flight == 2
+
+    def test_slot_releases_on_exit(self, limiter):
+        with limiter.slot():
+            assert limiter.in_flight == 1
+        assert limiter.in_flight == 0
+
+    def test_slot_releases_on_error(self, limiter):
+        with pytest.raises(ValueError):
+            with limiter.slot():
+                raise ValueError("Broken PDF")
+        assert limiter.in_flight == 0
+
+    def test_limit_shrinks_when_latency_rises(self, limiter):
+        limiter.update_limit(0.1)
+        for _ in range(20):
+            limiter.update_limit(1.0)
+        assert limiter.limit < 4
+
+    def test_limit_stays_within_bounds(self, limiter):
+        limiter.update_limit(0.1)
+        for _ in range(100):
+            limiter.update_limit(10.0)
+        assert limiter.limit >= limiter.min_concurrency
+        for _ in range(100):
+            limiter.update_limit(0.1)
+        assert limiter.limit <= limiter.max_concurrency
+
+    def test_limit_stays_low_under_sustained_overload(self, limiter):
+        limiter.update_limit(0.1)
+        for _ in range(1000):
+            limiter.update_limit(1.0)
+        assert limiter.min_latency == 0.1
+        assert limiter.limit == limiter.min_concurrency
+
+    def test_min_latency_follows_slower_model_after_two_windows(self):
+        now = [0.0]
+        limiter = AdaptiveConcurrencyLimiter(max_concurrency=4, baseline_window=60.0, clock=lambda: now[0])
+        limiter.update_limit(0.1)
+        for now[0] in (60.0, 90.0):
+            limiter.update_limit(0.5)
+        assert limiter.min_latency == 0.1
+        now[0] = 120.0
+        limiter.update_limit(0.5)
+        assert limiter.min_latency == 0.5
+
+
+class TestTokenBucket:
+    def test_take_allows_burst(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        assert bucket.take() == 0
+        assert bucket.take() == 0
+        assert bucket.take() > 0
+
+
+class TestRateLimiter:
+    def test_check_raises_after_quota(self):
+        limiter = RateLimiter({"key": (1, 1)})
+        limiter.check("key")
+        with pytest.raises(RateLimitedError):
+            limiter.check("key")
+
+    def test_clients_have_separate_buckets(self):
+        limiter = RateLimiter({}, default_rate=1)
+        limiter.check("a")
+        limiter.check("b")
+
+    def test_evicts_least_recently_seen_clients(self):
+        limiter = RateLimiter({"partner": (1.0, 1.0)}, default_rate=1.0, max_clients=2)
+        limiter.check("partner")
+        limiter.check("a")
+        limiter.check("b")
+        limiter.get_bucket("a")
+        limiter.check("c")
+        assert list(limiter._default_buckets) == ["a", "c"]
+        with pytest.raises(RateLimitedError):
+            limiter.check("partner")
+
+    def test_unlimited_by_default(self):
+        limiter = RateLimiter({})
+        for _ in range(100):
+            limiter.check("a")
+
+
+class TestParseQuotas:
+    def test_parse_quotas(self):
+        assert parse_quotas("key1:10, key2:50:100") == {"key1": (10.0, None), "key2": (50.0, 100.0)}
+
+    def test_parse_empty_quotas(self):
+        assert parse_quotas("") == {}
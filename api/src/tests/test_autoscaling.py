@@ -0,0 +1,80 @@
+import pytest
+
+from document_processor.autoscaling import LoadTracker, queue_depth
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLoadTracker:
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def tracker(self, clock):
+        return LoadTracker(clock)
+
+    def process(self, tracker, clock, seconds, documents=1):
+        with tracker.processing_slot(documents):
+            clock.now += seconds
+
+    def test_report_without_history(self, tracker, clock):
+        clock.now += 10
+        report = tracker.report()
+        assert report["queue_depth"] == 0
+        assert report["throughput"] == 0
+        assert report["capacity"] is None
+        assert report["time_to_drain_seconds"] is None
+
+    def test_capacity_from_latency(self, tracker, clock):
+        for _ in range(10):
+            self.process(tracker, clock, 0.5)
+        report = tracker.report(window=5)
+        assert report["seconds_per_document"] == 0.5
+        assert report["capacity"] == 2.0
+        assert report["throughput"] == 2.0
+        assert report["utilization"] == 1.0
+
+    def test_batch_documents_share_latency(self, tracker, clock):
+        self.process(tracker, clock, 2.0, documents=8)
+        assert tracker.report()["capacity"] == 4.0
+
+    def test_concurrency_limit_sets_parallelism(self, tracker, clock):
+        self.process(tracker, clock, 0.5)
+        assert tracker.report(concurrency_limit=4)["capacity"] == 8.0
+
+    def test_peak_concurrency_sets_parallelism(self, tracker, clock):
+        with tracker.processing_slot(), tracker.processing_slot():
+            clock.now += 1.0
+        report = tracker.report()
+        assert report["parallelism"] == 2
+        assert report["capacity"] == 2.0
+
+    def test_waiting_requests_and_jobs_count_towards_queue_depth(self, tracker, clock):
+        self.process(tracker, clock, 1.0)
+        with tracker.request(), tracker.request(), tracker.processing_slot(request=True):
+            report = tracker.report(pending_jobs=3)
+        assert report["waiting"] == 4
+        assert report["processing"] == 1
+        assert report["queue_depth"] == 5
+        assert report["time_to_drain_seconds"] == 5.0
+        assert queue_depth.value() == 5
+
+    def test_arrival_rate(self, tracker, clock):
+        for _ in range(6):
+            tracker.arrive()
+        clock.now += 3
+        assert tracker.report(window=60)["arrival_rate"] == 2.0
+
+    def test_old_history_leaves_window(self, tracker, clock):
+        self.process(tracker, clock, 1.0)
+        clock.now += 120
+        report = tracker.report(window=60)
+        assert report["throughput"] == 0
+        assert report["capacity"] is None
@@ -0,0 +1,31 @@
+import pytest
+
+from document_processor.benchmark import benchmark, format_report, summarize
+
+
+class TestBenchmark:
+    def test_summarize(self):
+        summary = summarize([0.1, 0.2, 0.3])
+        assert summary["mean_ms"] == pytest.approx(200)
+        assert summary["p50_ms"] == pytest.approx(200)
+        assert summary["documents_per_second"] == pytest.approx(5)
+
+    def test_benchmark_measures_every_document(self, mocker):
+        processor = mocker.Mock()
+        processor.process_document.return_value = {"document_type": "passport"}
+        summary, document_types = benchmark(processor, [b"a", b"b"], repeat=3, warm_up=1)
+        assert processor.process_document.call_count == 8
+        assert document_types == ["passport", "passport"]
+        assert summary["mean_ms"] >= 0
+
+    def test_format_report_shows_delta_and_agreement(self):
+        report = format_report({
+            "FLOAT32": ({"mean_ms": 100.0, "p50_ms": 100.0, "p95_ms": 120.0, "documents_per_second": 10.0},
+                        ["passport", "id_card"]),
+            "MIXED_BFLOAT16": ({"mean_ms": 50.0, "p50_ms": 50.0, "p95_ms": 60.0, "documents_per_second": 20.0},
+                               ["passport", "passport"]),
+        })
+        lines = report.splitlines()
+        assert len(lines) == 3
+        assert "+0.0%" in lines[1] and "100%" in lines[1]
+        assert "-50.0%" in lines[2] and "50%" in lines[2]
@@ -0,0 +1,157 @@
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from document_processor.bulk_classifier import (
+    CsvResultWriter,
+    JsonlResultWriter,
+    ParquetResultWriter,
+    classify_documents,
+    get_result_writer,
+    iter_documents,
+    main,
+    to_row,
+)
+from document_processor.document_processor import PDFDocumentProcessor
+
+
+@pytest.fixture
+def pdf_directory(tmp_path):
+    directory = tmp_path / "pdfs"
+    (directory / "nested").mkdir(parents=True)
+    (directory / "a.pdf").write_bytes(b"a")
+    (directory / "nested" / "b.PDF").write_bytes(b"b")
+    (directory / "notes.txt").write_bytes(b"not a pdf")
+    return directory
+
+
+class TestIterDocuments:
+    def test_directory_yields_pdfs_recursively(self, pdf_directory):
+        documents = {key: read() for key, read in iter_documents(str(pdf_directory))}
+        assert sorted(documents.values()) == [b"a", b"b"]
+
+    def test_glob_yields_matching_files(self, pdf_directory):
+        documents = [read() for _, read in iter_documents(str(pdf_directory / "*.pdf"))]
+        assert documents == [b"a"]
+
+    def test_zip_yields_pdfs(self, tmp_path):
+        archive = tmp_path / "pdfs.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("a.pdf", b"a")
+            zip_file.writestr("notes.txt", b"not a pdf")
+        documents = [(key, read()) for key, read in iter_documents(str(archive))]
+        assert documents == [(f"{archive}::a.pdf", b"a")]
+
+    def test_tar_yields_pdfs(self, tmp_path, pdf_directory):
+        archive = tmp_path / "pdfs.tar.gz"
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(pdf_directory / "a.pdf", arcname="a.pdf")
+        documents = [(key, read()) for key, read in iter_documents(str(archive))]
+        assert documents == [(f"{archive}::a.pdf", b"a")]
+
+
+class TestResultWriters:
+    @pytest.fixture
+    def rows(self):
+        return [to_row("a.pdf", {"document_type": "passport", "prediction_confidences": [("passport", 0.9)]})]
+
+    @pytest.mark.parametrize("writer_class, extension", [(CsvResultWriter, "csv"), (JsonlResultWriter, "jsonl")])
+    def test_processed_keys_after_write(self, tmp_path, rows, writer_class, extension):
+        writer = writer_class(str(tmp_path / f"results.{extension}"))
+        assert writer.processed_keys() == set()
+        writer.write(rows)
+        writer.write([to_row("b.pdf", {})])
+        assert writer.processed_keys() == {"a.pdf", "b.pdf"}
+
+    def test_jsonl_ignores_incomplete_last_line(self, tmp_path, rows):
+        output = tmp_path / "results.jsonl"
+        writer = JsonlResultWriter(str(output))
+        writer.write(rows)
+        with open(output, "a") as f:
+            f.write('{"key": "b.p')
+        assert writer.processed_keys() == {"a.pdf"}
+
+    def test_get_result_writer_from_extension(self, tmp_path):
+        assert isinstance(get_result_writer(str(tmp_path / "results.jsonl")), JsonlResultWriter)
+
+    def test_get_result_writer_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            get_result_writer(str(tmp_path / "results.xlsx"))
+
+    def test_parquet_without_engine_raises_import_error(self, tmp_path, mocker):
+        mocker.patch("document_processor.bulk_classifier.importlib.util.find_spec", return_value=None)
+        with pytest.raises(ImportError, match="pyarrow"):
+            ParquetResultWriter(str(tmp_path / "results.parquet"))
+        assert not (tmp_path / "results.parquet").exists()
+
+    def test_main_fails_before_loading_the_model_without_parquet_engine(self, tmp_path, mocker):
+        mocker.patch("document_processor.bulk_classifier.importlib.util.find_spec", return_value=None)
+        get_pipeline_builder = mocker.patch("document_processor.bulk_classifier.get_pipeline_builder")
+        with pytest.raises(ImportError):
+            main([str(tmp_path), str(tmp_path / "results.parquet")])
+        get_pipeline_builder.assert_not_called()
+
+
+class TestToRow:
+    def test_unknown_document_type(self):
+        assert to_row("a.pdf", {"document_type": None})["document_type"] == "unknown"
+
+    def test_error(self):
+        row = to_row("a.pdf", {"error": ValueError("Broken PDF")})
+        assert row["document_type"] == "error"
+        assert row["error"] == "ValueError: Broken PDF"
+
+    def test_prediction_confidences_are_json(self):
+        row = to_row("a.pdf", {"document_type": "passport", "prediction_confidences": [("passport", 0.9)]})
+        assert json.loads(row["prediction_confidences"]) == [["passport", 0.9]]
+
+
+class TestClassifyDocuments:
+    @pytest.fixture
+    def processor(self, mocker):
+        processor = mocker.Mock(spec=PDFDocumentProcessor)
+        processor.process_documents.side_effect = lambda documents: [
+            {"document_type": "passport"} for _ in documents
+        ]
+        return processor
+
+    @pytest.fixture
+    def documents(self):
+        return [(f"{i}.pdf", lambda i=i: str(i).encode()) for i in range(5)]
+
+    def test_processes_in_batches(self, tmp_path, processor, documents):
+        writer = CsvResultWriter(str(tmp_path / "results.csv"))
+        processed = classify_documents(processor, documents, writer, batch_size=2)
+        assert processed == 5
+        assert processor.process_documents.call_count == 3
+
+    def test_resume_skips_processed_documents(self, tmp_path, processor, documents):
+        writer = CsvResultWriter(str(tmp_path / "results.csv"))
+        classify_documents(processor, documents[:3], writer, batch_size=2)
+        processor.process_documents.reset_mock()
+
+        processed = classify_documents(processor, documents, writer, batch_size=2)
+
+        assert processed == 2
+        processor.process_documents.assert_called_once_with([b"3", b"4"])
+
+    def test_zip_with_fewer_documents_than_batch_size(self, tmp_path, processor):
+        archive = tmp_path / "pdfs.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("a.pdf", b"a")
+            zip_file.writestr("b.pdf", b"b")
+        writer = CsvResultWriter(str(tmp_path / "results.csv"))
+        processed = classify_documents(processor, iter_documents(str(archive)), writer, batch_size=16)
+        assert processed == 2
+        processor.process_documents.assert_called_once_with([b"a", b"b"])
+
+    def test_unreadable_document_is_written_as_error(self, tmp_path, processor):
+        def read():
+            raise OSError("Permission denied")
+
+        writer = JsonlResultWriter(str(tmp_path / "results.jsonl"))
+        classify_documents(processor, [("a.pdf", read)], writer)
+        with open(tmp_path / "results.jsonl") as f:
+            assert json.loads(f.readline())["document_type"] == "error"
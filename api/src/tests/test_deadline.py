@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from document_processor.deadline import Deadline, DeadlineExceededError, check_deadline
+
+
+class TestDeadline:
+    def test_no_timeout_never_expires(self):
+        deadline = Deadline()
+        assert deadline.remaining() is None
+        assert not deadline.expired
+        deadline.check()
+
+    def test_remaining_counts_down(self):
+        deadline = Deadline(10)
+        assert 0 < deadline.remaining() <= 10
+
+    def test_check_raises_after_timeout(self):
+        deadline = Deadline(0.01)
+        time.sleep(0.02)
+        assert deadline.expired
+        with pytest.raises(DeadlineExceededError, match="deadline exceeded"):
+            deadline.check()
+
+    def test_check_raises_after_cancel(self):
+        deadline = Deadline()
+        deadline.cancel()
+        assert deadline.remaining() == 0.0
+        with pytest.raises(DeadlineExceededError, match="cancelled"):
+            deadline.check()
+
+    def test_deadline_exceeded_error_is_timeout_error(self):
+        assert issubclass(DeadlineExceededError, TimeoutError)
+
+
+class TestCheckDeadline:
+    def test_check_deadline_without_deadline(self):
+        check_deadline({"pdf_bytes": b"pdf"})
+
+    def test_check_deadline_raises_for_passed_deadline(self):
+        deadline = Deadline()
+        deadline.cancel()
+        with pytest.raises(DeadlineExceededError):
+            check_deadline({"deadline": deadline})
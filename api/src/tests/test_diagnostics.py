@@ -0,0 +1,134 @@
+import tracemalloc
+
+import pytest
+
+from document_processor.diagnostics import (
+    MemoryDiagnostics,
+    all_subclasses,
+    count_open_files,
+    get_method_lines,
+    get_model_footprint,
+    get_temp_directory_usage,
+    read_mapped_files,
+    read_proc_status,
+)
+from document_processor.pipeline.pipeline_nodes import DocumentProcessingNode
+
+
+class LeakyNode(DocumentProcessingNode):
+    leaked = []
+
+    def process_document(self, data: dict):
+        self.leaked.append(bytearray(2 ** 20))
+        return data
+
+
+@pytest.fixture
+def smaps(tmp_path):
+    smaps = tmp_path / "smaps"
+    smaps.write_text(
+        "7f0000000000-7f0000400000 r--s 00000000 08:01 1234                       /models/model.tflite\n"
+        "Size:               4096 kB\nRss:                4096 kB\nPss:                2048 kB\n"
+        "Shared_Clean:       4096 kB\nShared_Dirty:          0 kB\nVmFlags: rd sh mr mw me ms sd\n"
+        "7f0000400000-7f0000600000 r--s 00400000 08:01 1234                       /models/model.tflite\n"
+        "Rss:                2048 kB\nPss:                1024 kB\nShared_Clean:       2048 kB\n"
+        "7f0000600000-7f0000800000 rw-p 00000000 00:00 0\n"
+        "Rss:                2048 kB\nPss:                2048 kB\n"
+    )
+    return str(smaps)
+
+
+class TestHelpers:
+    def test_all_subclasses(self):
+        assert LeakyNode in all_subclasses(DocumentProcessingNode)
+
+    def test_get_method_lines(self):
+        method_lines = get_method_lines([LeakyNode])
+        ((first_line, last_line, class_name),) = method_lines[__file__]
+        assert class_name == "LeakyNode"
+        assert last_line - first_line == 2
+
+    def test_read_proc_status(self, tmp_path):
+        status = tmp_path / "status"
+        status.write_text("Name:\tpython\nVmHWM:\t  204800 kB\nVmRSS:\t  102400 kB\n")
+        assert read_proc_status(str(status)) == {"rss_mb": 100.0, "peak_rss_mb": 200.0}
+
+    def test_read_proc_status_without_proc(self, tmp_path):
+        assert read_proc_status(str(tmp_path / "missing")) == {}
+
+    def test_read_mapped_files(self, smaps):
+        assert read_mapped_files(smaps) == {
+            "/models/model.tflite": {"rss_mb": 6.0, "pss_mb": 3.0, "shared_mb": 6.0},
+        }
+
+    def test_get_model_footprint(self, smaps):
+        footprints = {
+            "EFFICIENTNET_TFLITE": [
+                {"node": "TFLiteEffNetDocumentClassifierNode", "path": "/models/model.tflite",
+                 "weights_mb": 8.0, "memory_mapped": True, "heap_weights_mb": 0.0},
+            ],
+            "EFFICIENTDET": [
+                {"node": "EffDetDocumentClassifierNode", "path": "/models/effdet", "weights_mb": 15.5,
+                 "memory_mapped": False},
+            ],
+        }
+        footprint = get_model_footprint(footprints, smaps)
+        assert footprint["models"]["EFFICIENTNET_TFLITE"][0]["resident_mb"] == 3.0
+        assert footprint["models"]["EFFICIENTDET"][0]["resident_mb"] == 15.5
+        assert footprint["resident_mb"] == 18.5
+
+    def test_get_model_footprint_counts_expanded_weights(self, smaps):
+        footprints = {
+            "EFFICIENTNET_TFLITE": [
+                {"node": "TFLiteEffNetDocumentClassifierNode", "path": "/models/model.tflite",
+                 "weights_mb": 8.0, "memory_mapped": True, "heap_weights_mb": 16.0},
+            ],
+        }
+        footprint = get_model_footprint(footprints, smaps)
+        assert footprint["models"]["EFFICIENTNET_TFLITE"][0]["resident_mb"] == 19.0
+        assert footprint["resident_mb"] == 19.0
+
+    def test_count_open_files_counts_temp_files(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+        before = count_open_files()
+        with open(tmp_path / "page.ppm", "wb"):
+            assert count_open_files()["temp_file"] == before["temp_file"] + 1
+
+    def test_get_temp_directory_usage(self, tmp_path):
+        (tmp_path / "page.ppm").write_bytes(b"\0" * 2 ** 20)
+        assert get_temp_directory_usage(str(tmp_path)) == {"directory": str(tmp_path), "files": 1, "size_mb": 1.0}
+
+
+class TestMemoryDiagnostics:
+    @pytest.fixture
+    def diagnostics(self):
+        diagnostics = MemoryDiagnostics()
+        yield diagnostics
+        if tracemalloc.is_tracing():
+            diagnostics.stop_tracing()
+
+    def test_report_without_tracing(self, mocker, diagnostics):
+        mocker.patch("document_processor.diagnostics.get_tf_allocator_stats", return_value={})
+        report = diagnostics.report()
+        assert report["tracemalloc"] == {"tracing": False}
+        assert report["process"]["threads"] >= 1
+
+    def test_growth_is_attributed_to_node(self, mocker, diagnostics):
+        mocker.patch("document_processor.diagnostics.get_tf_allocator_stats", return_value={})
+        diagnostics.start_tracing(frames=5)
+        node = LeakyNode()
+        for _ in range(3):
+            node.process_document({})
+        report = diagnostics.report(top=1)
+        LeakyNode.leaked.clear()
+
+        growth = report["tracemalloc"]["growth_by_node"]
+        assert growth[0]["node"] == "LeakyNode"
+        assert growth[0]["size_diff_kb"] >= 3 * 1024
+        assert len(growth[0]["top_sites"]) == 1
+
+    def test_stop_tracing(self, diagnostics):
+        diagnostics.start_tracing()
+        diagnostics.stop_tracing()
+        assert not diagnostics.tracing
+        assert diagnostics.get_growth_by_node() == []
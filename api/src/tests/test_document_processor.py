@@ -53,3 +53,10 @@ class TestNeuralNetworkDocumentProcessor:
         assert pipeline.process_document.call_args == mocker.call(
             {"pdf_bytes": document}
         )
+
+    def test_process_documents_calls_pipeline_with_batch(self, processor_and_pipeline, mocker):
+        processor, pipeline, document = processor_and_pipeline
+        processor.process_documents([document, document])
+        assert pipeline.process_documents.call_args == mocker.call(
+            [{"pdf_bytes": document}, {"pdf_bytes": document}]
+        )
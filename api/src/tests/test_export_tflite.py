@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from document_processor.export_tflite import configure_converter, parse_args, prune_weights
+
+
+class Layer:
+    def __init__(self, *weights):
+        self.weights = [np.asarray(weight, dtype=np.float32) for weight in weights]
+
+    def get_weights(self):
+        return [weight.copy() for weight in self.weights]
+
+    def set_weights(self, weights):
+        self.weights = weights
+
+
+class TestPruneWeights:
+    def test_prunes_smallest_kernel_weights(self, mocker):
+        kernel = Layer([[0.1, -0.9], [0.5, -0.05]], [0.01, 0.02])
+        model = mocker.Mock(layers=[kernel, Layer()])
+        assert prune_weights(model, 0.5) == 0.5
+        np.testing.assert_array_equal(kernel.weights[0], np.asarray([[0, -0.9], [0.5, 0]], dtype=np.float32))
+        # Biases are kept
+        np.testing.assert_array_equal(kernel.weights[1], np.asarray([0.01, 0.02], dtype=np.float32))
+
+    def test_invalid_sparsity(self, mocker):
+        with pytest.raises(ValueError):
+            prune_weights(mocker.Mock(layers=[]), 1.0)
+
+
+class TestConfigureConverter:
+    def test_invalid_quantization(self, mocker):
+        with pytest.raises(ValueError):
+            configure_converter(mocker.Mock(), "INT4")
+
+    def test_no_optimizations_by_default(self, mocker):
+        converter = mocker.Mock()
+        configure_converter(converter)
+        assert converter.optimizations == []
+
+    def test_parse_args(self):
+        args = parse_args(["EFFICIENTNET", "--quantization", "DYNAMIC", "--sparsity", "0.3"])
+        assert (args.model, args.quantization, args.sparsity) == ("EFFICIENTNET", "DYNAMIC", 0.3)
@@ -0,0 +1,190 @@
+import glob
+import os
+
+import pytest
+
+from document_processor import inference_config
+from document_processor.inference_config import (
+    FLOAT32,
+    MIXED_BFLOAT16,
+    configure_inference,
+    cpu_flags,
+    cpu_supports_bfloat16,
+    get_bfloat16_rewrite_option,
+    get_optimizer_options,
+)
+
+TEST_FILES = "/app/api/src/tests/files"
+MODELS_DIRECTORY = "/app/models"
+
+
+@pytest.fixture
+def tf_version(mocker):
+    def set_version(version):
+        mocker.patch.object(inference_config.tf, "__version__", version, create=True)
+    set_version("2.9.3")
+    return set_version
+
+
+@pytest.fixture
+def cpuinfo(tmp_path):
+    def write(flags):
+        path = tmp_path / "cpuinfo"
+        path.write_text(f"processor\t: 0\nflags\t\t: {flags}\n")
+        return str(path)
+    return write
+
+
+class TestCpuFlags:
+    def test_cpu_flags(self, cpuinfo):
+        assert cpu_flags(cpuinfo("fpu sse avx2")) == {"fpu", "sse", "avx2"}
+
+    def test_cpu_flags_missing_file(self, tmp_path):
+        assert cpu_flags(str(tmp_path / "missing")) == set()
+
+    def test_cpu_supports_bfloat16(self, cpuinfo):
+        assert cpu_supports_bfloat16(cpuinfo("avx512f avx512_bf16"))
+        assert not cpu_supports_bfloat16(cpuinfo("avx512f avx2"))
+
+
+class TestOptimizerOptions:
+    def test_bfloat16_rewrite_option_of_tensorflow_version(self, tf_version):
+        assert get_bfloat16_rewrite_option() == "auto_mixed_precision_mkl"
+        tf_version("2.11.0")
+        assert get_bfloat16_rewrite_option() == "auto_mixed_precision_onednn_bfloat16"
+
+    def test_invalid_precision(self, tf_version):
+        with pytest.raises(ValueError):
+            get_optimizer_options("FLOAT16")
+
+
+class TestConfigureInference:
+    @pytest.fixture
+    def set_options(self, mocker, tf_version):
+        return mocker.patch.object(inference_config.tf.config.optimizer, "set_experimental_options")
+
+    @pytest.fixture
+    def get_options(self, mocker, tf_version):
+        return mocker.patch.object(
+            inference_config.tf.config.optimizer, "get_experimental_options",
+            return_value={"auto_mixed_precision_mkl": True},
+        )
+
+    def test_configure_float32(self, set_options):
+        assert configure_inference(FLOAT32) == FLOAT32
+        set_options.assert_called_once_with(get_optimizer_options(FLOAT32))
+
+    def test_configure_mixed_bfloat16_falls_back_without_cpu_support(self, mocker, set_options):
+        mocker.patch.object(inference_config, "cpu_supports_bfloat16", return_value=False)
+        assert configure_inference(MIXED_BFLOAT16) == FLOAT32
+        set_options.assert_called_once_with(get_optimizer_options(FLOAT32))
+
+    def test_configure_mixed_bfloat16_falls_back_without_onednn(self, mocker, monkeypatch, set_options):
+        mocker.patch.object(inference_config, "cpu_supports_bfloat16", return_value=True)
+        monkeypatch.setenv("TF_ENABLE_ONEDNN_OPTS", "0")
+        assert configure_inference(MIXED_BFLOAT16) == FLOAT32
+
+    def test_configure_mixed_bfloat16(self, mocker, monkeypatch, set_options, get_options):
+        mocker.patch.object(inference_config, "cpu_supports_bfloat16", return_value=True)
+        monkeypatch.delenv("TF_ENABLE_ONEDNN_OPTS", raising=False)
+        assert configure_inference(MIXED_BFLOAT16) == MIXED_BFLOAT16
+        assert set_options.call_args.args[0]["auto_mixed_precision_mkl"]
+
+    def test_configure_mixed_bfloat16_falls_back_if_tensorflow_ignores_option(
+        self, mocker, monkeypatch, set_options, get_options
+    ):
+        mocker.patch.object(inference_config, "cpu_supports_bfloat16", return_value=True)
+        monkeypatch.delenv("TF_ENABLE_ONEDNN_OPTS", raising=False)
+        get_options.return_value = {"constant_folding": True}
+        assert configure_inference(MIXED_BFLOAT16) == FLOAT32
+        set_options.assert_called_with(get_optimizer_options(FLOAT32))
+
+
+def optimize_graph(tf, fn, input_spec):
+    """
+    Runs grappler with the options set by configure_inference on the graph of a traced function.
+    """
+    from tensorflow.python.eager import context
+    from tensorflow.python.grappler import tf_optimizer
+
+    concrete_function = tf.function(fn).get_concrete_function(input_spec)
+    meta_graph = tf.compat.v1.train.export_meta_graph(graph=concrete_function.graph)
+    fetches = meta_graph.collection_def["train_op"].node_list
+    for output in concrete_function.outputs:
+        fetches.value.append(output.name)
+    config = context.context().config
+    # Small graphs are not optimized by default
+    config.graph_options.rewrite_options.min_graph_nodes = -1
+    return tf_optimizer.OptimizeGraph(config, meta_graph)
+
+
+class TestBfloat16Rewrite:
+    @pytest.fixture
+    def tf(self):
+        pytest.importorskip("tensorflow.python.grappler.tf_optimizer")
+        import tensorflow as tf
+        yield tf
+        configure_inference(FLOAT32)
+
+    @staticmethod
+    def count_bfloat16_casts(tf, precision, mocker):
+        mocker.patch.object(inference_config, "cpu_supports_bfloat16", return_value=True)
+        assert configure_inference(precision) == precision
+        weights = tf.random.normal((64, 64))
+
+        def dense_layers(x):
+            return tf.nn.softmax(tf.matmul(tf.nn.relu(tf.matmul(x, weights)), weights))
+
+        graph = optimize_graph(tf, dense_layers, tf.TensorSpec((8, 64), tf.float32))
+        return sum(
+            node.op == "Cast" and node.attr["DstT"].type == tf.bfloat16.as_datatype_enum for node in graph.node
+        )
+
+    @pytest.mark.skipif(not inference_config.onednn_enabled(), reason="needs TF_ENABLE_ONEDNN_OPTS=1")
+    def test_mixed_bfloat16_rewrites_graph_to_bfloat16(self, tf, mocker):
+        assert self.count_bfloat16_casts(tf, MIXED_BFLOAT16, mocker) > 0
+
+    def test_float32_keeps_graph_in_float32(self, tf, mocker):
+        assert self.count_bfloat16_casts(tf, FLOAT32, mocker) == 0
+
+
+@pytest.mark.skipif(not cpu_supports_bfloat16(), reason="needs a CPU with bfloat16 support")
+@pytest.mark.parametrize("model", ["EFFICIENTNET", "EFFICIENTDET"])
+class TestMixedBfloat16Parity:
+    @pytest.fixture
+    def model_directory(self, model):
+        from document_processor.pipeline.builder import get_pipeline_builder
+
+        _, model_directory = get_pipeline_builder(model, MODELS_DIRECTORY)
+        if not os.path.isdir(model_directory):
+            pytest.skip(f"needs the {model} model")
+        return model_directory
+
+    @staticmethod
+    def classify_test_files(model, precision):
+        from document_processor.document_processor import PDFDocumentProcessor
+        from document_processor.pipeline.builder import get_pipeline_builder
+
+        pipeline_builder, model_directory = get_pipeline_builder(model, MODELS_DIRECTORY)
+        assert configure_inference(precision) == precision
+        processor = PDFDocumentProcessor(pipeline_builder, model_directory=model_directory, min_confidence=0.5)
+        results = []
+        for path in sorted(glob.glob(f"{TEST_FILES}/*.pdf")):
+            with open(path, "rb") as f:
+                results.append(processor.process_document(f.read()))
+        return results
+
+    def test_mixed_bfloat16_matches_float32(self, model, model_directory):
+        try:
+            float32_results = self.classify_test_files(model, FLOAT32)
+            bfloat16_results = self.classify_test_files(model, MIXED_BFLOAT16)
+        finally:
+            configure_inference(FLOAT32)
+
+        for float32_data, bfloat16_data in zip(float32_results, bfloat16_results):
+            assert bfloat16_data["document_type"] == float32_data["document_type"]
+            for (float32_class, float32_confidence), (bfloat16_class, bfloat16_confidence) in zip(
+                float32_data["prediction_confidences"] or [], bfloat16_data["prediction_confidences"] or []
+            ):
+                assert bfloat16_class == float32_class
+                assert bfloat16_confidence == pytest.approx(float32_confidence, abs=0.05)
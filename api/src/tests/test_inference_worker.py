@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from document_processor.inference_worker import InferenceServer, build_inference_pipeline, get_input_size, parse_args
+from document_processor.pipeline.builder import (
+    EffDetEffNetDocumentProcessorPipelineBuilder,
+    EffNetDocumentProcessorPipelineBuilder,
+)
+from document_processor.pipeline.pipeline import DocumentProcessorPipeline
+from document_processor.pipeline.pipeline_nodes import EffNetDocumentClassifierNode, PdfToImageConverterNode
+
+
+class TestBuildInferencePipeline:
+    @pytest.fixture
+    def pipeline(self, mocker):
+        mocker.patch("tensorflow.keras.models.load_model")
+        return build_inference_pipeline(
+            EffNetDocumentProcessorPipelineBuilder(), model_directory="/models/effnet", min_confidence=0.5
+        )
+
+    def test_pdf_node_is_removed(self, pipeline):
+        assert not any(isinstance(node, PdfToImageConverterNode) for node in pipeline.processing_nodes)
+        assert isinstance(pipeline.processing_nodes[0], EffNetDocumentClassifierNode)
+
+    def test_effnet_input_size_is_advertised(self, pipeline):
+        assert get_input_size(pipeline) == [224, 224]
+
+    def test_other_pipelines_have_no_input_size(self):
+        assert get_input_size(DocumentProcessorPipeline()) is None
+
+
+class TestInferenceServer:
+    @pytest.fixture
+    def server(self, mocker):
+        pipeline = DocumentProcessorPipeline()
+        node = mocker.Mock()
+        node.process_documents.side_effect = lambda data_list: [
+            {**data, "document_type": "passport", "prediction_confidences": [("passport", 0.8)]} for data in data_list
+        ]
+        pipeline.add_processing_node(node)
+        server = InferenceServer(("127.0.0.1", 0), pipeline, "EFFICIENTNET")
+        yield server
+        server.server_close()
+
+    def test_info(self, server):
+        assert server.handle_message({"op": "info"}, None) == {"model": "EFFICIENTNET", "input_size": None}
+
+    def test_unknown_operation(self, server):
+        assert "error" in server.handle_message({"op": "train"}, None)
+
+    def test_classify(self, server):
+        batch = np.zeros((2, 10, 10, 3), dtype=np.uint8)
+        response = server.handle_message({"op": "classify", "sizes": [[10, 10], [5, 8]]}, batch)
+        assert response == {"results": [["passport", [("passport", 0.8)]]] * 2}
+        data_list = server.pipeline.processing_nodes[0].process_documents.call_args.args[0]
+        assert isinstance(data_list[1]["image"], Image.Image)
+        assert data_list[1]["image"].size == (5, 8)
+
+
+class TestInferenceServerWithLocalizer:
+    @pytest.fixture
+    def server(self, mocker):
+        effdet = mocker.Mock(return_value={
+            "detection_scores": np.asarray([[0.9]], dtype=np.float32),
+            "detection_boxes": np.asarray([[[0.1, 0.1, 0.9, 0.9]]], dtype=np.float32),
+        })
+        effnet = mocker.Mock()
+        effnet.predict.side_effect = lambda batch: np.tile([0.1, 0.8, 0.1], (len(batch), 1))
+        mocker.patch("tensorflow.saved_model.load", return_value=effdet)
+        mocker.patch("tensorflow.keras.models.load_model", return_value=effnet)
+        pipeline = build_inference_pipeline(
+            EffDetEffNetDocumentProcessorPipelineBuilder(), model_directory="/models", min_confidence=0.5
+        )
+        server = InferenceServer(("127.0.0.1", 0), pipeline, "EFFICIENTDET_EFFICIENTNET")
+        yield server
+        server.server_close()
+
+    def test_classify_localizes_the_sent_page(self, server):
+        batch = np.zeros((1, 40, 30, 3), dtype=np.uint8)
+        response = server.handle_message({"op": "classify", "sizes": [[30, 40]]}, batch)
+        assert response["results"][0][0] == "id_card"
+
+
+class TestParseArgs:
+    def test_parse_args(self):
+        args = parse_args(["--model", "EFFICIENTDET", "--port", "9000"])
+        assert args.model == "EFFICIENTDET"
+        assert args.port == 9000
@@ -0,0 +1,145 @@
+import pytest
+
+from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.job_queue import (
+    JobNotFoundError,
+    JobWorkerPool,
+    SQLiteJobQueue,
+)
+from document_processor.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+class TestSQLiteJobQueue:
+    def test_submit_creates_pending_job(self, job_queue):
+        job_id = job_queue.submit(b"pdf", "a.pdf")
+        assert job_queue.get(job_id)["status"] == "pending"
+
+    def test_submit_invalid_priority_raises_error(self, job_queue):
+        with pytest.raises(ValueError):
+            job_queue.submit(b"pdf", priority="urgent")
+
+    def test_get_unknown_job_raises_error(self, job_queue):
+        with pytest.raises(JobNotFoundError):
+            job_queue.get("unknown")
+
+    def test_claim_empty_queue(self, job_queue):
+        assert job_queue.claim() == []
+
+    def test_claim_highest_priority_first(self, job_queue):
+        job_queue.submit(b"low", priority="low")
+        high_id = job_queue.submit(b"high", priority="high")
+        jobs = job_queue.claim()
+        assert [job.id for job in jobs] == [high_id]
+        assert jobs[0].document == b"high"
+
+    def test_claim_marks_jobs_running(self, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.claim()
+        assert job_queue.get(job_id)["status"] == "running"
+        assert job_queue.claim() == []
+
+    def test_claim_batch_uses_one_model(self, job_queue):
+        job_queue.submit(b"a", model="EFFICIENTNET")
+        job_queue.submit(b"b", model="EFFICIENTDET")
+        job_queue.submit(b"c", model="EFFICIENTNET")
+        jobs = job_queue.claim(limit=3)
+        assert [job.document for job in jobs] == [b"a", b"c"]
+
+    def test_complete_stores_result(self, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.claim()
+        job_queue.complete(job_id, {"document_type": "passport"})
+        job = job_queue.get(job_id)
+        assert job["status"] == "done"
+        assert job["result"] == {"document_type": "passport"}
+
+    def test_fail_stores_error(self, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.fail(job_id, ValueError("Broken PDF"))
+        job = job_queue.get(job_id)
+        assert job["status"] == "failed"
+        assert job["error"] == "Broken PDF"
+
+    def test_jobs_survive_reopening(self, tmp_path, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        assert SQLiteJobQueue(str(tmp_path / "jobs.sqlite3")).get(job_id)["status"] == "pending"
+
+    def test_requeue_running(self, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.claim()
+        assert job_queue.requeue_running(older_than=-1) == 1
+        assert job_queue.get(job_id)["status"] == "pending"
+
+    def test_requeue_running_keeps_recent_claims(self, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.claim()
+        assert job_queue.requeue_running(older_than=600) == 0
+        assert job_queue.get(job_id)["status"] == "running"
+
+    def test_count(self, job_queue):
+        job_queue.submit(b"a")
+        job_queue.submit(b"b")
+        job_queue.claim()
+        assert job_queue.count("pending") == 1
+        assert job_queue.count("running") == 1
+
+    def test_purge_deletes_finished_jobs(self, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.complete(job_id, {})
+        assert job_queue.purge(older_than=-1) == 1
+        with pytest.raises(JobNotFoundError):
+            job_queue.get(job_id)
+
+
+class TestJobWorkerPool:
+    @pytest.fixture
+    def processor(self, mocker):
+        processor = mocker.Mock(spec=PDFDocumentProcessor)
+        processor.process_documents.side_effect = lambda documents: [
+            {"error": ValueError("Broken PDF")} if document == b"broken" else {"document_type": "passport"}
+            for document in documents
+        ]
+        return processor
+
+    @pytest.fixture
+    def pool(self, job_queue, processor):
+        registry = ModelRegistry()
+        registry.register("EFFICIENTNET", processor)
+        return JobWorkerPool(job_queue, registry, batch_size=4)
+
+    def test_run_once_processes_batch(self, pool, job_queue, processor):
+        job_queue.submit(b"a")
+        job_queue.submit(b"b")
+        assert pool.run_once() == 2
+        processor.process_documents.assert_called_once_with([b"a", b"b"])
+
+    def test_run_once_completes_jobs(self, pool, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        pool.run_once()
+        assert job_queue.get(job_id)["result"]["document_type"] == "passport"
+
+    def test_run_once_fails_broken_documents_only(self, pool, job_queue):
+        broken_id = job_queue.submit(b"broken")
+        fine_id = job_queue.submit(b"pdf")
+        pool.run_once()
+        assert job_queue.get(broken_id)["status"] == "failed"
+        assert job_queue.get(fine_id)["status"] == "done"
+
+    def test_run_once_fails_jobs_of_unknown_model(self, pool, job_queue):
+        job_id = job_queue.submit(b"pdf", model="UNKNOWN")
+        pool.run_once()
+        assert job_queue.get(job_id)["status"] == "failed"
+
+    def test_maintain_requeues_expired_claims(self, pool, job_queue):
+        job_id = job_queue.submit(b"pdf")
+        job_queue.claim()
+        pool.maintain()
+        assert job_queue.get(job_id)["status"] == "running"
+        pool.lease_timeout = -1
+        pool.maintain()
+        assert job_queue.get(job_id)["status"] == "pending"
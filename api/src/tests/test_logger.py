@@ -0,0 +1,102 @@
+import io
+import json
+import logging
+import sys
+
+import pytest
+
+from document_processor.logger import (
+    CorrelationIdFilter,
+    DebugSamplingFilter,
+    JsonFormatter,
+    c_handler,
+    correlation_id,
+    logger,
+    q_listener,
+)
+
+
+@pytest.fixture
+def record():
+    return logging.LogRecord("test", logging.INFO, __file__, 1, "Hello %s", ("there",), None)
+
+
+@pytest.fixture
+def debug_record():
+    return logging.LogRecord("test", logging.DEBUG, __file__, 1, "Hello", None, None)
+
+
+class TestCorrelationIdFilter:
+    def test_filter_adds_default_correlation_id(self, record):
+        CorrelationIdFilter().filter(record)
+        assert record.correlation_id == "-"
+
+    def test_filter_adds_current_correlation_id(self, record):
+        token = correlation_id.set("request-1")
+        try:
+            CorrelationIdFilter().filter(record)
+        finally:
+            correlation_id.reset(token)
+        assert record.correlation_id == "request-1"
+
+
+class TestDebugSamplingFilter:
+    def test_filter_keeps_info_records(self, record):
+        assert DebugSamplingFilter(0.0).filter(record)
+
+    def test_filter_drops_debug_records_with_zero_rate(self, debug_record):
+        assert not DebugSamplingFilter(0.0).filter(debug_record)
+
+    def test_filter_keeps_debug_records_with_full_rate(self, debug_record):
+        assert DebugSamplingFilter(1.0).filter(debug_record)
+
+
+class TestJsonFormatter:
+    def test_format_is_json(self, record):
+        CorrelationIdFilter().filter(record)
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "Hello there"
+        assert entry["level"] == "INFO"
+        assert entry["correlation_id"] == "-"
+
+    def test_format_contains_exception(self, record):
+        try:
+            raise ValueError("Broken")
+        except ValueError:
+            record.exc_info = sys.exc_info()
+        entry = json.loads(JsonFormatter().format(record))
+        assert "ValueError: Broken" in entry["exception"]
+
+
+class TestLoggerOutput:
+    @pytest.fixture
+    def output(self, monkeypatch):
+        stream = io.StringIO()
+        monkeypatch.setattr(c_handler, "stream", stream)
+        monkeypatch.setattr(c_handler, "formatter", JsonFormatter())
+
+        def read():
+            # Stopping the listener waits until it wrote the queued records
+            q_listener.stop()
+            q_listener.start()
+            return [json.loads(line) for line in stream.getvalue().splitlines()]
+        return read
+
+    def test_logged_exception_is_a_separate_field(self, output):
+        try:
+            raise ValueError("Broken")
+        except ValueError:
+            logger.error("Processing failed for %s", "a.pdf", exc_info=True)
+        entry = output()[-1]
+        assert entry["message"] == "Processing failed for a.pdf"
+        assert "ValueError: Broken" in entry["exception"]
+
+    def test_text_format_keeps_traceback(self, output, monkeypatch):
+        monkeypatch.setattr(c_handler, "formatter", logging.Formatter("%(levelname)s - %(message)s"))
+        try:
+            raise ValueError("Broken")
+        except ValueError:
+            logger.error("Processing failed", exc_info=True)
+        q_listener.stop()
+        q_listener.start()
+        assert "ValueError: Broken" in c_handler.stream.getvalue()
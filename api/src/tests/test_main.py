@@ -1,3 +1,4 @@
+import hashlib
 import os
 import logging
 import pytest
@@ -6,6 +7,12 @@ from fastapi.testclient import TestClient
 
 import main
 from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.deadline import DeadlineExceededError
+from document_processor.admission import AdaptiveConcurrencyLimiter, RateLimiter
+from document_processor.job_queue import SQLiteJobQueue
+from document_processor.single_flight import SingleFlight
+from document_processor.worker_recycler import WorkerRecycler
+from document_processor.pipeline.remote_nodes import RemoteInferenceError
 from document_processor.pipeline.builder import EffNetDocumentProcessorPipelineBuilder, \
     EffDetDocumentProcessorPipelineBuilder
 from main import app
@@ -14,11 +21,14 @@ from main import app
 model = os.getenv("MODEL")
 CLASSIFY_DOC_DIR = "/classify-document/"
 
-main.document_processor = PDFDocumentProcessor(
-            EffNetDocumentProcessorPipelineBuilder(),
-            model_directory="/app/models/effnet",
-            min_confidence=0.5
-        )
+main.model_registry.register(
+    "EFFICIENTNET",
+    PDFDocumentProcessor(
+        EffNetDocumentProcessorPipelineBuilder(),
+        model_directory="/app/models/effnet",
+        min_confidence=0.5
+    )
+)
 
 
 class TestMain:
@@ -100,7 +110,7 @@ class TestMain:
         with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
             mock_data = mocker.MagicMock()
             mocker.patch.object(mock_data, "get", return_value=None)
-            mock_process_document = mocker.patch.object(main.document_processor,
+            mock_process_document = mocker.patch.object(main.model_registry.get(),
                                                         "process_document",
                                                         return_value=mock_data
                                                         )
@@ -148,3 +158,252 @@ class TestMain:
         with open("/app/api/src/tests/files/id.jpg", "rb") as f:
             response = client.post(CLASSIFY_DOC_DIR, files={"document": f})
             assert response.json() == {"detail": "Invalid file type. File must be pdf."}
+
+    def test_parse_model_specs_plain_model(self):
+        assert main.parse_model_specs("EFFICIENTDET") == [("EFFICIENTDET", "EFFICIENTDET", None)]
+
+    def test_parse_model_specs_named_model_with_directory(self):
+        specs = main.parse_model_specs("EFFICIENTNET, candidate=EFFICIENTNET:/app/models/new")
+        assert specs == [
+            ("EFFICIENTNET", "EFFICIENTNET", None),
+            ("candidate", "EFFICIENTNET", "/app/models/new"),
+        ]
+
+    def test_parse_model_specs_empty(self):
+        assert main.parse_model_specs("") == []
+
+    def test_post_process_document_unknown_model_returns_404(self, client):
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, params={"model": "NOTAREALMODEL"}, files={"document": f})
+            assert response.status_code == 404
+
+    def test_post_process_document_selects_model(self, mocker, client):
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            mock_process_document = mocker.patch.object(main.model_registry.get("EFFICIENTNET"),
+                                                        "process_document",
+                                                        return_value={}
+                                                        )
+            client.post(CLASSIFY_DOC_DIR, params={"model": "EFFICIENTNET"}, files={"document": f})
+            mock_process_document.assert_called_once()
+
+    def test_admin_models_forbidden_without_token(self, monkeypatch, client):
+        monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+        response = client.get("/admin/models")
+        assert response.status_code == 403
+
+    def test_admin_models_lists_models(self, monkeypatch, client):
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        response = client.get("/admin/models", headers={"X-Admin-Token": "secret"})
+        assert "EFFICIENTNET" in response.json()["models"]
+
+    def test_metrics_returns_text(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+
+    def test_post_process_document_without_timings(self, client):
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, files={"document": f})
+            assert "timings" not in response.json()["meta"]
+
+    def test_post_process_document_with_timings_query(self, client):
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, params={"timings": True}, files={"document": f})
+            timings = response.json()["meta"]["timings"]
+            assert "PdfToImageConverterNode" in timings["nodes_ms"]
+            assert timings["queue_wait_ms"] >= 0
+
+    def test_post_process_document_with_timings_header(self, client):
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, headers={"X-Include-Timings": "true"}, files={"document": f})
+            assert "timings" in response.json()["meta"]
+
+    def test_post_process_document_compact(self, mocker, client):
+        mocker.patch.object(main.model_registry.get(), "process_document", return_value={
+            "document_type": "passport", "prediction_confidences": [("passport", 0.9)],
+        })
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, params={"compact": True}, files={"document": f})
+        assert response.json() == {"document_type": "passport"}
+
+    def test_build_response_compact(self):
+        assert main.build_response({}, "id.pdf", compact=True) == {"document_type": "unknown"}
+        assert main.build_response({"document_type": "id_card", "prediction_confidences": [("id_card", 0.9)]},
+                                   "id.pdf", compact=True) == {"document_type": "id_card"}
+
+    def test_fast_json_response_serializes_confidences(self):
+        response = main.FastJSONResponse(
+            {"document_type": "id_card", "meta": {"prediction_confidences": [("id_card", 0.9)]}}
+        )
+        assert response.body == b'{"document_type":"id_card","meta":{"prediction_confidences":[["id_card",0.9]]}}'
+
+    def test_get_timings_meta_reports_cache_hit(self):
+        meta = main.get_timings_meta({"cache_hit": True, "timings": {"nodes": {"Node": 0.0015}}}, 0.001)
+        assert meta == {"queue_wait_ms": 1.0, "nodes_ms": {"Node": 1.5}, "batch_size": 1, "cache": "hit"}
+
+    def test_admin_profile_returns_speedscope_file(self, monkeypatch, client):
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        response = client.post("/admin/profile", params={"duration": 0.05}, headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        assert "profiles" in response.json()
+
+    def test_admin_diagnostics_reports_memory(self, monkeypatch, client):
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        response = client.get("/admin/diagnostics", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+        assert response.json()["tracemalloc"] == {"tracing": False}
+        (footprint,) = response.json()["model_weights"]["models"]["EFFICIENTNET"]
+        assert footprint["node"] == "EffNetDocumentClassifierNode"
+        assert not footprint["memory_mapped"]
+
+    def test_admin_diagnostics_forbidden_without_token(self, monkeypatch, client):
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        assert client.get("/admin/diagnostics").status_code == 403
+
+    def test_get_autoscaling_signals(self, client):
+        response = client.get("/autoscaling", params={"window": 30})
+        assert response.status_code == 200
+        assert {"queue_depth", "throughput", "capacity", "time_to_drain_seconds"} <= set(response.json())
+
+    def test_get_recycle_env_vars(self, monkeypatch):
+        monkeypatch.setenv("MAX_REQUESTS_PER_WORKER", "1000")
+        monkeypatch.delenv("MAX_REQUESTS_JITTER", raising=False)
+        monkeypatch.delenv("DRAIN_TIMEOUT", raising=False)
+        assert main.get_recycle_env_vars() == (1000, 0, 30.0)
+
+    def test_draining_worker_rejects_requests(self, monkeypatch, client):
+        recycler = WorkerRecycler(1, on_drained=lambda: None)
+        recycler.drain("test")
+        monkeypatch.setattr(main, "worker_recycler", recycler)
+        assert client.get("/").status_code == 503
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, files={"document": f})
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+    def test_response_contains_request_id(self, client):
+        response = client.get("/", headers={"X-Request-ID": "request-1"})
+        assert response.headers["X-Request-ID"] == "request-1"
+
+    def test_response_contains_generated_request_id(self, client):
+        response = client.get("/")
+        assert response.headers["X-Request-ID"]
+
+    def test_submit_job_without_job_queue_returns_503(self, client):
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post("/jobs/", files={"document": f})
+            assert response.status_code == 503
+
+    def test_submit_job_returns_job_id(self, monkeypatch, tmp_path, client):
+        monkeypatch.setattr(main, "job_queue", SQLiteJobQueue(str(tmp_path / "jobs.sqlite3")))
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post("/jobs/", params={"priority": "high"}, files={"document": f})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert client.get(f"/jobs/{job_id}").json()["status"] == "pending"
+
+    def test_get_job_result_of_pending_job_returns_409(self, monkeypatch, tmp_path, client):
+        monkeypatch.setattr(main, "job_queue", SQLiteJobQueue(str(tmp_path / "jobs.sqlite3")))
+        job_id = main.job_queue.submit(b"pdf", "id_card_1.pdf")
+        assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    def test_get_job_result_of_done_job(self, monkeypatch, tmp_path, client):
+        monkeypatch.setattr(main, "job_queue", SQLiteJobQueue(str(tmp_path / "jobs.sqlite3")))
+        job_id = main.job_queue.submit(b"pdf", "id_card_1.pdf")
+        main.job_queue.complete(job_id, {"document_type": "id_card", "prediction_confidences": [["id_card", 0.9]]})
+        response = client.get(f"/jobs/{job_id}/result")
+        assert response.json() == {
+            "document_type": "id_card",
+            "meta": {"filename": "id_card_1.pdf", "prediction_confidences": [["id_card", 0.9]]},
+        }
+
+    def test_get_unknown_job_returns_404(self, monkeypatch, tmp_path, client):
+        monkeypatch.setattr(main, "job_queue", SQLiteJobQueue(str(tmp_path / "jobs.sqlite3")))
+        assert client.get("/jobs/unknown").status_code == 404
+
+    def test_post_process_document_overloaded_returns_503(self, monkeypatch, client):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrency=1)
+        limiter.limit = 0
+        monkeypatch.setattr(main, "concurrency_limiter", limiter)
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, files={"document": f})
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+    def test_post_process_document_priority_client_is_admitted(self, monkeypatch, client):
+        limiter = AdaptiveConcurrencyLimiter(max_concurrency=1)
+        limiter.limit = 0
+        monkeypatch.setattr(main, "concurrency_limiter", limiter)
+        monkeypatch.setattr(main, "priority_api_keys", {"vip"})
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, headers={"X-API-Key": "vip"}, files={"document": f})
+        assert response.status_code == 200
+
+    def test_post_process_document_rate_limited_returns_429(self, monkeypatch, client):
+        monkeypatch.setattr(main, "rate_limiter", RateLimiter({"key": (0.001, 1)}))
+        for expected_status_code in (200, 429):
+            with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+                response = client.post(CLASSIFY_DOC_DIR, headers={"X-API-Key": "key"}, files={"document": f})
+            assert response.status_code == expected_status_code
+        assert "Retry-After" in response.headers
+
+    def test_request_deadline_uses_header(self, monkeypatch):
+        monkeypatch.delenv("REQUEST_TIMEOUT", raising=False)
+        assert 0 < main.request_deadline(5).remaining() <= 5
+
+    def test_request_deadline_is_capped_by_request_timeout(self, monkeypatch):
+        monkeypatch.setenv("REQUEST_TIMEOUT", "2")
+        assert main.request_deadline(60).remaining() <= 2
+
+    def test_request_deadline_without_timeout(self, monkeypatch):
+        monkeypatch.delenv("REQUEST_TIMEOUT", raising=False)
+        assert main.request_deadline(None).remaining() is None
+
+    def test_post_process_document_deadline_exceeded_returns_504(self, mocker, client):
+        mocker.patch.object(main.model_registry.get(), "process_document",
+                            side_effect=DeadlineExceededError("Request deadline exceeded"))
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, headers={"X-Request-Timeout": "1"}, files={"document": f})
+        assert response.status_code == 504
+
+    def test_post_process_document_remote_inference_error_returns_502(self, mocker, client):
+        mocker.patch.object(main.model_registry.get(), "process_document",
+                            side_effect=RemoteInferenceError("Inference worker is not reachable"))
+        with open("/app/api/src/tests/files/id_card_1.pdf", "rb") as f:
+            response = client.post(CLASSIFY_DOC_DIR, files={"document": f})
+        assert response.status_code == 502
+
+    def test_get_coalescing_env_vars(self, monkeypatch):
+        monkeypatch.setenv("COALESCE_REQUESTS", "false")
+        assert main.get_coalescing_env_vars() is False
+        monkeypatch.delenv("COALESCE_REQUESTS")
+        assert main.get_coalescing_env_vars() is True
+
+    def test_post_process_document_coalesced_returns_result_of_leader(self, mocker, monkeypatch, client):
+        monkeypatch.setattr(main, "single_flight", SingleFlight())
+        key = f"EFFICIENTNET:{hashlib.sha256(b'%PDF-coalesced').hexdigest()}"
+        future, _ = main.single_flight.join(key)
+        future.set_result((({"document_type": "id_card"}, 0.0, 0.0), 0.0))
+        process_document = mocker.patch.object(main.model_registry.get(), "process_document")
+        response = client.post(
+            CLASSIFY_DOC_DIR, params={"model": "EFFICIENTNET"},
+            files={"document": ("id_card.pdf", b"%PDF-coalesced", "application/pdf")},
+        )
+        main.single_flight.leave(key, future)
+        assert response.status_code == 200
+        assert response.json()["document_type"] == "id_card"
+        process_document.assert_not_called()
+
+    def test_get_localizer_env_vars(self, monkeypatch):
+        monkeypatch.setenv("LOCALIZER_INPUT_SIZE", "256")
+        monkeypatch.delenv("LOCALIZER_MIN_SCORE", raising=False)
+        assert main.get_localizer_env_vars() == (256, 0.3)
+
+    def test_get_remote_inference_env_vars(self, monkeypatch):
+        monkeypatch.setenv("REMOTE_INFERENCE_ADDRESS", "inference:8500")
+        monkeypatch.setenv("REMOTE_INFERENCE_BATCH_SIZE", "16")
+        monkeypatch.delenv("REMOTE_INFERENCE_TIMEOUT", raising=False)
+        remote_inference = main.get_remote_inference_env_vars()
+        assert remote_inference["remote_inference_address"] == "inference:8500"
+        assert remote_inference["remote_inference_batch_size"] == 16
+        assert remote_inference["remote_inference_timeout"] == 30.0
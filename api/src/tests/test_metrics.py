@@ -0,0 +1,56 @@
+import pytest
+
+from document_processor.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    @pytest.fixture
+    def registry(self):
+        return MetricsRegistry()
+
+    def test_counter_inc(self, registry):
+        counter = registry.counter("requests_total", "Requests.")
+        counter.inc()
+        counter.inc(2)
+        assert counter.value() == 3
+
+    def test_counter_labels_are_separate(self, registry):
+        counter = registry.counter("requests_total", "Requests.")
+        counter.inc(outcome="hit")
+        assert counter.value(outcome="hit") == 1
+        assert counter.value(outcome="miss") == 0
+
+    def test_same_name_returns_same_metric(self, registry):
+        assert registry.counter("requests_total", "Requests.") is registry.counter("requests_total", "Requests.")
+
+    def test_same_name_different_type_raises_error(self, registry):
+        registry.counter("requests_total", "Requests.")
+        with pytest.raises(ValueError):
+            registry.gauge("requests_total", "Requests.")
+
+    def test_gauge_inc_and_dec(self, registry):
+        gauge = registry.gauge("in_flight", "In flight.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert gauge.value() == 1
+
+    def test_histogram_count_and_sum(self, registry):
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        assert histogram.count() == 2
+        assert histogram.sum() == pytest.approx(0.55)
+
+    def test_render_histogram_buckets_are_cumulative(self, registry):
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        rendered = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in rendered
+        assert 'latency_seconds_bucket{le="1.0"} 2' in rendered
+        assert 'latency_seconds_bucket{le="+Inf"} 2' in rendered
+
+    def test_render_contains_type(self, registry):
+        registry.counter("requests_total", "Requests.").inc()
+        assert "# TYPE requests_total counter" in registry.render()
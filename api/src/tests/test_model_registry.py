@@ -0,0 +1,93 @@
+import pytest
+
+from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.model_registry import (
+    ModelDirectoryWatcher,
+    ModelNotFoundError,
+    ModelRegistry,
+)
+from document_processor.pipeline.builder import DocumentProcessorPipelineBuilder
+
+
+class TestModelRegistry:
+    @pytest.fixture
+    def registry(self):
+        return ModelRegistry()
+
+    @pytest.fixture
+    def pipeline_builder(self, mocker):
+        return mocker.Mock(spec=DocumentProcessorPipelineBuilder)
+
+    @pytest.fixture
+    def processor(self, mocker):
+        return mocker.Mock(spec=PDFDocumentProcessor)
+
+    def test_first_registered_model_is_active(self, registry, processor):
+        registry.register("a", processor)
+        assert registry.active_name == "a"
+        assert registry.get() is processor
+
+    def test_get_unknown_model_raises_error(self, registry):
+        with pytest.raises(ModelNotFoundError):
+            registry.get("a")
+
+    def test_activate_switches_default_model(self, registry, processor, mocker):
+        other = mocker.Mock(spec=PDFDocumentProcessor)
+        registry.register("a", processor)
+        registry.register("b", other)
+        registry.activate("b")
+        assert registry.get() is other
+
+    def test_activate_unknown_model_raises_error(self, registry):
+        with pytest.raises(ModelNotFoundError):
+            registry.activate("a")
+
+    def test_load_builds_and_warms_up_processor(self, registry, pipeline_builder):
+        registry.load("a", pipeline_builder, model_directory="dir", min_confidence=0.5)
+        pipeline_builder.build.assert_called_once_with(model_directory="dir", min_confidence=0.5)
+        pipeline_builder.build.return_value.warm_up.assert_called_once()
+
+    def test_reload_rebuilds_with_same_args(self, registry, pipeline_builder):
+        registry.load("a", pipeline_builder, model_directory="dir", min_confidence=0.5)
+        old_processor = registry.get("a")
+        registry.reload("a")
+        assert pipeline_builder.build.call_count == 2
+        assert registry.get("a") is not old_processor
+
+    def test_lease_keeps_old_processor_while_in_flight(self, registry, processor, mocker):
+        registry.register("a", processor)
+        with registry.lease("a") as leased:
+            registry.register("a", mocker.Mock(spec=PDFDocumentProcessor))
+            assert leased is processor
+            assert registry._entries["a"].processor is not processor
+
+    def test_lease_releases_retired_processor_after_last_request(self, registry, processor, mocker):
+        registry.register("a", processor)
+        with registry.lease("a"):
+            old_entry = registry._entries["a"]
+            registry.register("a", mocker.Mock(spec=PDFDocumentProcessor))
+            assert old_entry.processor is processor
+        assert old_entry.processor is None
+
+    def test_unload_active_model_raises_error(self, registry, processor):
+        registry.register("a", processor)
+        with pytest.raises(ValueError):
+            registry.unload("a")
+
+
+class TestModelDirectoryWatcher:
+    def test_check_reloads_changed_model(self, mocker, tmp_path):
+        registry = ModelRegistry()
+        registry.register("a", mocker.Mock(spec=PDFDocumentProcessor), model_directory=str(tmp_path))
+        mock_reload = mocker.patch.object(registry, "reload")
+        watcher = ModelDirectoryWatcher(registry)
+        mtimes = iter([1.0, 2.0])
+        mocker.patch.object(ModelDirectoryWatcher, "directory_mtime", side_effect=lambda _: next(mtimes))
+
+        watcher.check()
+        mock_reload.assert_not_called()
+        watcher.check()
+        mock_reload.assert_called_once_with("a")
+
+    def test_directory_mtime_missing_directory(self, tmp_path):
+        assert ModelDirectoryWatcher.directory_mtime(str(tmp_path / "missing")) is None
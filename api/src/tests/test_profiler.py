@@ -0,0 +1,60 @@
+import io
+import json
+import threading
+import zipfile
+
+import pytest
+
+from document_processor.profiler import ProfilerBusyError, SamplingProfiler
+
+
+class TestSamplingProfiler:
+    @pytest.fixture
+    def profiler(self):
+        return SamplingProfiler()
+
+    @pytest.fixture
+    def busy_thread(self):
+        stopped = threading.Event()
+        thread = threading.Thread(target=stopped.wait, name="busy-thread", daemon=True)
+        thread.start()
+        yield thread
+        stopped.set()
+
+    @pytest.fixture
+    def samples(self):
+        return {"worker": [(("main", "main.py", 1), ("classify", "nodes.py", 2))] * 2}
+
+    def test_sample_contains_other_threads(self, profiler, busy_thread):
+        samples = profiler.sample(duration=0.05, interval=0.01)
+        assert "busy-thread" in samples
+
+    def test_sample_excludes_own_thread(self, profiler, busy_thread):
+        samples = profiler.sample(duration=0.05, interval=0.01)
+        assert threading.current_thread().name not in samples
+
+    def test_to_speedscope_shares_frames(self, profiler, samples):
+        result = profiler.to_speedscope(samples, 1.0, 0.01)
+        assert len(result["shared"]["frames"]) == 2
+        assert result["profiles"][0]["samples"] == [[0, 1], [0, 1]]
+
+    def test_to_collapsed_counts_stacks(self, profiler, samples):
+        result = profiler.to_collapsed(samples)
+        assert result == "worker;main (main.py:1);classify (nodes.py:2) 2\n"
+
+    def test_profile_returns_speedscope_json(self, profiler, busy_thread):
+        content, media_type, _ = profiler.profile(duration=0.05, interval=0.01)
+        assert media_type == "application/json"
+        assert json.loads(content)["profiles"]
+
+    def test_profile_with_tf_trace_returns_zip(self, mocker, profiler):
+        mock_tf_profiler = mocker.patch("tensorflow.profiler.experimental")
+        content, media_type, _ = profiler.profile(duration=0.01, interval=0.01, tf_trace=True)
+        assert media_type == "application/zip"
+        assert "profile.speedscope.json" in zipfile.ZipFile(io.BytesIO(content)).namelist()
+        mock_tf_profiler.stop.assert_called_once()
+
+    def test_profile_while_busy_raises_error(self, profiler):
+        profiler._lock.acquire()
+        with pytest.raises(ProfilerBusyError):
+            profiler.profile(duration=0.01)
@@ -0,0 +1,58 @@
+import pytest
+
+from document_processor.document_processor import PDFDocumentProcessor
+from document_processor.model_registry import ModelRegistry
+from document_processor.shadow import ShadowRunner, shadow_requests
+
+
+class TestShadowRunner:
+    @pytest.fixture
+    def shadow_processor(self, mocker):
+        processor = mocker.Mock(spec=PDFDocumentProcessor)
+        processor.process_document.return_value = {"document_type": "passport"}
+        return processor
+
+    @pytest.fixture
+    def registry(self, mocker, shadow_processor):
+        registry = ModelRegistry()
+        registry.register("primary", mocker.Mock(spec=PDFDocumentProcessor))
+        registry.register("shadow", shadow_processor)
+        return registry
+
+    @pytest.fixture
+    def runner(self, registry):
+        return ShadowRunner(registry, "shadow", fraction=1.0, queue_size=1)
+
+    def test_should_shadow_primary_model(self, runner):
+        assert runner.should_shadow("primary")
+
+    def test_should_not_shadow_shadow_model(self, runner):
+        assert not runner.should_shadow("shadow")
+
+    def test_should_not_shadow_with_zero_fraction(self, registry):
+        runner = ShadowRunner(registry, "shadow", fraction=0.0)
+        assert not runner.should_shadow("primary")
+
+    def test_submit_drops_when_queue_is_full(self, runner):
+        dropped = shadow_requests.value(outcome="dropped")
+        runner.submit(b"pdf", {"document_type": "passport"}, 0.1)
+        runner.submit(b"pdf", {"document_type": "passport"}, 0.1)
+        assert runner.queue.qsize() == 1
+        assert shadow_requests.value(outcome="dropped") == dropped + 1
+
+    def test_compare_records_agreement(self, runner, shadow_processor):
+        agreed = shadow_requests.value(outcome="agree")
+        runner.compare(b"pdf", "passport", 0.1)
+        shadow_processor.process_document.assert_called_once_with(b"pdf")
+        assert shadow_requests.value(outcome="agree") == agreed + 1
+
+    def test_compare_records_disagreement(self, runner):
+        disagreed = shadow_requests.value(outcome="disagree")
+        runner.compare(b"pdf", "id_card", 0.1)
+        assert shadow_requests.value(outcome="disagree") == disagreed + 1
+
+    def test_compare_records_error(self, runner, shadow_processor):
+        errors = shadow_requests.value(outcome="error")
+        shadow_processor.process_document.side_effect = Exception("Shadow failed")
+        runner.compare(b"pdf", "passport", 0.1)
+        assert shadow_requests.value(outcome="error") == errors + 1
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+
+import pytest
+
+from document_processor.deadline import DeadlineExceededError
+from document_processor.single_flight import SingleFlight, coalesced_seconds, single_flight_requests
+
+
+class TestSingleFlight:
+    @pytest.fixture
+    def single_flight(self):
+        return SingleFlight()
+
+    def test_do_without_concurrency_computes(self, single_flight):
+        assert single_flight.do("key", lambda: "result") == ("result", False)
+        assert single_flight.in_flight() == 0
+
+    def test_do_coalesces_concurrent_calls(self, single_flight):
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"document_type": "id_card"}
+
+        leader = threading.Thread(target=lambda: results.append(single_flight.do("key", compute)))
+        leader.start()
+        started.wait(5)
+        followers_before = single_flight_requests.value(role="follower")
+        followers = [
+            threading.Thread(target=lambda: results.append(single_flight.do("key", compute))) for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        while single_flight_requests.value(role="follower") < followers_before + 3:
+            pass
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        assert len(calls) == 1
+        assert [shared for _, shared in results].count(False) == 1
+        assert all(result == {"document_type": "id_card"} for result, _ in results)
+        assert single_flight.in_flight() == 0
+
+    def test_do_different_keys_compute_separately(self, single_flight):
+        assert single_flight.do("a", lambda: 1) == (1, False)
+        assert single_flight.do("b", lambda: 2) == (2, False)
+
+    def test_do_raises_error_of_leader(self, single_flight):
+        def compute():
+            raise ValueError("invalid")
+
+        with pytest.raises(ValueError):
+            single_flight.do("key", compute)
+        assert single_flight.in_flight() == 0
+
+    def test_follower_receives_error_of_leader(self, single_flight):
+        future, _ = single_flight.join("key")
+        future.set_exception(ValueError("invalid"))
+        with pytest.raises(ValueError):
+            single_flight.do("key", lambda: "result")
+
+    def test_follower_retries_if_requested(self, single_flight):
+        future, _ = single_flight.join("key")
+        future.set_exception(DeadlineExceededError("Request was cancelled"))
+
+        def retry_if(e):
+            single_flight.leave("key", future)
+            return isinstance(e, DeadlineExceededError)
+
+        assert single_flight.do("key", lambda: "result", retry_if=retry_if) == ("result", False)
+
+    def test_leave_keeps_newer_flight(self, single_flight):
+        old_future, _ = single_flight.join("key")
+        single_flight.leave("key", old_future)
+        new_future, _ = single_flight.join("key")
+        single_flight.leave("key", old_future)
+        assert single_flight.in_flight() == 1
+        single_flight.leave("key", new_future)
+        assert single_flight.in_flight() == 0
+
+
+class TestSingleFlightAsync:
+    @pytest.fixture
+    def single_flight(self):
+        return SingleFlight()
+
+    def test_do_async_coalesces_concurrent_calls(self, single_flight):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(*[single_flight.do_async("key", compute) for _ in range(4)])
+
+        seconds_before = coalesced_seconds.value()
+        results = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert results.count(("result", False)) == 1
+        assert results.count(("result", True)) == 3
+        assert coalesced_seconds.value() > seconds_before
+
+    def test_do_async_follower_retries_after_deadline_of_leader(self, single_flight):
+        calls = []
+
+        async def leader():
+            calls.append("leader")
+            await asyncio.sleep(0.05)
+            raise DeadlineExceededError("Request deadline exceeded")
+
+        async def follower():
+            calls.append("follower")
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                single_flight.do_async("key", leader),
+                single_flight.do_async(
+                    "key", follower, retry_if=lambda e: isinstance(e, DeadlineExceededError)
+                ),
+                return_exceptions=True,
+            )
+
+        leader_result, follower_result = asyncio.run(run())
+
+        assert isinstance(leader_result, DeadlineExceededError)
+        assert follower_result == ("result", False)
+        assert calls == ["leader", "follower"]
+
+    def test_do_async_follower_times_out(self, single_flight):
+        async def compute():
+            await asyncio.sleep(0.5)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                single_flight.do_async("key", compute),
+                single_flight.do_async("key", compute, timeout=lambda: 0.01),
+                return_exceptions=True,
+            )
+
+        leader_result, follower_result = asyncio.run(run())
+
+        assert leader_result == ("result", False)
+        assert isinstance(follower_result, asyncio.TimeoutError)
@@ -0,0 +1,56 @@
+import pytest
+
+from document_processor.worker_recycler import WorkerDrainingError, WorkerRecycler
+
+
+class TestWorkerRecycler:
+    @pytest.fixture
+    def drained(self):
+        return []
+
+    @pytest.fixture
+    def recycler(self, drained):
+        return WorkerRecycler(2, on_drained=lambda: drained.append(True))
+
+    def test_worker_is_recycled_after_max_requests(self, recycler, drained):
+        for _ in range(2):
+            recycler.start_request()
+            recycler.finish_request()
+        assert recycler.draining
+        assert drained == [True]
+
+    def test_draining_worker_rejects_requests(self, recycler):
+        recycler.drain("test")
+        with pytest.raises(WorkerDrainingError):
+            recycler.start_request()
+
+    def test_running_requests_finish_before_recycling(self, recycler, drained):
+        recycler.start_request()
+        recycler.start_request()
+        recycler.finish_request()
+        recycler.finish_request()
+        assert drained == [True]
+
+    def test_drain_waits_for_running_request(self, recycler, drained):
+        recycler.start_request()
+        recycler.drain("test")
+        assert drained == []
+        recycler.finish_request()
+        assert drained == [True]
+
+    def test_drain_timeout_recycles_anyway(self, drained):
+        recycler = WorkerRecycler(100, drain_timeout=0.01, on_drained=lambda: drained.append(True))
+        recycler.start_request()
+        recycler.drain("test")
+        assert recycler.drained.wait(5)
+        assert drained == [True]
+
+    def test_worker_is_recycled_once(self, recycler, drained):
+        recycler.drain("test")
+        recycler.drain("test")
+        recycler.finish_draining()
+        assert drained == [True]
+
+    def test_jitter_raises_limit(self):
+        recycler = WorkerRecycler(10, jitter=5)
+        assert 10 <= recycler.max_requests <= 15